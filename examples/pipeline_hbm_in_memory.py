@@ -0,0 +1,26 @@
+import os
+
+from gaitalytics import api
+from gaitalytics import utils
+
+
+def main():
+    settings_file = "settings/hbm_pig.yaml"
+    file_path = "./test/data/Baseline.3.c3d"
+    out_path = "./spatio_temp"
+
+    configs = utils.ConfigProvider(settings_file)
+
+    cycle_data, normalised_data, results = api.run_pipeline(file_path, configs,
+                                                            modelling_methode=api.MODELLING_CMOS,
+                                                            show_plot=False,
+                                                            belt_speed=0.8,
+                                                            dominant_leg_length=998)
+
+    if not os.path.exists(out_path):
+        os.mkdir(out_path)
+    results.to_csv(f"{out_path}/spatio_temp.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,7 @@ setup(
     ],
     packages = find_packages(where="src"),
     package_dir={"": "src"},
+    entry_points={"console_scripts": ["gaitalytics-batch=gaitalytics.batch:main"]},
     install_requires=[
         "pandas",
         "pyyaml",
@@ -1,21 +1,115 @@
+from __future__ import annotations
+
+import os
+import warnings
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, List, Tuple
 
 import numpy as np
-from pandas import DataFrame, concat
-from scipy import signal
+from pandas import DataFrame, Series, concat
 
 import gaitalytics.utils
 import logging
 
 logger = logging.getLogger(__name__)
+
+
+def define_phase_masks(foot_off_frames: np.ndarray, number_frames: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Masks of frames outside stance and swing for all cycles. Points of one context share their cycles, so masks are
+    built once per context and shared between points.
+
+    :param foot_off_frames: frame of foot off in each cycle
+    :param number_frames: number of frame columns of the data table
+    :return: masks (cycles x frames) of frames to hide for standing and swinging
+    """
+    foot_off = np.asarray(foot_off_frames, dtype=np.int64)[:, np.newaxis]
+    frames = np.arange(number_frames)[np.newaxis, :]
+    # first frame is kept in swing and last frame in stance
+    standing_mask = (frames > foot_off) & (frames < number_frames - 1)
+    swinging_mask = (frames >= 1) & (frames < foot_off)
+    standing_mask.flags.writeable = False
+    swinging_mask.flags.writeable = False
+    return standing_mask, swinging_mask
+
+
+class ResultsBuilder:
+    """
+    Collects result columns of analyses by metric and builds the results table once. Columns are sorted by result
+    and metric, cycles missing in a metric are NaN.
+    """
+    METRIC = "metric"
+    RESULT = "result"
+    VALUE = "value"
+
+    def __init__(self):
+        self._columns: Dict[Tuple[str, str], Series] = {}
+
+    def add(self, metric: str, results: DataFrame):
+        """
+        :param metric: name of the metric
+        :param results: results by cycle number, one column per result
+        """
+        for column in results.columns:
+            self._columns[(column, metric)] = results[column]
+
+    def merge(self, other: ResultsBuilder):
+        """
+        Adds the results collected by another builder, results of the other builder replace existing ones
+        """
+        self._columns.update(other._columns)
+
+    def build(self) -> DataFrame:
+        """
+        :return: wide table with cycle numbers as index and (result, metric) columns
+        """
+        if not self._columns:
+            return DataFrame()
+        table = concat(self._columns, axis=1, names=[None, self.METRIC]).sort_index(axis=1)
+        table.index.name = gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER
+        return table
+
+    def build_long(self) -> DataFrame:
+        """
+        :return: long table with cycle number, metric, result and value columns
+        """
+        tables = []
+        for (result, metric), values in sorted(self._columns.items()):
+            tables.append(DataFrame({gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER: values.index.to_numpy(),
+                                     self.METRIC: metric,
+                                     self.RESULT: result,
+                                     self.VALUE: values.to_numpy()}))
+        if not tables:
+            return DataFrame(columns=[gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER, self.METRIC, self.RESULT,
+                                      self.VALUE])
+        return concat(tables, ignore_index=True)
+
+
 class AbstractAnalysis(ABC):
     def __init__(self, data_list: Dict[str, gaitalytics.utils.BasicCyclePoint],
                  configs: gaitalytics.utils.ConfigProvider):
         self._data_list: Dict[str, gaitalytics.utils.BasicCyclePoint] = data_list
         self._configs = configs
 
+    @classmethod
+    @abstractmethod
+    def get_required_keys(cls, configs: gaitalytics.utils.ConfigProvider) -> List[str]:
+        """
+        :param configs: configs from marker and model mapping
+        :return: keys of the cycle data the analysis reads if they are available
+        """
+        pass
+
     def analyse(self, **kwargs) -> DataFrame:
+        builder = ResultsBuilder()
+        self.collect(builder, **kwargs)
+        return builder.build()
+
+    @abstractmethod
+    def collect(self, builder: ResultsBuilder, **kwargs):
+        """
+        Adds the results of the analysis to the builder
+        """
         pass
 
 
@@ -31,40 +125,48 @@ class AbstractCycleAnalysis(AbstractAnalysis, ABC):
     def _do_analysis(self, data: DataFrame) -> DataFrame:
         pass
 
+    @classmethod
+    def get_required_keys(cls, configs: gaitalytics.utils.ConfigProvider) -> List[str]:
+        analysis = cls({}, configs)
+        return [key for key in configs.define_keys(analysis._point_data_type) if analysis._filter_keys(key)]
+
     def _filter_keys(self, key: str) -> bool:
         """ Check if its the right point data """
         return f".{self._point_data_type.name}." in key
 
-    def analyse(self, **kwargs) -> DataFrame:
+    def collect(self, builder: ResultsBuilder, **kwargs):
         logger.info(f"analyse: {self._point_data_type}")
         by_phase = kwargs.get("by_phase", True)
-        results = None
-        for key in self._data_list:  # TODO change quick fix
-            if self._filter_keys(key):
-                raw_point = self._data_list[key]
-                data = raw_point.data_table
-                if not by_phase:
-                    result = self._do_analysis(data)
-                    result['metric'] = key
-                else:
-                    standing = data.copy()
-                    swinging = data.copy()
-                    for row in range(len(data)):
-                        event_frame = raw_point.event_frames.iloc[row][
-                            gaitalytics.utils.BasicCyclePoint.FOOT_OFF]
-                        swinging.iloc[row, 1:event_frame] = float("Nan")
-                        standing.iloc[row, event_frame + 1: -1] = float("Nan")
-                    result1 = self._do_analysis(standing)
-                    result1['metric'] = f"{key}.standing"
-                    result2 = self._do_analysis(swinging)
-                    result2['metric'] = f"{key}.swinging"
-                    result = concat([result1, result2])
-
-                if results is None:
-                    results = result
-                else:
-                    results = concat([results, result])
-        return results.pivot(columns="metric")
+        keys = [key for key in self._data_list if self._filter_keys(key)]  # TODO change quick fix
+        phase_masks = self._define_phase_masks(keys) if by_phase else {}
+        for key in keys:
+            raw_point = self._data_list[key]
+            data = raw_point.data_table
+            if not by_phase:
+                builder.add(key, self._do_analysis(data))
+            else:
+                standing_mask, swinging_mask = phase_masks[(raw_point.context, data.shape[1])]
+                values = data.to_numpy(dtype=float)
+                standing = DataFrame(np.where(standing_mask, np.nan, values), index=data.index,
+                                     columns=data.columns)
+                swinging = DataFrame(np.where(swinging_mask, np.nan, values), index=data.index,
+                                     columns=data.columns)
+                builder.add(f"{key}.standing", self._do_analysis(standing))
+                builder.add(f"{key}.swinging", self._do_analysis(swinging))
+
+    def _define_phase_masks(self, keys: List[str]) -> Dict[tuple, Tuple[np.ndarray, np.ndarray]]:
+        """
+        :param keys: keys of the analysed points
+        :return: standing and swinging masks by context and number of frames, see define_phase_masks
+        """
+        phase_masks = {}
+        for key in keys:
+            point = self._data_list[key]
+            mask_key = (point.context, point.data_table.shape[1])
+            if mask_key not in phase_masks:
+                phase_masks[mask_key] = define_phase_masks(
+                    point.event_frames[gaitalytics.utils.BasicCyclePoint.FOOT_OFF].to_numpy(), mask_key[1])
+        return phase_masks
 
 
 class JointForcesCycleAnalysis(AbstractCycleAnalysis):
@@ -192,7 +294,19 @@ class CMosAnalysis(AbstractCycleAnalysis):
 
 class MosAnalysis(AbstractAnalysis):
 
-    def analyse(self, **kwargs) -> DataFrame:
+    @classmethod
+    def get_required_keys(cls, configs: gaitalytics.utils.ConfigProvider) -> List[str]:
+        return [gaitalytics.utils.ConfigProvider.define_key(translated_label,
+                                                            gaitalytics.utils.PointDataType.Marker,
+                                                            direction,
+                                                            context)
+                for translated_label, context in [(configs.MARKER_MAPPING.left_cmos,
+                                                   gaitalytics.utils.GaitEventContext.LEFT),
+                                                  (configs.MARKER_MAPPING.right_cmos,
+                                                   gaitalytics.utils.GaitEventContext.RIGHT)]
+                for direction in [gaitalytics.utils.AxesNames.x, gaitalytics.utils.AxesNames.y]]
+
+    def collect(self, builder: ResultsBuilder, **kwargs):
         left_cmos_ap = self._data_list[
             gaitalytics.utils.ConfigProvider.define_key(self._configs.MARKER_MAPPING.left_cmos,
                                                         gaitalytics.utils.PointDataType.Marker,
@@ -215,17 +329,10 @@ class MosAnalysis(AbstractAnalysis):
                                                         gaitalytics.utils.AxesNames.x,
                                                         gaitalytics.utils.GaitEventContext.RIGHT)]
 
-        left_ap = self._extract_mos_frames(left_cmos_ap, "left", "ap")
-        left_ml = self._extract_mos_frames(left_cmos_ml, "left", "ml")
-        right_ap = self._extract_mos_frames(right_cmos_ap, "right", "ap")
-        right_ml = self._extract_mos_frames(right_cmos_ml, "right", "ml")
-        result = left_ap.merge(left_ml, on=gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER)
-        result = result.merge(right_ap, on=gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER)
-        result = result.merge(right_ml, on=gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER)
-
-
-        result['metric'] = "Mos"
-        return result.pivot(columns="metric")
+        builder.add("Mos", self._extract_mos_frames(left_cmos_ap, "left", "ap"))
+        builder.add("Mos", self._extract_mos_frames(left_cmos_ml, "left", "ml"))
+        builder.add("Mos", self._extract_mos_frames(right_cmos_ap, "right", "ap"))
+        builder.add("Mos", self._extract_mos_frames(right_cmos_ml, "right", "ml"))
 
     @staticmethod
     def _extract_mos_frames(cmos: gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER, side, direction):
@@ -233,52 +340,77 @@ class MosAnalysis(AbstractAnalysis):
         to_label = f"{direction}_to_{side}"
         hs_contra_label = f"{direction}_hs_contra_{side}"
         to_contra_label = f"{direction}_to_contra_{side}"
-        column_label = [hs_label, to_label, hs_contra_label, to_contra_label]
+        event_labels = [gaitalytics.utils.BasicCyclePoint.FOOT_OFF,
+                        gaitalytics.utils.BasicCyclePoint.FOOT_STRIKE_CONTRA,
+                        gaitalytics.utils.BasicCyclePoint.FOOT_OFF_CONTRA]
+
+        values = cmos.data_table.to_numpy(dtype=float)
+        event_frames = cmos.event_frames.reindex(cmos.data_table.index)[event_labels].to_numpy()
+        event_values = np.take_along_axis(values, event_frames, axis=1)
 
         result = DataFrame(index=cmos.data_table.index)
-        result[hs_label] = cmos.data_table[0].to_list()
-        for cycle_number in cmos.event_frames.index.to_list():
-            to_frame = cmos.event_frames[gaitalytics.utils.BasicCyclePoint.FOOT_OFF].loc[cycle_number]
-            hs_contra_frame = cmos.event_frames[gaitalytics.utils.BasicCyclePoint.FOOT_STRIKE_CONTRA].loc[cycle_number]
-            to_contra_frame = cmos.event_frames[gaitalytics.utils.BasicCyclePoint.FOOT_OFF_CONTRA].loc[cycle_number]
-            result.loc[cycle_number, to_label] = cmos.data_table.loc[cycle_number, to_frame]
-            result.loc[cycle_number, hs_contra_label] = cmos.data_table.loc[cycle_number, hs_contra_frame]
-            result.loc[cycle_number, to_contra_label] = cmos.data_table.loc[cycle_number, to_contra_frame]
+        result[hs_label] = values[:, 0]
+        result[to_label] = event_values[:, 0]
+        result[hs_contra_label] = event_values[:, 1]
+        result[to_contra_label] = event_values[:, 2]
         return result
 
 
 class SpatioTemporalAnalysis(AbstractAnalysis):
 
+    DEFAULT_FREQUENCY = 100
+
     def __init__(self, data_list: Dict, configs: gaitalytics.utils.ConfigProvider, body_height: float = 1800,
-                 frequency: int = 100):
+                 frequency: float = None):
+        """
+        :param frequency: point frequency of the recording, taken from the subject measures of the cycles if None
+        """
         super().__init__(data_list, configs)
         self._frequency = frequency
         self._body_height = body_height
 
-    def analyse(self, **kwargs) -> DataFrame:
+    @classmethod
+    def get_required_keys(cls, configs: gaitalytics.utils.ConfigProvider) -> List[str]:
+        keys = []
+        for translated_label in [configs.MARKER_MAPPING.left_heel, configs.MARKER_MAPPING.right_heel]:
+            for direction in [gaitalytics.utils.AxesNames.x, gaitalytics.utils.AxesNames.y]:
+                for context in gaitalytics.utils.GaitEventContext:
+                    keys.append(gaitalytics.utils.ConfigProvider.define_key(translated_label,
+                                                                            gaitalytics.utils.PointDataType.Marker,
+                                                                            direction,
+                                                                            context))
+        for heel, malleoli, context in [(configs.MARKER_MAPPING.left_heel, configs.MARKER_MAPPING.left_med_malleoli,
+                                         gaitalytics.utils.GaitEventContext.LEFT),
+                                        (configs.MARKER_MAPPING.right_heel, configs.MARKER_MAPPING.right_med_malleoli,
+                                         gaitalytics.utils.GaitEventContext.RIGHT)]:
+            keys.append(gaitalytics.utils.ConfigProvider.define_key(heel,
+                                                                    gaitalytics.utils.PointDataType.Marker,
+                                                                    gaitalytics.utils.AxesNames.z,
+                                                                    context))
+            keys.append(gaitalytics.utils.ConfigProvider.define_key(malleoli,
+                                                                    gaitalytics.utils.PointDataType.Marker,
+                                                                    gaitalytics.utils.AxesNames.x,
+                                                                    context))
+        return keys
+
+    def collect(self, builder: ResultsBuilder, **kwargs):
         subject = self._data_list[
             gaitalytics.utils.ConfigProvider.define_key(self._configs.MARKER_MAPPING.right_heel,
                                                         gaitalytics.utils.PointDataType.Marker,
                                                         gaitalytics.utils.AxesNames.x,
                                                         gaitalytics.utils.GaitEventContext.RIGHT)].subject
-        step_length = self._calculate_length(subject)
-        durations = self._calculate_durations()
-
-        step_height = self._calculate_step_height(subject)
-        step_width = self._calculate_step_width(subject)
-        limb_circumduction = self._calculate_limb_circumduction()
+        if self._frequency is None:
+            self._frequency = subject.get_point_frequency(self.DEFAULT_FREQUENCY)
+        metric = "Spatiotemporal"
+        builder.add(metric, self._calculate_length(subject))
+        builder.add(metric, self._calculate_durations())
 
-        double_support_duration = self._calculate_double_support_duration()
-        single_support_duration = self._calculate_single_support_duration()
+        builder.add(metric, self._calculate_step_height(subject))
+        builder.add(metric, self._calculate_step_width(subject))
+        builder.add(metric, self._calculate_limb_circumduction())
 
-        result = step_length.merge(durations, on="cycle_number")
-        result = result.merge(step_height, on="cycle_number")
-        result = result.merge(step_width, on="cycle_number")
-        result = result.merge(limb_circumduction, on="cycle_number")
-        result = result.merge(double_support_duration, on ="cycle_number")
-        result = result.merge(single_support_duration, on ="cycle_number")
-        result['metric'] = "Spatiotemporal"
-        return result.pivot(columns="metric")
+        builder.add(metric, self._calculate_double_support_duration())
+        builder.add(metric, self._calculate_single_support_duration())
 
     def _calculate_step_width(self, subject: gaitalytics.utils.SubjectMeasures) -> DataFrame:
 
@@ -313,10 +445,8 @@ class SpatioTemporalAnalysis(AbstractAnalysis):
                                    side: str) -> DataFrame:
         # TODO: Medial marker
         column_label = f"step_width_{side}"
-        width = DataFrame(index=context_heel_x.index, columns=[column_label])
-        for cycle_number in context_heel_x.index.to_series():
-            width_c = abs(context_heel_x.loc[cycle_number][1] - contra_heel_x.loc[cycle_number][1])
-            width.loc[cycle_number][column_label] = width_c / body_height
+        width = DataFrame(index=context_heel_x.index)
+        width[column_label] = (context_heel_x[1] - contra_heel_x[1]).abs() / body_height
         return width
 
 
@@ -372,16 +502,19 @@ class SpatioTemporalAnalysis(AbstractAnalysis):
     @staticmethod
     def _calculate_limb_circumduction_side(context_malleoli_x: gaitalytics.utils.BasicCyclePoint, side: str) -> DataFrame:
         column_label = f"limb_circumduction_{side}"
-        limb_circumduction = DataFrame(index=context_malleoli_x.data_table.index, columns=[column_label])
-        data = context_malleoli_x.data_table
+        limb_circumduction = DataFrame(index=context_malleoli_x.data_table.index)
+        data = context_malleoli_x.data_table.to_numpy(dtype=float)
         if side =="right":
             data = data * -1
-        for cycle_number in context_malleoli_x.data_table.index.to_series():
-            id_foot_off = context_malleoli_x.event_frames.loc[cycle_number]['Foot_Off']
-            id_heel_strike_end = context_malleoli_x.frames.loc[cycle_number]['end_frame'] - context_malleoli_x.frames.loc[cycle_number]['start_frame']
-            max_data = max(data.iloc[cycle_number -1, id_foot_off:id_heel_strike_end])
-            data_TO = data.loc[cycle_number][id_foot_off]
-            limb_circumduction.loc[cycle_number][column_label] = max_data - data_TO
+        id_foot_off = context_malleoli_x.event_frames[gaitalytics.utils.BasicCyclePoint.FOOT_OFF].to_numpy()
+        id_heel_strike_end = (context_malleoli_x.frames["end_frame"] - context_malleoli_x.frames["start_frame"]).to_numpy()
+        # maximum between foot off and the end of the cycle
+        frames = np.arange(data.shape[1])
+        swing = (frames >= id_foot_off[:, np.newaxis]) & (frames < id_heel_strike_end[:, np.newaxis])
+        max_data = np.max(np.where(swing, data, -np.inf), axis=1)
+        max_data[~swing.any(axis=1)] = np.nan
+        data_to = data[np.arange(len(data)), np.minimum(id_foot_off, data.shape[1] - 1)]
+        limb_circumduction[column_label] = max_data - data_to
 
         return limb_circumduction
 
@@ -408,23 +541,17 @@ class SpatioTemporalAnalysis(AbstractAnalysis):
     def _calculate_double_support_duration_side(self, progression: gaitalytics.utils.BasicCyclePoint, side: str) -> DataFrame:
         dsd_1 = f"double_support_duration_1_{side}"
         dsd_2 = f"double_support_duration_2_{side}"
-        columns = [dsd_1, dsd_2]
-        durations = DataFrame(index=progression.data_table.index, columns=columns)
-        for cycle_number in progression.data_table.index.to_series():
-
-            id_foot_off_contra = progression.event_frames.loc[cycle_number]['Foot_Off_Contra']
-            time_foot_off_contra = (id_foot_off_contra + 1) / self._frequency
-
-            id_heel_strike_contra = progression.event_frames.loc[cycle_number]['Foot_Strike_Contra']
-            time_heel_strike_contra = (id_heel_strike_contra + 1) / self._frequency
-
-            id_toe_off = progression.event_frames.loc[cycle_number]['Foot_Off']
-            time_toe_off = (id_toe_off + 1) / self._frequency
-
-            durations.loc[cycle_number][dsd_1] = time_foot_off_contra
-            durations.loc[cycle_number][dsd_2] = time_toe_off - time_heel_strike_contra
+        event_times = self._get_event_times(progression)
+        durations = DataFrame(index=progression.data_table.index)
+        durations[dsd_1] = event_times[gaitalytics.utils.BasicCyclePoint.FOOT_OFF_CONTRA]
+        durations[dsd_2] = (event_times[gaitalytics.utils.BasicCyclePoint.FOOT_OFF] -
+                            event_times[gaitalytics.utils.BasicCyclePoint.FOOT_STRIKE_CONTRA])
         return durations
 
+    def _get_event_times(self, progression: gaitalytics.utils.BasicCyclePoint) -> DataFrame:
+        """ time of events in seconds after the start of the cycle, frames are 1 based """
+        return (progression.event_frames.reindex(progression.data_table.index) + 1) / self._frequency
+
     def _calculate_single_support_duration(self) -> DataFrame:
         # subject.
         right_heel_y_right = self._data_list[
@@ -445,17 +572,10 @@ class SpatioTemporalAnalysis(AbstractAnalysis):
 
     def _calculate_single_support_duration_side(self, progression: gaitalytics.utils.BasicCyclePoint, side: str) -> DataFrame:
         ssd = f"single_support_duration_{side}"
-        columns = [ssd]
-        durations = DataFrame(index=progression.data_table.index, columns=columns)
-        for cycle_number in progression.data_table.index.to_series():
-
-            id_foot_off_contra = progression.event_frames.loc[cycle_number]['Foot_Off_Contra']
-            time_foot_off_contra = (id_foot_off_contra + 1) / self._frequency
-
-            id_heel_strike_contra = progression.event_frames.loc[cycle_number]['Foot_Strike_Contra']
-            time_heel_strike_contra = (id_heel_strike_contra + 1) / self._frequency
-
-            durations.loc[cycle_number][ssd] = time_heel_strike_contra - time_foot_off_contra
+        event_times = self._get_event_times(progression)
+        durations = DataFrame(index=progression.data_table.index)
+        durations[ssd] = (event_times[gaitalytics.utils.BasicCyclePoint.FOOT_STRIKE_CONTRA] -
+                          event_times[gaitalytics.utils.BasicCyclePoint.FOOT_OFF_CONTRA])
         return durations
 
 
@@ -509,13 +629,11 @@ class SpatioTemporalAnalysis(AbstractAnalysis):
         sw_dur_label = f"swing_duration_p_{side}"
         st_dur_label = f"stance_duration_p_{side}"
         columns = [c_dur_label, s_dur_label, sw_dur_label, st_dur_label]
-        durations = DataFrame(index=progression.data_table.index, columns=columns)
-        for cycle_number in progression.data_table.index.to_series():
-            toe_off = progression.event_frames.loc[cycle_number][gaitalytics.utils.BasicCyclePoint.FOOT_OFF]
-            cycle_data = progression.data_table.loc[cycle_number][~progression.data_table.loc[cycle_number].isna()]
-
-            durations.loc[cycle_number][c_dur_label] = len(cycle_data) / self._frequency
-            durations.loc[cycle_number][s_dur_label] = len(cycle_data[toe_off: -1]) / self._frequency
+        durations = DataFrame(index=progression.event_frames.index, columns=columns)
+        cycle_lengths = progression.cycle_lengths
+        toe_off = progression.event_frames[gaitalytics.utils.BasicCyclePoint.FOOT_OFF].to_numpy()
+        durations[c_dur_label] = cycle_lengths / self._frequency
+        durations[s_dur_label] = np.maximum(cycle_lengths - 1 - toe_off, 0) / self._frequency
         swing_percent = durations[s_dur_label] / durations[c_dur_label]
         durations[sw_dur_label] = swing_percent
         durations[st_dur_label] = 1 - durations[sw_dur_label]
@@ -560,12 +678,8 @@ class SpatioTemporalAnalysis(AbstractAnalysis):
                                       contra_heel_progression: DataFrame, body_height: float, side: str) -> np.array:
         # TODO: checks step definition
         s_len_label = f"step_length_{side}"
-        step_length = DataFrame(index=context_heel_progression.index, columns=[s_len_label])
-
-        for cycle_number in context_heel_progression.index.to_series():
-            context_hs_pos = context_heel_progression.loc[cycle_number][1]
-            contra_hs_pos = contra_heel_progression.loc[cycle_number][1]
-            step_length.loc[cycle_number][s_len_label] = abs(context_hs_pos - contra_hs_pos) / body_height
+        step_length = DataFrame(index=context_heel_progression.index)
+        step_length[s_len_label] = (context_heel_progression[1] - contra_heel_progression[1]).abs() / body_height
 
         return step_length
 
@@ -588,7 +702,18 @@ class MinimalClearingDifference(AbstractAnalysis):
                  configs: gaitalytics.utils.ConfigProvider):
         super().__init__(data_list, configs)
 
-    def analyse(self, **kwargs) -> DataFrame:
+    @classmethod
+    def get_required_keys(cls, configs: gaitalytics.utils.ConfigProvider) -> List[str]:
+        return [gaitalytics.utils.ConfigProvider.define_key(translated_label,
+                                                            gaitalytics.utils.PointDataType.Marker,
+                                                            gaitalytics.utils.AxesNames.z,
+                                                            context)
+                for translated_label, context in [(configs.MARKER_MAPPING.left_meta_2,
+                                                   gaitalytics.utils.GaitEventContext.LEFT),
+                                                  (configs.MARKER_MAPPING.right_meta_2,
+                                                   gaitalytics.utils.GaitEventContext.RIGHT)]]
+
+    def collect(self, builder: ResultsBuilder, **kwargs):
         right_toe = self._data_list[
             gaitalytics.utils.ConfigProvider.define_key(self._configs.MARKER_MAPPING.right_meta_2,
                                                         gaitalytics.utils.PointDataType.Marker,
@@ -599,32 +724,77 @@ class MinimalClearingDifference(AbstractAnalysis):
                                                                                gaitalytics.utils.AxesNames.z,
                                                                                gaitalytics.utils.GaitEventContext.LEFT)]
 
-        right = self._calculate_minimal_clearance(right_toe.data_table, right_toe.event_frames, "right")
-        left = self._calculate_minimal_clearance(left_toe.data_table, left_toe.event_frames, "left")
-        result = concat([left, right], axis=1)
-        result['metric'] = "MinimalToeClearance"
-        return result.pivot(columns="metric")
+        builder.add("MinimalToeClearance", self._calculate_minimal_clearance(left_toe, "left"))
+        builder.add("MinimalToeClearance", self._calculate_minimal_clearance(right_toe, "right"))
 
     @staticmethod
-    def _calculate_minimal_clearance(toe: DataFrame, event_frames: DataFrame, side: str) -> DataFrame:
+    def _calculate_minimal_clearance(toe: gaitalytics.utils.BasicCyclePoint, side: str) -> DataFrame:
+        """
+        Swing is from foot off to the frame before the last frame of the cycle. The minimal toe clearance is the
+        first minimum after the highest peak in the first half of swing, cycles without such a peak are NaN. Peaks are
+        defined like scipy.signal.find_peaks, flat peaks are at the middle frame of the plateau and of equally high
+        peaks the last one is used.
+        """
         s_mtc_label = f"minimal_toe_clearance_{side}"
         s_mtc_cycle_label = f"minimal_toe_clearance_swing_p_{side}"
         s_tc_hs_label = f"toe_clearance_heel_strike_{side}"
-        toe_clearance = DataFrame(index=toe.index, columns=[s_mtc_label, s_mtc_cycle_label, s_tc_hs_label])
-        for cycle_number in toe.index.to_series():
-            toe_off_frame = event_frames.loc[cycle_number][gaitalytics.utils.BasicCyclePoint.FOOT_OFF]
-            swing_phase_data = toe.loc[cycle_number][toe_off_frame: -1]
-            mid_swing_index = round(len(swing_phase_data) / 2)
-            peaks = signal.find_peaks(swing_phase_data[0:mid_swing_index], distance=len(swing_phase_data))
-            toe_clear_min = min(swing_phase_data[peaks[0][0]:-1])
-            tc_percent = np.where(swing_phase_data[peaks[0][0]:-1] == toe_clear_min)[0] / len(swing_phase_data)
-            tc_clear_hs = max(swing_phase_data[mid_swing_index:-1])
-            toe_clearance.loc[cycle_number][s_mtc_label] = toe_clear_min
-            toe_clearance.loc[cycle_number][s_mtc_cycle_label] = tc_percent
-            toe_clearance.loc[cycle_number][s_tc_hs_label] = tc_clear_hs
+
+        values = toe.data_table.to_numpy(dtype=float)
+        toe_off = toe.event_frames.reindex(toe.data_table.index)[
+            gaitalytics.utils.BasicCyclePoint.FOOT_OFF].to_numpy()[:, np.newaxis]
+        swing_end = (toe.cycle_lengths - 1)[:, np.newaxis]
+        swing_length = swing_end - toe_off
+        mid_swing = toe_off + np.round(swing_length / 2).astype(np.int64)
+        frames = np.arange(values.shape[1])[np.newaxis, :]
+
+        # highest local maximum in the first half of swing
+        peaks = _find_peaks(np.where((frames >= toe_off) & (frames < mid_swing), values, np.nan))
+        has_peak = peaks.any(axis=1)
+        # find_peaks keeps the last of equally high peaks
+        peak = values.shape[1] - 1 - np.argmax(np.where(peaks, values, -np.inf)[:, ::-1], axis=1)[:, np.newaxis]
+
+        after_peak = (frames >= peak) & (frames < swing_end - 1)
+        minimum = np.argmin(np.where(after_peak, values, np.inf), axis=1)
+        late_swing = (frames >= mid_swing) & (frames < swing_end - 1)
+
+        rows = np.arange(len(values))
+        toe_clearance = DataFrame(index=toe.data_table.index)
+        toe_clearance[s_mtc_label] = np.where(has_peak, values[rows, minimum], np.nan)
+        toe_clearance[s_mtc_cycle_label] = np.where(has_peak, (minimum - peak[:, 0]) / swing_length[:, 0], np.nan)
+        toe_clearance[s_tc_hs_label] = np.where(late_swing.any(axis=1),
+                                                np.max(np.where(late_swing, values, -np.inf), axis=1), np.nan)
         return toe_clearance
 
 
+def _find_peaks(values: np.ndarray) -> np.ndarray:
+    """
+    Local maxima of each row like scipy.signal.find_peaks without conditions. A peak rises from the previous frame
+    and falls to the next one, flat peaks are marked at the middle frame of the plateau. NaN frames are no peaks and
+    do not border peaks.
+
+    :param values: cycles x frames
+    :return: mask of peaks (cycles x frames)
+    """
+    number_frames = values.shape[1]
+    peaks = np.zeros(values.shape, dtype=bool)
+    if number_frames < 3:
+        return peaks
+    rises = values[:, 1:] > values[:, :-1]
+    falls = values[:, 1:] < values[:, :-1]
+    changes = values[:, 1:] != values[:, :-1]
+    # last frame of the plateau starting at each frame, number_frames - 1 if the values do not change anymore
+    change_frames = np.where(changes, np.arange(number_frames - 1), number_frames - 1)
+    plateau_ends = np.minimum.accumulate(change_frames[:, ::-1], axis=1)[:, ::-1]
+
+    rows, starts = np.nonzero(rises[:, :-1])
+    starts = starts + 1
+    ends = plateau_ends[rows, starts]
+    is_peak = ends < number_frames - 1
+    is_peak[is_peak] = falls[rows[is_peak], ends[is_peak]]
+    peaks[rows[is_peak], (starts[is_peak] + ends[is_peak]) // 2] = True
+    return peaks
+
+
 class AbstractNormalisedAnalysis(ABC):
 
     def __init__(self, data_list: {}):
@@ -635,31 +805,228 @@ class AbstractNormalisedAnalysis(ABC):
         pass
 
     def analyse(self) -> DataFrame:
-        results = None
+        results = []
         for key in self.data_list:
             table = self.data_list[key].data_table
             result = self._do_analysis(table)
             result['metric'] = key
             result['event_frame'] = self.data_list[key].get_mean_event_frame()
             result['data_type'] = self.data_list[key].data_type
-            if results is None:
-                results = result
-            else:
-                results = concat([results, result])
-        return results
+            results.append(result)
+        return concat(results) if results else ResultsBuilder().build()
 
 
 class DescriptiveNormalisedAnalysis(AbstractNormalisedAnalysis):
+    STATISTICS = ["mean", "sd", "max", "min", "median"]
+
+    def analyse(self) -> DataFrame:
+        """
+        Points with the same number of cycles and frames are stacked and described in one reduction
+        """
+        if not self.data_list:
+            return ResultsBuilder().build()
+        groups: Dict[Tuple[int, int], list] = {}
+        for key in self.data_list:
+            groups.setdefault(self.data_list[key].data_table.shape, []).append(key)
+
+        statistics = {}
+        for keys in groups.values():
+            values = np.stack([self.data_list[key].data_table.to_numpy(dtype=float) for key in keys])
+            described = _describe_cycles(values)
+            for index, key in enumerate(keys):
+                statistics[key] = {name: result[index] for name, result in described.items()}
+
+        keys = list(self.data_list)
+        number_frames = [len(statistics[key]["mean"]) for key in keys]
+        result = DataFrame({name: np.concatenate([statistics[key][name] for key in keys])
+                            for name in self.STATISTICS},
+                           index=np.concatenate([np.arange(1, n + 1) for n in number_frames]))
+        result.index.name = "frame_number"
+        result['sd_up'] = result['mean'] + result['sd']
+        result['sd_down'] = result['mean'] - result['sd']
+        result['metric'] = np.repeat(keys, number_frames)
+        result['event_frame'] = np.repeat([self.data_list[key].get_mean_event_frame() for key in keys],
+                                          number_frames)
+        result['data_type'] = np.repeat(np.array([self.data_list[key].data_type for key in keys], dtype=object),
+                                        number_frames)
+        return result
 
     def _do_analysis(self, table: DataFrame) -> DataFrame:
-        frame_number = np.arange(1, 101, 1)  # Could be something like myRange = range(1,1000,1)
-        result = DataFrame(index=frame_number)
+        described = _describe_cycles(table.to_numpy(dtype=float))
+        result = DataFrame({name: described[name] for name in self.STATISTICS},
+                           index=np.arange(1, table.shape[1] + 1))
+        result.index.name = "frame_number"
+        result['sd_up'] = result['mean'] + result['sd']
+        result['sd_down'] = result['mean'] - result['sd']
+        return result
+
+
+def _describe_cycles(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    :param values: normalised cycles (... x cycles x frames), NaN are skipped
+    :return: statistics over cycles (... x frames)
+    """
+    with warnings.catch_warnings():
+        # frames without values are NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {"mean": np.nanmean(values, axis=-2),
+                "sd": np.nanstd(values, axis=-2, ddof=1),
+                "max": np.nanmax(values, axis=-2),
+                "min": np.nanmin(values, axis=-2),
+                "median": np.nanmedian(values, axis=-2)}
+
+
+def _concatenate(arrays: List[np.ndarray]) -> np.ndarray:
+    return np.concatenate(arrays) if arrays else np.empty(0)
+
+
+class WaveformAccumulator:
+    """
+    Streaming mean, sd, min and max of normalised cycles by metric. Trials are added one at a time and combined with
+    the parallel Welford update, memory does not grow with the number of trials. Accumulators of separate trials or
+    processes can be merged.
+    """
+
+    def __init__(self):
+        self._count: Dict[str, np.ndarray] = {}
+        self._mean: Dict[str, np.ndarray] = {}
+        self._m2: Dict[str, np.ndarray] = {}
+        self._min: Dict[str, np.ndarray] = {}
+        self._max: Dict[str, np.ndarray] = {}
+        self._event_frame_sum: Dict[str, float] = {}
+        self._event_frame_count: Dict[str, int] = {}
+        self._data_types: Dict[str, gaitalytics.utils.PointDataType] = {}
+
+    def add(self, cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint]):
+        """
+        :param cycle_data: normalised cycles of one trial
+        """
+        for key, point in cycle_data.items():
+            values = point.data_table.to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            count = valid.sum(axis=0)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                mean = np.nan_to_num(np.nanmean(values, axis=0))
+                minimum = np.nanmin(values, axis=0)
+                maximum = np.nanmax(values, axis=0)
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+            foot_off = point.event_frames[gaitalytics.utils.BasicCyclePoint.FOOT_OFF].to_numpy(dtype=float)
+            self._combine(key, point.data_type, count, mean, m2, minimum, maximum,
+                          float(np.nansum(foot_off)), int(np.count_nonzero(~np.isnan(foot_off))))
+
+    def merge(self, other: WaveformAccumulator):
+        """
+        :param other: accumulator of other trials
+        """
+        for key in other._count:
+            self._combine(key, other._data_types[key], other._count[key], other._mean[key], other._m2[key],
+                          other._min[key], other._max[key], other._event_frame_sum[key],
+                          other._event_frame_count[key])
+
+    def _combine(self, key: str, data_type: gaitalytics.utils.PointDataType, count: np.ndarray, mean: np.ndarray,
+                 m2: np.ndarray, minimum: np.ndarray, maximum: np.ndarray, event_frame_sum: float,
+                 event_frame_count: int):
+        if key not in self._count:
+            self._count[key] = count.copy()
+            self._mean[key] = mean.copy()
+            self._m2[key] = m2.copy()
+            self._min[key] = minimum.copy()
+            self._max[key] = maximum.copy()
+            self._event_frame_sum[key] = event_frame_sum
+            self._event_frame_count[key] = event_frame_count
+            self._data_types[key] = data_type
+            return
+        if len(count) != len(self._count[key]):
+            raise ValueError(f"{key} is normalised to {len(count)} frames instead of {len(self._count[key])}")
+
+        total = self._count[key] + count
+        delta = mean - self._mean[key]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            weight = np.where(total > 0, count / total, 0)
+        self._mean[key] = self._mean[key] + delta * weight
+        self._m2[key] = self._m2[key] + m2 + delta ** 2 * self._count[key] * weight
+        self._count[key] = total
+        self._min[key] = np.fmin(self._min[key], minimum)
+        self._max[key] = np.fmax(self._max[key], maximum)
+        self._event_frame_sum[key] += event_frame_sum
+        self._event_frame_count[key] += event_frame_count
+
+    def get_keys(self) -> List[str]:
+        return list(self._count)
+
+    def get_moments(self, key: str) -> [np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param key: key of the metric
+        :return: count, mean and sd of each frame, frames with less than two cycles have a NaN sd
+        """
+        count = self._count[key]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            sd = np.sqrt(self._m2[key] / (count - 1))
+            mean = np.where(count > 0, self._mean[key], np.nan)
+        sd[count < 2] = np.nan
+        return count, mean, sd
+
+    def save(self, file_path: str):
+        """
+        Writes the moments to a npz file. The file is replaced once it is complete
+        """
+        keys = self.get_keys()
+        with open(f"{file_path}.tmp", "wb") as f:
+            np.savez(f,
+                     keys=np.array(keys, dtype=str),
+                     number_frames=np.array([len(self._count[key]) for key in keys], dtype=np.int64),
+                     count=_concatenate([self._count[key] for key in keys]),
+                     mean=_concatenate([self._mean[key] for key in keys]),
+                     m2=_concatenate([self._m2[key] for key in keys]),
+                     min=_concatenate([self._min[key] for key in keys]),
+                     max=_concatenate([self._max[key] for key in keys]),
+                     event_frame_sum=np.array([self._event_frame_sum[key] for key in keys], dtype=float),
+                     event_frame_count=np.array([self._event_frame_count[key] for key in keys], dtype=np.int64),
+                     data_types=np.array([self._data_types[key].value for key in keys], dtype=np.int64))
+        os.replace(f"{file_path}.tmp", file_path)
+
+    @classmethod
+    def load(cls, file_path: str) -> WaveformAccumulator:
+        accumulator = cls()
+        with np.load(file_path) as moments:
+            offsets = np.concatenate([[0], np.cumsum(moments["number_frames"])])
+            for index, key in enumerate(moments["keys"].tolist()):
+                frames = slice(offsets[index], offsets[index + 1])
+                accumulator._count[key] = moments["count"][frames]
+                accumulator._mean[key] = moments["mean"][frames]
+                accumulator._m2[key] = moments["m2"][frames]
+                accumulator._min[key] = moments["min"][frames]
+                accumulator._max[key] = moments["max"][frames]
+                accumulator._event_frame_sum[key] = float(moments["event_frame_sum"][index])
+                accumulator._event_frame_count[key] = int(moments["event_frame_count"][index])
+                accumulator._data_types[key] = gaitalytics.utils.PointDataType(int(moments["data_types"][index]))
+        return accumulator
+
+    def get_results(self) -> DataFrame:
+        """
+        :return: table like DescriptiveNormalisedAnalysis without median
+        """
+        keys = self.get_keys()
+        if not keys:
+            return ResultsBuilder().build()
+        number_frames = [len(self._count[key]) for key in keys]
+        moments = [self.get_moments(key) for key in keys]
+        count = _concatenate([moment[0] for moment in moments])
+        result = DataFrame({"mean": _concatenate([moment[1] for moment in moments]),
+                            "sd": _concatenate([moment[2] for moment in moments]),
+                            "max": _concatenate([self._max[key] for key in keys]),
+                            "min": _concatenate([self._min[key] for key in keys])},
+                           index=_concatenate([np.arange(1, n + 1) for n in number_frames]))
         result.index.name = "frame_number"
-        result['mean'] = table.mean(axis=0).to_list()
-        result['sd'] = table.std(axis=0).to_list()
-        result['max'] = table.max(axis=0).to_list()
-        result['min'] = table.min(axis=0).to_list()
-        result['median'] = table.median(axis=0).to_list()
-        result['sd_up'] = result.apply(lambda row: row['mean'] + row['sd'], axis=1)
-        result['sd_down'] = result.apply(lambda row: row['mean'] - row['sd'], axis=1)
+        result['sd_up'] = result['mean'] + result['sd']
+        result['sd_down'] = result['mean'] - result['sd']
+        result['count'] = count
+        result['metric'] = np.repeat(keys, number_frames)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            event_frames = [self._event_frame_sum[key] / self._event_frame_count[key] if
+                            self._event_frame_count[key] else np.nan for key in keys]
+        result['event_frame'] = np.repeat(event_frames, number_frames)
+        result['data_type'] = np.repeat(np.array([self._data_types[key] for key in keys], dtype=object),
+                                        number_frames)
         return result
@@ -2,15 +2,19 @@ from __future__ import annotations
 
 import logging
 import os
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Dict, List
 
 from pandas import DataFrame
 
 import gaitalytics.analysis
+import gaitalytics.cache
 import gaitalytics.files
 import gaitalytics.cycle
 import gaitalytics.events
+import gaitalytics.filtering
 import gaitalytics.modelling
 import gaitalytics.utils
 
@@ -52,6 +56,10 @@ ANALYSIS_LIST = (ANALYSIS_MOMENTS,
                  ANALYSIS_TOE_CLEARANCE,
                  ANALYSIS_CMOS)
 
+ANALYSIS_EXECUTOR_THREAD = "thread"
+ANALYSIS_EXECUTOR_PROCESS = "process"
+ANALYSIS_EXECUTOR_LIST = (ANALYSIS_EXECUTOR_THREAD, ANALYSIS_EXECUTOR_PROCESS)
+
 MODELLING_COM = "com"
 MODELLING_CMOS = "cmos"
 MODELLING_XCOM = "xcom"
@@ -59,49 +67,115 @@ MODELLING_LIST = [MODELLING_COM,
                   MODELLING_CMOS,
                   MODELLING_XCOM]
 
+CACHE_C3D_FILE_NAME = "output.c3d"
+
 
 def analyse_data(cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint],
                  config: gaitalytics.utils.ConfigProvider,
-                 methode: List[str] = ANALYSIS_LIST, **kwargs: dict) -> DataFrame:
+                 methode: List[str] = ANALYSIS_LIST,
+                 executor: str = None,
+                 workers: int = None,
+                 **kwargs: dict) -> DataFrame:
     """
-    Runs specified analysis and concatenates into one Dataframe
+    Runs specified analysis and concatenates into one Dataframe. Analyses are independent and can run concurrently,
+    the results are merged in the order of the analyses so they do not depend on the executor.
 
     :param cycle_data: full length cycle data
     :param config: configs from marker and model mapping
     :param methode: list of methods
+    :param executor: None runs the analyses one after another, "thread" api.ANALYSIS_EXECUTOR_THREAD in a thread
+       pool, "process" api.ANALYSIS_EXECUTOR_PROCESS in a process pool receiving the cycle data once per process
+    :param workers: number of threads or processes, default of concurrent.futures if None
     :return: results of analysis
     """
     logger.info("analyse_data")
     if not all(item in ANALYSIS_LIST for item in methode):
         raise KeyError(f"{methode} are not a valid anomaly checker")
+    if executor is not None and executor not in ANALYSIS_EXECUTOR_LIST:
+        raise KeyError(f"{executor} is not a valid executor")
+
+    analysis_classes = _get_analysis_classes(methode)
+    builder = gaitalytics.analysis.ResultsBuilder()
+    if executor is None:
+        for analysis_class in analysis_classes:
+            analysis_class(cycle_data, config).collect(builder, **kwargs)
+    else:
+        if executor == ANALYSIS_EXECUTOR_THREAD:
+            pool = ThreadPoolExecutor(max_workers=workers)
+            tasks = [(_collect_analysis, analysis_class(cycle_data, config), kwargs)
+                     for analysis_class in analysis_classes]
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_analysis_worker,
+                                       initargs=(cycle_data, config))
+            tasks = [(_collect_worker_analysis, analysis_class, kwargs) for analysis_class in analysis_classes]
+        with pool:
+            futures = [pool.submit(*task) for task in tasks]
+            for future in futures:
+                builder.merge(future.result())
+
+    return builder.build()
 
-    methods: List[gaitalytics.analysis.AbstractAnalysis] = []
+
+def get_required_keys(configs: gaitalytics.utils.ConfigProvider, methode: List[str] = ANALYSIS_LIST) -> List[str]:
+    """
+    Keys of the cycle data read by the analyses. Cycles extracted for these keys only are sufficient for
+    api.analyse_data with the same methods
+
+    :param configs: configs from marker and model mapping
+    :param methode: list of analysis methods
+    :return: sorted union of the keys of all methods
+    """
+    if not all(item in ANALYSIS_LIST for item in methode):
+        raise KeyError(f"{methode} are not a valid analysis")
+    keys = set()
+    for analysis_class in _get_analysis_classes(methode):
+        keys.update(analysis_class.get_required_keys(configs))
+    return sorted(keys)
+
+
+def _get_analysis_classes(methode: List[str]) -> List[type]:
+    analysis_classes: List[type] = []
     if ANALYSIS_ANGLES in methode:
-        methods.append(gaitalytics.analysis.JointAnglesCycleAnalysis(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.JointAnglesCycleAnalysis)
     if ANALYSIS_MOMENTS in methode:
-        methods.append(gaitalytics.analysis.JointMomentsCycleAnalysis(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.JointMomentsCycleAnalysis)
     if ANALYSIS_POWERS in methode:
-        methods.append(gaitalytics.analysis.JointPowerCycleAnalysis(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.JointPowerCycleAnalysis)
     if ANALYSIS_FORCES in methode:
-        methods.append(gaitalytics.analysis.JointForcesCycleAnalysis(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.JointForcesCycleAnalysis)
     if ANALYSIS_SPATIO_TEMP in methode:
-        methods.append(gaitalytics.analysis.SpatioTemporalAnalysis(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.SpatioTemporalAnalysis)
     if ANALYSIS_TOE_CLEARANCE in methode:
-        methods.append(gaitalytics.analysis.MinimalClearingDifference(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.MinimalClearingDifference)
     if ANALYSIS_CMOS in methode:
-        methods.append(gaitalytics.analysis.CMosAnalysis(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.CMosAnalysis)
     if ANALYSIS_MOS in methode:
-        methods.append(gaitalytics.analysis.MosAnalysis(cycle_data, config))
+        analysis_classes.append(gaitalytics.analysis.MosAnalysis)
+    return analysis_classes
 
-    results = None
-    for methode in methods:
-        result = methode.analyse(**kwargs)
-        if results is None:
-            results = result
-        else:
-            results = results.merge(result, on=gaitalytics.utils.BasicCyclePoint.CYCLE_NUMBER)
 
-    return results
+_worker_data: Dict[str, object] = {}
+
+
+def _init_analysis_worker(cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint],
+                          config: gaitalytics.utils.ConfigProvider):
+    """
+    runs once in each worker process of analyse_data
+    """
+    _worker_data["cycle_data"] = cycle_data
+    _worker_data["config"] = config
+
+
+def _collect_worker_analysis(analysis_class: type, kwargs: dict) -> gaitalytics.analysis.ResultsBuilder:
+    analysis = analysis_class(_worker_data["cycle_data"], _worker_data["config"])
+    return _collect_analysis(analysis, kwargs)
+
+
+def _collect_analysis(analysis: gaitalytics.analysis.AbstractAnalysis,
+                      kwargs: dict) -> gaitalytics.analysis.ResultsBuilder:
+    builder = gaitalytics.analysis.ResultsBuilder()
+    analysis.collect(builder, **kwargs)
+    return builder
 
 
 def check_gait_event(c3d_file_path: str,
@@ -125,25 +199,69 @@ def check_gait_event(c3d_file_path: str,
         raise KeyError(f"{anomaly_checker} are not a valid anomaly checker")
     # read c3d
     motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
+    filename = os.path.basename(c3d_file_path).replace(".4.c3d", "_anomalies.txt")
+    _check_events(motion_file, anomaly_checker, os.path.join(output_path, filename))
+
+
+def _check_events(motion_file: gaitalytics.files.FileHandler, anomaly_checker: List[str], out_path: str = None) -> \
+        bool:
     # get anomaly detection
     checker = _get_anomaly_checker(anomaly_checker)
     detected, anomalies = checker.check_events(motion_file)
 
     # write anomalies to file
-    if detected:
-        filename = os.path.basename(c3d_file_path).replace(".4.c3d", "_anomalies.txt")
-        out_path = os.path.join(output_path, filename)
+    if detected and out_path is not None:
         f = open(out_path, "w")
         for anomaly in anomalies:
             print(anomaly, file=f)
         f.close()
+    return detected
+
+
+def filter_data(c3d_file_path: str,
+                output_path: str,
+                filters: List[gaitalytics.filtering.BaseFilter],
+                cache: gaitalytics.cache.StageCache = None):
+    """
+    Filters points and analogs with zero phase filters and saves the c3d in output_path with a '.3.c3d' extension
+
+    :param c3d_file_path: path of c3d file with labelled data '.2.c3d'
+    :param output_path: path to dir to store filtered c3d file
+    :param filters: filters applied in the given order e.g. filtering.PointFilter(6)
+    :param cache: if given, the filtered c3d is reused for the same input file and filters
+    """
+    logger.info("filter_data")
+    if not os.path.isfile(c3d_file_path):
+        raise FileExistsError(f"{c3d_file_path} does not exists")
+    if not os.path.isdir(output_path):
+        raise FileExistsError(f"{output_path} does not exists")
+
+    filename = os.path.basename(c3d_file_path).replace(".2.c3d", ".3.c3d")
+    out_path = os.path.join(output_path, filename)
+    if os.path.abspath(out_path) == os.path.abspath(c3d_file_path):
+        raise FileExistsError(f"{out_path} would overwrite the input file")
+
+    cache_key = _define_cache_key(cache, "filter_data", c3d_file_path, filters=filters)
+    if _restore_cached_file(cache, cache_key, out_path):
+        return
+
+    motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
+    _filter_data(motion_file, filters)
+    motion_file.write_file(out_path)
+    _cache_file(cache, cache_key, out_path)
+
+
+def _filter_data(motion_file: gaitalytics.files.FileHandler, filters: List[gaitalytics.filtering.BaseFilter]):
+    for data_filter in filters:
+        data_filter.filter(motion_file)
 
 
 def detect_gait_events(c3d_file_path: str,
                        output_path: str,
                        configs: gaitalytics.utils.ConfigProvider,
                        methode: str = GAIT_EVENT_METHODE_MARKER,
-                       anomaly_checker: List[str] = GAIT_EVENT_CHECKER_LIST, **kwargs):
+                       anomaly_checker: List[str] = GAIT_EVENT_CHECKER_LIST,
+                       cache: gaitalytics.cache.StageCache = None, **kwargs):
     """
     Adds gait events to c3d file and saves it in output_path with a '.4.c3d' extension. Checks events aditionally
     with given anomaly_checker method and saves it in output_path with '*_anomaly.txt' extension
@@ -155,6 +273,7 @@ def detect_gait_events(c3d_file_path: str,
         'Forceplate' api.GAIT_EVENT_METHODE_FP
     :param anomaly_checker: list of anomaly checkers, "context" api.GAIT_EVENT_CHECKER_CONTEXT,
         "spacing" api.GAIT_EVENT_CHECKER_SPACING
+    :param cache: if given, the c3d with events is reused for the same input file, configs and parameters
     """
     logger.info("detect_gait_events")
     if not os.path.isfile(c3d_file_path):
@@ -166,13 +285,27 @@ def detect_gait_events(c3d_file_path: str,
     if not all(item in GAIT_EVENT_CHECKER_LIST for item in anomaly_checker):
         raise KeyError(f"{anomaly_checker} are not a valid anomaly checker")
 
-    # read c3d
-    motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
-
     # define output name
     filename = os.path.basename(c3d_file_path).replace(".3.c3d", ".4.c3d")
     out_path = os.path.join(output_path, filename)
 
+    cache_key = _define_cache_key(cache, "detect_gait_events", c3d_file_path, configs, methode=methode, **kwargs)
+    if not _restore_cached_file(cache, cache_key, out_path):
+        # read c3d
+        motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
+        _detect_events(motion_file, configs, methode, **kwargs)
+
+        # write events c3d
+        motion_file.write_file(out_path)
+        _cache_file(cache, cache_key, out_path)
+
+    check_gait_event(out_path, output_path)
+
+
+def _detect_events(motion_file: gaitalytics.files.FileHandler,
+                   configs: gaitalytics.utils.ConfigProvider,
+                   methode: str,
+                   **kwargs):
     if methode == GAIT_EVENT_METHODE_FP:
         methode = gaitalytics.events.ForcePlateEventDetection()
     elif methode == GAIT_EVENT_METHODE_MARKER:
@@ -180,12 +313,6 @@ def detect_gait_events(c3d_file_path: str,
 
     methode.detect_events(motion_file, **kwargs)
 
-    # write events c3d
-    motion_file.write_file(out_path)
-
-
-    check_gait_event(out_path, output_path)
-
 
 def _get_anomaly_checker(anomaly_checker: List[str]) -> gaitalytics.events.AbstractEventAnomalyChecker:
     """
@@ -226,11 +353,12 @@ def extract_cycles(c3d_file_path: str,
                    configs: gaitalytics.utils.ConfigProvider,
                    methode: str = CYCLE_METHOD_HEEL_STRIKE,
                    buffer_output_path: str = None,
-                   anomaly_checker: List[str] = GAIT_EVENT_CHECKER_LIST) -> \
-        Dict[str, gaitalytics.utils.BasicCyclePoint]:
+                   anomaly_checker: List[str] = GAIT_EVENT_CHECKER_LIST,
+                   cache: gaitalytics.cache.StageCache = None,
+                   analysis_methode: List[str] = None) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
     """
-    extracts and returns cycles from c3d. If a buffered path is delivered data will be stored in the path in separated
-    csv file. Do not edit files and structure.
+    extracts and returns cycles from c3d. If a buffered path is delivered data will be stored in the path in one
+    buffer file per trial. Do not edit files and structure.
 
     :param c3d_file_path: path of c3d file with foot_off and foot_strike events '*.4.c3d'
     :param configs: configs from marker and model mapping
@@ -238,6 +366,9 @@ def extract_cycles(c3d_file_path: str,
     :param buffer_output_path: if buffering needed path to folder
     :param anomaly_checker: list of anomaly checkers, "context" api.GAIT_EVENT_CHECKER_CONTEXT,
         "spacing" api.GAIT_EVENT_CHECKER_SPACING
+    :param cache: if given, cycles are reused for the same input file, configs and parameters
+    :param analysis_methode: if given, only the keys read by these analysis methods are extracted
+        see api.get_required_keys
     :return: extracted gait cycles
     """
     logger.info("extract_cycles")
@@ -251,10 +382,30 @@ def extract_cycles(c3d_file_path: str,
             raise FileExistsError(f"{buffer_output_path} does not exists")
     if not all(item in GAIT_EVENT_CHECKER_LIST for item in anomaly_checker):
         raise KeyError(f"{anomaly_checker} are not a valid anomaly checker")
+    keys = get_required_keys(configs, analysis_methode) if analysis_methode is not None else None
 
-    # read c3d
-    motion_file = gaitalytics.c3d.BtkFileHandler(c3d_file_path)
+    cache_key = _define_cache_key(cache, "extract_cycles", c3d_file_path, configs, methode=methode,
+                                  anomaly_checker=anomaly_checker, keys=keys)
+    cycle_data = _restore_cached_cycles(cache, cache_key, configs)
+    if cycle_data is None:
+        # read c3d
+        motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
+        cycle_data = _extract_cycles(motion_file, configs, methode, anomaly_checker, keys)
+        _cache_cycles(cache, cache_key, cycle_data)
 
+    # buffer cycles
+    if buffer_output_path:
+        prefix = os.path.basename(c3d_file_path).replace(".4.c3d", "")
+        _cycle_points_to_buffer(cycle_data, buffer_output_path, prefix)
+
+    return cycle_data
+
+
+def _extract_cycles(motion_file: gaitalytics.files.FileHandler,
+                    configs: gaitalytics.utils.ConfigProvider,
+                    methode: str,
+                    anomaly_checker: List[str],
+                    keys: List[str] = None) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
     # get anomaly detection
     checker = _get_anomaly_checker(anomaly_checker)
 
@@ -266,23 +417,17 @@ def extract_cycles(c3d_file_path: str,
         cycle_builder = gaitalytics.cycle.HeelStrikeToHeelStrikeCycleBuilder(checker)
 
     # get cycles
-    cycles = cycle_builder.build_cycles(motion_file.aqc)
+    cycles = cycle_builder.build_cycles(motion_file)
 
     # extract cycles
-    cycle_data = gaitalytics.cycle.CycleDataExtractor(configs).extract_data(cycles, motion_file.aqc)
-
-    # buffer cycles
-    if buffer_output_path:
-        prefix = os.path.basename(c3d_file_path).replace(".4.c3d", "")
-        _cycle_points_to_csv(cycle_data, buffer_output_path, prefix)
-
-    return cycle_data
+    return gaitalytics.cycle.CycleDataExtractor(configs).extract_data(cycles, motion_file, keys)
 
 
 def normalise_cycles(c3d_file_path: str,
                      cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint],
                      method: str = NORMALISE_METHODE_LINEAR,
-                     buffer_output_path: str = None) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+                     buffer_output_path: str = None,
+                     cache: gaitalytics.cache.StageCache = None) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
     """
     normalise and returns cycles
 
@@ -290,6 +435,7 @@ def normalise_cycles(c3d_file_path: str,
     :param cycle_data: full length cycle data
     :param method: method normalise "linear" api.NORMALISE_METHODE_LINEAR
     :param buffer_output_path: if buffering needed path to folder
+    :param cache: if given, normalised cycles are reused for the same cycle data and method
     :return: normalised gait cycles
     """
     logger.info("normalise_cycles")
@@ -300,25 +446,35 @@ def normalise_cycles(c3d_file_path: str,
         if not os.path.isdir(buffer_output_path):
             raise FileExistsError(f"{buffer_output_path} does not exists")
 
-    # get method
-    if method == NORMALISE_METHODE_LINEAR:
-        method = gaitalytics.cycle.LinearTimeNormalisation()
-
-    # normalise
-    normalised_data = method.normalise(cycle_data)
+    cache_key = _define_cache_key(cache, "normalise_cycles", cycle_data=cycle_data, method=method)
+    normalised_data = _restore_cached_cycles(cache, cache_key, labels_from=cycle_data)
+    if normalised_data is None:
+        normalised_data = _normalise_cycles(cycle_data, method)
+        _cache_cycles(cache, cache_key, normalised_data)
 
     # buffer cycles
     if buffer_output_path:
         prefix = os.path.basename(c3d_file_path).replace(".4.c3d", "")
-        _cycle_points_to_csv(normalised_data, buffer_output_path, prefix)
+        _cycle_points_to_buffer(normalised_data, buffer_output_path, prefix)
 
     return normalised_data
 
 
+def _normalise_cycles(cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint],
+                      method: str) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+    # get method
+    if method == NORMALISE_METHODE_LINEAR:
+        method = gaitalytics.cycle.LinearTimeNormalisation()
+
+    # normalise
+    return method.normalise(cycle_data)
+
+
 def model_data(c3d_file_path: str,
                output_path: str,
                configs: gaitalytics.utils.ConfigProvider,
                methode: str,
+               cache: gaitalytics.cache.StageCache = None,
                **kwargs):
     """
     Models data according to chosen method and saves new c3d file in output path with '.5.c3d extension'
@@ -327,38 +483,204 @@ def model_data(c3d_file_path: str,
     :param output_path: path to dir to store c3d file with events
     :param configs: configs from marker and model mapping
     :param methode: methode to detect events
+    :param cache: if given, the modelled c3d is reused for the same input file, configs and parameters
     :keyword belt_speed: belt speed
     """
     logger.info("model_data")
     if not methode in MODELLING_LIST:
         raise KeyError(f"{methode} is not a valid modelling methode")
-    methods: List[gaitalytics.modelling.BaseOutputModeller] = []
-    motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
-    subject = motion_file.get_subject_measures()
-    if methode == MODELLING_CMOS:
-        methods.append(gaitalytics.modelling.COMModeller(configs))
-        methods.append(gaitalytics.modelling.XCOMModeller(configs))
-        methods.append(gaitalytics.modelling.CMoSModeller(configs,
-                                                          **kwargs))
-
-    elif methode == MODELLING_XCOM:
-        methods.append(gaitalytics.modelling.COMModeller(configs))
-        methods.append(gaitalytics.modelling.XCOMModeller(configs))
-    elif methode == MODELLING_COM:
-        methods.append(gaitalytics.modelling.COMModeller(configs))
-
-    for methode in methods:
-        methode.create_point(motion_file, **kwargs)
     filename = os.path.basename(c3d_file_path)
     filename = filename.replace(".4.c3d", ".5.c3d")
     output_path = os.path.join(output_path, filename)
+
+    cache_key = _define_cache_key(cache, "model_data", c3d_file_path, configs, methode=methode, **kwargs)
+    if _restore_cached_file(cache, cache_key, output_path):
+        return
+
+    motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
+    _model_data(motion_file, configs, methode, **kwargs)
     motion_file.write_file(output_path)
+    _cache_file(cache, cache_key, output_path)
+
+
+def _model_data(motion_file: gaitalytics.files.FileHandler,
+                configs: gaitalytics.utils.ConfigProvider,
+                methode: str,
+                **kwargs):
+    graph = gaitalytics.modelling.ModellingGraph([gaitalytics.modelling.COMModeller(configs),
+                                                  gaitalytics.modelling.XCOMModeller(configs),
+                                                  gaitalytics.modelling.CMoSModeller(configs, **kwargs)])
+    labels = {MODELLING_CMOS: configs.MARKER_MAPPING.cmos.value,
+              MODELLING_XCOM: configs.MARKER_MAPPING.xcom.value,
+              MODELLING_COM: configs.MARKER_MAPPING.com.value}
+    if methode in labels:
+        graph.run(motion_file, [labels[methode]], **kwargs)
+
+
+def run_pipeline(c3d_file_path: str,
+                 configs: gaitalytics.utils.ConfigProvider,
+                 event_methode: str = GAIT_EVENT_METHODE_MARKER,
+                 anomaly_checker: List[str] = GAIT_EVENT_CHECKER_LIST,
+                 modelling_methode: str | None = MODELLING_CMOS,
+                 cycle_methode: str = CYCLE_METHOD_HEEL_STRIKE,
+                 normalise_methode: str = NORMALISE_METHODE_LINEAR,
+                 analysis_methode: List[str] = ANALYSIS_LIST,
+                 output_path: str = None,
+                 buffer_output_path: str = None,
+                 filters: List[gaitalytics.filtering.BaseFilter] = None,
+                 extract_required: bool = False,
+                 **kwargs) -> [Dict[str, gaitalytics.utils.BasicCyclePoint],
+                               Dict[str, gaitalytics.utils.BasicCyclePoint],
+                               DataFrame]:
+    """
+    Runs filtering, event detection, anomaly check, modelling, cycle extraction, normalisation and analysis on one c3d
+    which is read once and kept in memory. Intermediate files are only written if output paths are given.
+
+    :param c3d_file_path: path of c3d file with modelled filtered data '.3.c3d'
+    :param configs: configs from marker and model mapping
+    :param event_methode: methode to detect events 'Marker' api.GAIT_EVENT_METHODE_MARKER or
+        'Forceplate' api.GAIT_EVENT_METHODE_FP
+    :param anomaly_checker: list of anomaly checkers, "context" api.GAIT_EVENT_CHECKER_CONTEXT,
+        "spacing" api.GAIT_EVENT_CHECKER_SPACING
+    :param modelling_methode: methode to model data, None to skip modelling
+    :param cycle_methode: method to cut gait cycles either "HS" api.CYCLE_METHOD_HEEL_STRIKE or
+        "TO" api.CYCLE_METHOD_TOE_OFF
+    :param normalise_methode: method normalise "linear" api.NORMALISE_METHODE_LINEAR
+    :param analysis_methode: list of analysis methods
+    :param output_path: if given, c3d with events '.4.c3d', modelled c3d '.5.c3d' and anomalies are stored in the path
+    :param buffer_output_path: if given, full length and normalised cycles are buffered in the path
+    :param filters: if given, points and analogs are filtered before event detection e.g. filtering.PointFilter(6)
+    :param extract_required: if True, only the keys read by the analysis methods are extracted and normalised
+    :return: full length cycles, normalised cycles and results of analysis
+    """
+    logger.info("run_pipeline")
+    if not os.path.isfile(c3d_file_path):
+        raise FileExistsError(f"{c3d_file_path} does not exists")
+    if output_path and not os.path.isdir(output_path):
+        raise FileExistsError(f"{output_path} does not exists")
+    if buffer_output_path and not os.path.isdir(buffer_output_path):
+        raise FileExistsError(f"{buffer_output_path} does not exists")
+    if event_methode not in GAIT_EVENT_METHODE_LIST:
+        raise KeyError(f"{event_methode} is not a valid methode")
+    if not all(item in GAIT_EVENT_CHECKER_LIST for item in anomaly_checker):
+        raise KeyError(f"{anomaly_checker} are not a valid anomaly checker")
+    if modelling_methode is not None and modelling_methode not in MODELLING_LIST:
+        raise KeyError(f"{modelling_methode} is not a valid modelling methode")
+    if cycle_methode not in [CYCLE_METHOD_HEEL_STRIKE, CYCLE_METHOD_TOE_OFF]:
+        raise KeyError(f"{cycle_methode} is not a valid methode")
+    if normalise_methode not in NORMALISE_METHODE_LIST:
+        raise KeyError(f"{normalise_methode} is not a valid methode")
+    if not all(item in ANALYSIS_LIST for item in analysis_methode):
+        raise KeyError(f"{analysis_methode} are not a valid analysis")
+
+    filename = os.path.basename(c3d_file_path)
+    prefix = filename.replace(".3.c3d", "")
+
+    # read c3d
+    motion_file = gaitalytics.files.BtkFileHandler(c3d_file_path)
+
+    # filter
+    if filters:
+        _filter_data(motion_file, filters)
+
+    # events, sorted like a re-read '.4.c3d' before checkers and cycle builders walk them
+    _detect_events(motion_file, configs, event_methode, **kwargs)
+    motion_file.sort_events()
+    if output_path:
+        motion_file.write_file(os.path.join(output_path, filename.replace(".3.c3d", ".4.c3d")))
+        anomaly_path = os.path.join(output_path, f"{prefix}_anomalies.txt")
+    else:
+        anomaly_path = None
+    _check_events(motion_file, anomaly_checker, anomaly_path)
+
+    # modelling
+    if modelling_methode is not None:
+        _model_data(motion_file, configs, modelling_methode, **kwargs)
+        if output_path:
+            motion_file.write_file(os.path.join(output_path, filename.replace(".3.c3d", ".5.c3d")))
+
+    # cycles
+    keys = get_required_keys(configs, analysis_methode) if extract_required else None
+    cycle_data = _extract_cycles(motion_file, configs, cycle_methode, anomaly_checker, keys)
+    normalised_data = _normalise_cycles(cycle_data, normalise_methode)
+    if buffer_output_path:
+        _cycle_points_to_buffer(cycle_data, buffer_output_path, prefix)
+        _cycle_points_to_buffer(normalised_data, buffer_output_path, prefix)
+
+    # analysis
+    results = analyse_data(cycle_data, configs, analysis_methode, **kwargs)
+    return [cycle_data, normalised_data, results]
+
+
+def _cycle_points_to_buffer(cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint], dir_path: str, prefix: str):
+    logger.info("_cycle_points_to_buffer")
+    gaitalytics.cycle.CyclePointBuffer.write(cycle_data, dir_path, prefix)
+
+
+def _define_cache_key(cache: gaitalytics.cache.StageCache | None,
+                      stage: str,
+                      c3d_file_path: str = None,
+                      configs: gaitalytics.utils.ConfigProvider = None,
+                      cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint] = None,
+                      **parameters) -> str | None:
+    """
+    defines the key of a stage by hashing its inputs. Returns None without cache so nothing is hashed
+    """
+    if cache is None:
+        return None
+    inputs = [gaitalytics.cache.hash_parameters(**parameters)]
+    if c3d_file_path is not None:
+        inputs.append(gaitalytics.cache.hash_file(c3d_file_path))
+    if configs is not None:
+        inputs.append(gaitalytics.cache.hash_configs(configs))
+    if cycle_data is not None:
+        inputs.append(gaitalytics.cache.hash_cycle_data(cycle_data))
+    return cache.define_key(stage, *inputs)
+
+
+def _restore_cached_file(cache: gaitalytics.cache.StageCache | None, cache_key: str, out_path: str) -> bool:
+    if cache is None:
+        return False
+    entry_path = cache.get(cache_key)
+    if entry_path is None:
+        return False
+    shutil.copyfile(os.path.join(entry_path, CACHE_C3D_FILE_NAME), out_path)
+    return True
+
+
+def _cache_file(cache: gaitalytics.cache.StageCache | None, cache_key: str, out_path: str):
+    if cache is not None:
+        cache.put(cache_key, lambda entry_path: shutil.copyfile(out_path,
+                                                                 os.path.join(entry_path, CACHE_C3D_FILE_NAME)))
+
+
+def _restore_cached_cycles(cache: gaitalytics.cache.StageCache | None,
+                           cache_key: str,
+                           configs: gaitalytics.utils.ConfigProvider = None,
+                           labels_from: Dict[str, gaitalytics.utils.BasicCyclePoint] = None) -> \
+        Dict[str, gaitalytics.utils.BasicCyclePoint] | None:
+    """
+    loads cycles of a cache entry into memory, the entry may be evicted later. Translated labels are resolved with
+    configs or taken from the points in labels_from
+    """
+    if cache is None:
+        return None
+    entry_path = cache.get(cache_key)
+    if entry_path is None:
+        return None
+    cycle_data = {}
+    for entry in gaitalytics.cycle.CyclePointBuffer.read_manifest(entry_path) or []:
+        cycle_data.update(gaitalytics.cycle.CyclePointBuffer.read(configs, os.path.join(entry_path, entry["file"]),
+                                                                  entry, memory_map=False))
+    if labels_from is not None:
+        for key in cycle_data:
+            cycle_data[key].translated_label = labels_from[key].translated_label
+    return cycle_data
 
 
-def _cycle_points_to_csv(cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint], dir_path: str, prefix: str):
-    logger.info("_cycle_points_to_csv")
-    subject_saved = False
-    for key in cycle_data:
-        cycle_data[key].to_csv(dir_path, prefix)
-        if not subject_saved:
-            cycle_data[key].subject.to_file(dir_path)
+def _cache_cycles(cache: gaitalytics.cache.StageCache | None,
+                  cache_key: str,
+                  cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint]):
+    if cache is not None:
+        cache.put(cache_key, lambda entry_path: gaitalytics.cycle.CyclePointBuffer.write(cycle_data, entry_path,
+                                                                                          cache_key))
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import glob
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List
+
+import pandas as pd
+import yaml
+from pandas import DataFrame
+
+import gaitalytics.api
+import gaitalytics.cache
+import gaitalytics.filtering
+import gaitalytics.utils
+
+logger = logging.getLogger(__name__)
+
+RESULTS_FILE_NAME = "results.csv"
+TRIALS_FOLDER_NAME = "trials"
+TRIAL_LEVEL = "trial"
+DIGEST = "digest"
+RESULTS = "results"
+
+
+def define_trial_name(c3d_file_path: str, root_path: str = None) -> str:
+    """
+    :param c3d_file_path: path of c3d file
+    :param root_path: if given, the name is the path relative to it e.g. 'session1/walk01', else the file name
+    :return: name of the trial without c3d extension
+    """
+    if root_path is None:
+        trial_path = os.path.basename(c3d_file_path)
+    else:
+        trial_path = os.path.relpath(os.path.abspath(c3d_file_path), os.path.abspath(root_path))
+        if trial_path.startswith(os.pardir):
+            raise ValueError(f"{c3d_file_path} is not in {root_path}")
+        trial_path = trial_path.replace(os.sep, "/")
+    return trial_path.replace(".3.c3d", "").replace(".c3d", "")
+
+
+def define_trial_names(file_paths: List[str], root_path: str = None) -> Dict[str, str]:
+    """
+    Names trials by their path relative to the root folder, so files with the same name in different sessions are
+    kept apart. Names do not depend on which other files are in the batch.
+
+    :param file_paths: paths of c3d files
+    :param root_path: folder of all sessions, if None trials are named by their file name
+    :return: paths of c3d files by trial name
+    """
+    trial_names: Dict[str, str] = {}
+    for file_path in file_paths:
+        trial_name = define_trial_name(file_path, root_path)
+        if trial_name in trial_names:
+            raise ValueError(f"{file_path} and {trial_names[trial_name]} have the same trial name {trial_name}, "
+                             f"define the root folder of the sessions")
+        trial_names[trial_name] = file_path
+    return trial_names
+
+
+def define_digest(settings_file: str, **kwargs) -> str:
+    """
+    :param settings_file: path of configs from marker and model mapping
+    :param kwargs: parameters of api.run_pipeline
+    :return: hash of configs and parameters stored with the results of each trial
+    """
+    configs = gaitalytics.utils.ConfigProvider(settings_file)
+    return gaitalytics.cache.hash_parameters(configs=gaitalytics.cache.hash_configs(configs), **kwargs)
+
+
+def collect_files(c3d_files: List[str] | str) -> List[str]:
+    """
+    :param c3d_files: list of paths or glob patterns, or a single glob pattern
+    :return: sorted unique paths of matching files
+    """
+    if isinstance(c3d_files, str):
+        c3d_files = [c3d_files]
+    file_paths = set()
+    for pattern in c3d_files:
+        matches = glob.glob(pattern, recursive=True)
+        file_paths.update(matches if matches else [pattern])
+    return sorted(file_paths)
+
+
+def run_batch(c3d_files: List[str] | str,
+              settings_file: str,
+              output_path: str,
+              workers: int = None,
+              root_path: str = None,
+              **kwargs) -> [DataFrame, Dict[str, str]]:
+    """
+    Runs api.run_pipeline for many trials in parallel processes. Results of each trial are stored in the output path
+    once it is done with a digest of configs and parameters. Trials with stored results of the same digest are not
+    run again. Failing trials do not stop the batch.
+
+    :param c3d_files: list of paths or glob patterns of c3d files with modelled filtered data '.3.c3d'
+    :param settings_file: path of configs from marker and model mapping
+    :param output_path: path to dir to store results
+    :param workers: number of processes, number of cpus if None
+    :param root_path: folder of all sessions, trials are named by their path relative to it. If None, trials are
+        named by their file name, see define_trial_names
+    :param kwargs: parameters of api.run_pipeline
+    :return: consolidated results of all trials, errors of failed trials by trial name
+    """
+    logger.info("run_batch")
+    if not os.path.isfile(settings_file):
+        raise FileExistsError(f"{settings_file} does not exists")
+    trials_path = os.path.join(output_path, TRIALS_FOLDER_NAME)
+    os.makedirs(trials_path, exist_ok=True)
+    digest = define_digest(settings_file, **kwargs)
+
+    results: Dict[str, DataFrame] = {}
+    errors: Dict[str, str] = {}
+    pending: Dict[str, str] = {}
+    for trial_name, c3d_file_path in define_trial_names(collect_files(c3d_files), root_path).items():
+        trial_results = _read_trial_results(_define_trial_result_path(trials_path, trial_name), digest)
+        if trial_results is not None:
+            logger.info(f"skip {trial_name}: results exist")
+            results[trial_name] = trial_results
+        else:
+            pending[trial_name] = c3d_file_path
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_run_trial, c3d_file_path, settings_file,
+                                   _define_trial_result_path(trials_path, trial_name), digest, kwargs): trial_name
+                   for trial_name, c3d_file_path in pending.items()}
+        for future in as_completed(futures):
+            trial_name = futures[future]
+            try:
+                results[trial_name] = future.result()
+                logger.info(f"done {trial_name}")
+            except Exception as e:
+                logger.error(f"failed {trial_name}: {e!r}")
+                errors[trial_name] = repr(e)
+
+    consolidated = _consolidate(results)
+    consolidated.to_csv(os.path.join(output_path, RESULTS_FILE_NAME))
+    return [consolidated, errors]
+
+
+def _run_trial(c3d_file_path: str, settings_file: str, trial_result_path: str, digest: str,
+               kwargs: dict) -> DataFrame:
+    """
+    runs in a worker process. Results are written to a temporary file first so interrupted trials are run again
+    """
+    configs = gaitalytics.utils.ConfigProvider(settings_file)
+    cycle_data, normalised_data, results = gaitalytics.api.run_pipeline(c3d_file_path, configs, **kwargs)
+    os.makedirs(os.path.dirname(trial_result_path), exist_ok=True)
+    pd.to_pickle({DIGEST: digest, RESULTS: results}, f"{trial_result_path}.tmp")
+    os.replace(f"{trial_result_path}.tmp", trial_result_path)
+    return results
+
+
+def _read_trial_results(trial_result_path: str, digest: str) -> DataFrame | None:
+    """
+    :return: stored results of the trial or None if there are none or they were computed with other configs or
+        parameters
+    """
+    if not os.path.isfile(trial_result_path):
+        return None
+    stored = pd.read_pickle(trial_result_path)
+    if not isinstance(stored, dict) or stored.get(DIGEST) != digest:
+        logger.info(f"{trial_result_path} was computed with other configs or parameters")
+        return None
+    return stored[RESULTS]
+
+
+def _define_trial_result_path(trials_path: str, trial_name: str) -> str:
+    return os.path.join(trials_path, *f"{trial_name}.pkl".split("/"))
+
+
+def _consolidate(results: Dict[str, DataFrame]) -> DataFrame:
+    if not results:
+        return DataFrame()
+    trial_names = sorted(results)
+    return pd.concat([results[trial_name] for trial_name in trial_names], keys=trial_names, names=[TRIAL_LEVEL])
+
+
+def _parse_parameters(parameters: List[str]) -> dict:
+    kwargs = {}
+    for parameter in parameters:
+        key, value = parameter.split("=", 1)
+        kwargs[key] = yaml.safe_load(value)
+    return kwargs
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Runs the gaitalytics pipeline for many c3d files in parallel")
+    parser.add_argument("c3d_files", nargs="+", help="paths or glob patterns of c3d files")
+    parser.add_argument("-s", "--settings", required=True, help="path of configs from marker and model mapping")
+    parser.add_argument("-o", "--output", required=True, help="path to dir to store results")
+    parser.add_argument("-r", "--root", default=None,
+                        help="folder of all sessions, trials are named by their path relative to it. "
+                             "Default the file name")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of processes, default number of cpus")
+    parser.add_argument("--event-methode", default=gaitalytics.api.GAIT_EVENT_METHODE_MARKER,
+                        choices=gaitalytics.api.GAIT_EVENT_METHODE_LIST)
+    parser.add_argument("--modelling-methode", default=gaitalytics.api.MODELLING_CMOS,
+                        choices=gaitalytics.api.MODELLING_LIST)
+    parser.add_argument("--cycle-methode", default=gaitalytics.api.CYCLE_METHOD_HEEL_STRIKE,
+                        choices=[gaitalytics.api.CYCLE_METHOD_HEEL_STRIKE, gaitalytics.api.CYCLE_METHOD_TOE_OFF])
+    parser.add_argument("--analysis", nargs="+", default=list(gaitalytics.api.ANALYSIS_LIST),
+                        choices=gaitalytics.api.ANALYSIS_LIST)
+    parser.add_argument("--marker-cutoff", type=float, default=None,
+                        help="cutoff frequency in Hz of a zero phase low pass filter on markers, default no filtering")
+    parser.add_argument("--extract-required", action="store_true",
+                        help="extract only the cycles read by the analyses")
+    parser.add_argument("-p", "--parameter", action="append", default=[], metavar="KEY=VALUE",
+                        help="additional parameter of the pipeline e.g. belt_speed=0.8")
+    args = parser.parse_args(argv)
+    filters = [gaitalytics.filtering.PointFilter(args.marker_cutoff)] if args.marker_cutoff else None
+
+    results, errors = run_batch(args.c3d_files,
+                                args.settings,
+                                args.output,
+                                args.workers,
+                                args.root,
+                                event_methode=args.event_methode,
+                                modelling_methode=args.modelling_methode,
+                                cycle_methode=args.cycle_methode,
+                                analysis_methode=args.analysis,
+                                filters=filters,
+                                extract_required=args.extract_required,
+                                **_parse_parameters(args.parameter))
+    for trial_name, error in errors.items():
+        print(f"{trial_name}: {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+BLOCK_SIZE = 512
+PROCESSOR_INTEL = 84
+PROCESSOR_DEC = 85
+PROCESSOR_MIPS = 86
+
+PARAMETER_TYPE_CHAR = -1
+PARAMETER_TYPE_BYTE = 1
+PARAMETER_TYPE_INT = 2
+PARAMETER_TYPE_FLOAT = 4
+
+ANALOG_FORMAT_SIGNED = "SIGNED"
+ANALOG_FORMAT_UNSIGNED = "UNSIGNED"
+
+
+class C3dParameter:
+    """
+    Raw parameter of the c3d parameter section. Values are decoded on request.
+    """
+
+    def __init__(self, name: str, data_type: int, dimensions: Tuple[int, ...], data: bytes, processor: int):
+        self.name = name
+        self.data_type = data_type
+        self.dimensions = dimensions
+        self._data = data
+        self._processor = processor
+
+    def get_values(self) -> np.ndarray | List[str] | str:
+        """
+        Decodes the parameter. Dimensions are stored in fortran order, the returned array is in c order
+
+        :return: strings for char parameters, otherwise array with reversed dimensions
+        """
+        if self.data_type == PARAMETER_TYPE_CHAR:
+            return self._get_strings()
+
+        shape = self.dimensions[::-1]
+        if self.data_type == PARAMETER_TYPE_FLOAT:
+            values = decode_floats(np.frombuffer(self._data, dtype=_dtype(self._processor, "u4")), self._processor)
+        elif self.data_type == PARAMETER_TYPE_INT:
+            values = np.frombuffer(self._data, dtype=_dtype(self._processor, "i2"))
+        else:
+            values = np.frombuffer(self._data, dtype=np.int8)
+        return values.reshape(shape)
+
+    def _get_strings(self) -> List[str] | str:
+        text = self._data.decode("latin-1")
+        if len(self.dimensions) < 2:
+            return text.strip()
+        length = self.dimensions[0]
+        return [text[start:start + length].strip() for start in range(0, len(text), length)]
+
+
+class C3dReader:
+    """
+    Reads the header and parameter section of a c3d file and memory maps the data section. Point and analog
+    values are only decoded for the requested channels and frames.
+    """
+
+    def __init__(self, file_path: str):
+        self._file_path = file_path
+        with open(file_path, "rb") as f:
+            header = f.read(BLOCK_SIZE)
+            parameter_block = header[0]
+            f.seek((parameter_block - 1) * BLOCK_SIZE)
+            parameter_header = f.read(4)
+            self.processor = parameter_header[3]
+            f.seek((parameter_block - 1) * BLOCK_SIZE)
+            parameter_section = f.read(parameter_header[2] * BLOCK_SIZE)
+
+        self._parameters: Dict[str, Dict[str, C3dParameter]] = self._read_parameters(parameter_section)
+        self._read_header(header)
+        self._data = self._map_data()
+
+    def _read_header(self, header: bytes):
+        words = np.frombuffer(header[:24], dtype=_dtype(self.processor, "u2"))
+        floats = np.frombuffer(header[:24], dtype=_dtype(self.processor, "u4"))
+
+        self.point_count = int(self.get_parameter_value("POINT", "USED", words[1]))
+        self.first_frame = int(words[3])
+        last_frame = int(words[4])
+        self.point_scale = float(self.get_parameter_value("POINT", "SCALE",
+                                                          decode_floats(floats[3:4], self.processor)[0]))
+        self.data_block = int(self.get_parameter_value("POINT", "DATA_START", words[8]))
+        self.point_rate = float(self.get_parameter_value("POINT", "RATE",
+                                                         decode_floats(floats[5:6], self.processor)[0]))
+        analog_per_frame = int(words[2])
+        self.analog_count = int(self.get_parameter_value("ANALOG", "USED", 0))
+        self.analog_samples_per_frame = analog_per_frame // self.analog_count if self.analog_count else 0
+        self.analog_rate = float(self.get_parameter_value("ANALOG", "RATE",
+                                                          self.point_rate * self.analog_samples_per_frame))
+        analog_format = self.get_parameter_value("ANALOG", "FORMAT", ANALOG_FORMAT_SIGNED)
+        self.analog_unsigned = str(analog_format).strip().upper() == ANALOG_FORMAT_UNSIGNED
+
+        # long recordings store the frame range in the TRIAL group
+        actual_start = self.get_parameter_values("TRIAL", "ACTUAL_START_FIELD")
+        actual_end = self.get_parameter_values("TRIAL", "ACTUAL_END_FIELD")
+        if actual_start is not None and actual_end is not None:
+            self.first_frame = _unsigned_int32(actual_start)
+            last_frame = _unsigned_int32(actual_end)
+        self.frame_count = last_frame - self.first_frame + 1
+
+        self.point_labels = self._get_labels("POINT", self.point_count)
+        self.analog_labels = self._get_labels("ANALOG", self.analog_count)
+
+    def _read_parameters(self, section: bytes) -> Dict[str, Dict[str, C3dParameter]]:
+        group_names: Dict[int, str] = {}
+        group_parameters: Dict[int, Dict[str, C3dParameter]] = {}
+        position = 4
+        while position + 2 <= len(section):
+            name_length = np.frombuffer(section, dtype=np.int8, count=1, offset=position)[0]
+            group_id = np.frombuffer(section, dtype=np.int8, count=1, offset=position + 1)[0]
+            if name_length == 0 or group_id == 0:
+                break
+            name_end = position + 2 + abs(name_length)
+            name = section[position + 2:name_end].decode("latin-1").upper()
+            next_offset = int(np.frombuffer(section, dtype=_dtype(self.processor, "i2"), count=1,
+                                            offset=name_end)[0])
+            if group_id < 0:
+                group_names[-group_id] = name
+            else:
+                data_type = np.frombuffer(section, dtype=np.int8, count=1, offset=name_end + 2)[0]
+                dimension_count = section[name_end + 3]
+                dimensions = tuple(section[name_end + 4:name_end + 4 + dimension_count])
+                data_start = name_end + 4 + dimension_count
+                data_size = abs(int(data_type)) * int(np.prod(dimensions, dtype=np.int64))
+                parameter = C3dParameter(name, int(data_type), dimensions, section[data_start:data_start + data_size],
+                                         self.processor)
+                group_parameters.setdefault(int(group_id), {})[name] = parameter
+            if next_offset == 0:
+                break
+            position = name_end + next_offset
+
+        return {group_names[group_id]: parameters for group_id, parameters in group_parameters.items()
+                if group_id in group_names}
+
+    def _map_data(self) -> np.memmap:
+        if self.point_scale < 0:
+            word = "u4" if self.processor == PROCESSOR_DEC else "f4"
+        else:
+            word = "i2"
+        word_type = np.dtype(_dtype(self.processor, word))
+        frame_type = np.dtype([("points", word_type, (self.point_count, 4)),
+                               ("analogs", word_type, (self.analog_samples_per_frame, self.analog_count))])
+        offset = (self.data_block - 1) * BLOCK_SIZE
+        with open(self._file_path, "rb") as f:
+            f.seek(0, 2)
+            available_frames = (f.tell() - offset) // frame_type.itemsize
+        return np.memmap(self._file_path, dtype=frame_type, mode="r", offset=offset,
+                         shape=(min(self.frame_count, available_frames),))
+
+    def _get_labels(self, group: str, count: int) -> List[str]:
+        labels = []
+        for name in ["LABELS"] + [f"LABELS{index}" for index in range(2, 10)]:
+            values = self.get_parameter_values(group, name)
+            if values is None:
+                break
+            labels.extend([values] if isinstance(values, str) else values)
+        return labels[:count]
+
+    def get_parameter(self, group: str, name: str) -> C3dParameter | None:
+        return self._parameters.get(group.upper(), {}).get(name.upper())
+
+    def get_parameter_values(self, group: str, name: str) -> np.ndarray | List[str] | str | None:
+        parameter = self.get_parameter(group, name)
+        if parameter is None:
+            return None
+        return parameter.get_values()
+
+    def get_parameter_value(self, group: str, name: str, default=None):
+        """
+        First value of a parameter
+
+        :param group: name of parameter group
+        :param name: name of parameter
+        :param default: returned if parameter does not exist or is empty
+        :return: first value
+        """
+        values = self.get_parameter_values(group, name)
+        if values is None or isinstance(values, str):
+            return default if values is None else values
+        values = np.ravel(values)
+        return values[0] if len(values) > 0 else default
+
+    def get_point_values(self, index: int, start: int = None, end: int = None) -> [np.ndarray, np.ndarray]:
+        """
+        Decodes one point for a range of frames. Invalid samples are set to 0 with residual -1 as btk does.
+
+        :param index: index of point
+        :param start: first frame index (0 based)
+        :param end: frame index after the last frame
+        :return: values (frames x 3), residuals (frames x 1)
+        """
+        raw = self._data["points"][start:end, index]
+        if self.processor == PROCESSOR_DEC and self.point_scale < 0:
+            raw = decode_floats(raw, self.processor)
+        scale = abs(self.point_scale)
+        residual_word = raw[:, 3].astype(np.int32)
+        values = raw[:, :3].astype(np.float64)
+        residuals = ((residual_word & 0xff) * scale).astype(np.float64)[:, np.newaxis]
+        if self.point_scale > 0:
+            values = values * self.point_scale
+
+        invalid = residual_word < 0
+        values[invalid] = 0
+        residuals[invalid] = -1
+        return values, residuals
+
+    def get_analog_values(self, index: int, start: int = None, end: int = None) -> np.ndarray:
+        """
+        Decodes and scales one analog channel for a range of point frames. Integer samples and offsets of
+        'UNSIGNED' files are read as unsigned 16 bit words.
+
+        :param index: index of analog channel
+        :param start: first point frame index (0 based)
+        :param end: point frame index after the last frame
+        :return: analog samples
+        """
+        raw = self._data["analogs"][start:end, :, index].reshape(-1)
+        if self.processor == PROCESSOR_DEC and self.point_scale < 0:
+            raw = decode_floats(raw, self.processor)
+        elif self.point_scale > 0 and self.analog_unsigned:
+            raw = raw.astype(np.int32) & 0xffff
+        offset = self._get_analog_parameter("OFFSET", index, 0)
+        if self.analog_unsigned:
+            offset = int(offset) & 0xffff
+        scale = self._get_analog_parameter("SCALE", index, 1)
+        general_scale = float(self.get_parameter_value("ANALOG", "GEN_SCALE", 1))
+        return (raw.astype(np.float64) - offset) * scale * general_scale
+
+    def _get_analog_parameter(self, name: str, index: int, default: float) -> float:
+        values = self.get_parameter_values("ANALOG", name)
+        if values is None or len(values) <= index:
+            return default
+        return float(np.ravel(values)[index])
+
+
+def decode_floats(words: np.ndarray, processor: int) -> np.ndarray:
+    """
+    Converts 32 bit words to floats. DEC floats are word swapped and scaled by 4 compared to IEEE floats
+
+    :param words: raw 32 bit words
+    :param processor: processor type of the file
+    :return: float values
+    """
+    if processor != PROCESSOR_DEC:
+        return words.view(words.dtype.str.replace("u", "f"))
+    words = words.astype(np.uint32)
+    swapped = (words << np.uint32(16)) | (words >> np.uint32(16))
+    return swapped.view(np.float32) / 4
+
+
+def _dtype(processor: int, word: str) -> str:
+    byte_order = ">" if processor == PROCESSOR_MIPS else "<"
+    return f"{byte_order}{word}"
+
+
+def _unsigned_int32(words: np.ndarray) -> int:
+    words = np.ravel(words).astype(np.int64) & 0xffff
+    return int(words[0] + (words[1] << 16)) if len(words) > 1 else int(words[0])
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict
+
+import numpy as np
+
+import gaitalytics.utils
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# part of every key, increase it when results or formats of cached stages change so old entries are not reused
+CACHE_VERSION = 2
+
+
+class StageCache:
+    """
+    On disk cache for results of pipeline stages. Entries are folders addressed by a hash of the stage inputs.
+    The least recently used entries are removed when the cache grows beyond its maximal size.
+    """
+
+    def __init__(self, dir_path: str, max_size: int = 10 * 1024 ** 3):
+        """
+        :param dir_path: path to cache folder, is created if it does not exist
+        :param max_size: maximal size of all entries in bytes
+        """
+        self._dir_path = dir_path
+        self._max_size = max_size
+        os.makedirs(dir_path, exist_ok=True)
+
+    @staticmethod
+    def define_key(stage: str, *inputs: str) -> str:
+        """
+        :param stage: name of the stage
+        :param inputs: hashes and parameters of the stage inputs
+        :return: key of the cache entry
+        """
+        key_hash = hashlib.sha256(f"{CACHE_VERSION}".encode())
+        key_hash.update(b"\0")
+        key_hash.update(stage.encode())
+        for stage_input in inputs:
+            key_hash.update(b"\0")
+            key_hash.update(stage_input.encode())
+        return f"{stage}-{key_hash.hexdigest()}"
+
+    def get(self, key: str) -> str | None:
+        """
+        :param key: key of the cache entry
+        :return: path of the entry folder or None if the entry does not exist
+        """
+        entry_path = os.path.join(self._dir_path, key)
+        if not os.path.isdir(entry_path):
+            logger.debug(f"cache miss: {key}")
+            return None
+        logger.debug(f"cache hit: {key}")
+        os.utime(entry_path)
+        return entry_path
+
+    def put(self, key: str, write: Callable[[str], None]) -> str:
+        """
+        Creates an entry. write fills a temporary folder which is moved into the cache when it is complete. If another
+        process created the same entry in the meantime, its entry is kept and readers of it are not disturbed.
+        The new entry is kept when older entries are evicted, even if it is larger than the maximal size.
+
+        :param key: key of the cache entry
+        :param write: function writing the results into the given folder
+        :return: path of the entry folder
+        """
+        entry_path = os.path.join(self._dir_path, key)
+        temp_path = tempfile.mkdtemp(prefix=".tmp-", dir=self._dir_path)
+        try:
+            write(temp_path)
+            if not os.path.isdir(entry_path):
+                try:
+                    os.replace(temp_path, entry_path)
+                except OSError:
+                    if not os.path.isdir(entry_path):
+                        raise
+                    logger.debug(f"cache entry written by another process: {key}")
+        finally:
+            if os.path.isdir(temp_path):
+                shutil.rmtree(temp_path)
+        self.evict(keep=key)
+        return entry_path
+
+    def evict(self, keep: str = None):
+        """
+        Removes least recently used entries until the cache is smaller than its maximal size
+
+        :param keep: key of an entry which is not removed
+        """
+        entries = []
+        for entry in os.scandir(self._dir_path):
+            if entry.is_dir() and not entry.name.startswith(".tmp-"):
+                entries.append([entry.stat().st_mtime, _get_folder_size(entry.path), entry.path])
+        cache_size = sum(entry[1] for entry in entries)
+        for last_used, size, entry_path in sorted(entries):
+            if cache_size <= self._max_size:
+                break
+            if os.path.basename(entry_path) == keep:
+                continue
+            logger.debug(f"cache evict: {os.path.basename(entry_path)}")
+            shutil.rmtree(entry_path, ignore_errors=True)
+            cache_size -= size
+
+
+def hash_file(file_path: str) -> str:
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def hash_configs(configs: gaitalytics.utils.ConfigProvider) -> str:
+    return hashlib.sha256(configs.to_yaml().encode()).hexdigest()
+
+
+def hash_parameters(**parameters) -> str:
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def hash_cycle_data(cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint]) -> str:
+    data_hash = hashlib.sha256()
+    for key, point in cycle_data.items():
+        data_hash.update(key.encode())
+        data_hash.update(point.cycle_point_type.encode())
+        for values in [point.ragged_values, point.ragged_offsets, point.frames.to_numpy(),
+                       point.event_frames.to_numpy()]:
+            values = np.ascontiguousarray(values)
+            data_hash.update(values.dtype.str.encode())
+            data_hash.update(values)
+    return data_hash.hexdigest()
+
+
+def _get_folder_size(dir_path: str) -> int:
+    size = 0
+    for root, dir_names, file_names in os.walk(dir_path):
+        size += sum(os.path.getsize(os.path.join(root, file_name)) for file_name in file_names)
+    return size
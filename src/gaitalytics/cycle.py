@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import json
 import os
 import re
+import threading
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Dict, List
+from typing import Collection, Dict, List, Set
 
 import numpy as np
+import yaml
 from pandas import DataFrame
 
 import gaitalytics.events
@@ -44,28 +47,19 @@ class EventCycleBuilder(CycleBuilder):
 
     def _build(self, file_handler: gaitalytics.files.FileHandler) -> gaitalytics.utils.GaitCycleList:
         gait_cycles = gaitalytics.utils.GaitCycleList()
-        numbers = {gaitalytics.utils.GaitEventContext.LEFT.value: 0,
-                   gaitalytics.utils.GaitEventContext.RIGHT.value: 0}
-        for event_index in range(0, file_handler.get_events_size()):
-            start_event = file_handler.get_event(event_index)
-            context = start_event.context
-
-            label = start_event.label
-            if label == self.event_label:
-                try:
-                    [end_event, unused_events] = gaitalytics.events.find_next_event(file_handler,
-                                                                                    label,
-                                                                                    context,
-                                                                                    event_index)
-                    if end_event is not None:
-                        numbers[context] = numbers[context] + 1
-                        cycle = gaitalytics.utils.GaitCycle(numbers[context],
-                                                            gaitalytics.utils.GaitEventContext(context),
-                                                            start_event.frame, end_event.frame,
-                                                            unused_events)
-                        gait_cycles.add_cycle(cycle)
-                except IndexError as err:
-                    pass  # If events do not match in the end this will be raised
+        events = file_handler.get_event_table()
+        label_code = gaitalytics.utils.get_event_code(gaitalytics.utils.GaitEventLabel, self.event_label)
+        for context in gaitalytics.utils.GaitEventContext:
+            context_code = gaitalytics.utils.get_event_code(gaitalytics.utils.GaitEventContext, context.value)
+            # every event starts a cycle which ends at the next same event of the same context
+            boundaries = np.flatnonzero((events["label"] == label_code) & (events["context"] == context_code))
+            for number, (start_index, end_index) in enumerate(zip(boundaries[:-1], boundaries[1:]), 1):
+                cycle = gaitalytics.utils.GaitCycle(number,
+                                                    context,
+                                                    int(events["frame"][start_index]),
+                                                    int(events["frame"][end_index]),
+                                                    events[start_index + 1:end_index])
+                gait_cycles.add_cycle(cycle)
         return gait_cycles
 
 
@@ -81,69 +75,131 @@ class ToeOffToToeOffCycleBuilder(EventCycleBuilder):
 
 # Cycle Extractor
 class CycleDataExtractor:
-    def __init__(self, configs: gaitalytics.utils.ConfigProvider):
+    def __init__(self, configs: gaitalytics.utils.ConfigProvider, dtype: np.dtype = np.float64):
+        """
+        :param configs: configs from marker and model mapping
+        :param dtype: float type of extracted cycles np.float32 or np.float64
+        """
         self._configs = configs
+        self._dtype = dtype
 
     def extract_data(self,
                      cycles: gaitalytics.utils.GaitCycleList,
-                     file_handler: gaitalytics.files.FileHandler) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+                     file_handler: gaitalytics.files.FileHandler,
+                     keys: Collection[str] = None) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+        """
+        :param cycles: cycles to cut
+        :param file_handler: file with points
+        :param keys: if given, only these keys are extracted and points without any of them are not read
+        :return: cycles by key
+        """
         subject = file_handler.get_subject_measures()
         data_list: Dict[str, gaitalytics.utils.BasicCyclePoint] = {}
-        for point_index in range(0, file_handler.get_points_size()):
-            cycle_counts_left = len(cycles.left_cycles.values())
-            cycle_counts_right = len(cycles.right_cycles.values())
-            cycle_counts = 0
-            if cycle_counts_left > cycle_counts_right:
-                cycle_counts = cycle_counts_right
-            else:
-                cycle_counts = cycle_counts_left
-
-            longest_cycle_left = cycles.get_longest_cycle_length(gaitalytics.utils.GaitEventContext.LEFT)
-            longest_cycle_right = cycles.get_longest_cycle_length(gaitalytics.utils.GaitEventContext.RIGHT)
-
-            point = file_handler.get_point(point_index)
-
-            for direction_index in range(0, len(point.values[0])):
-                label = point.label
-                data_type = point.type
-                translated_label = self._configs.get_translated_label(label, data_type)
-                if translated_label is not None:
-                    direction = gaitalytics.utils.AxesNames(direction_index)
-                    left = self._create_point_cycle(cycle_counts, longest_cycle_left, translated_label,
-                                                    direction, data_type, gaitalytics.utils.GaitEventContext.LEFT,
-                                                    subject)
-                    right = self._create_point_cycle(cycle_counts, longest_cycle_right, translated_label,
-                                                     direction, data_type,
-                                                     gaitalytics.utils.GaitEventContext.RIGHT,
-                                                     subject)
-
-                    for cycle_number in range(1, cycles.get_number_of_cycles() + 1):
-                        if len(cycles.right_cycles) + 1 > cycle_number:
-                            self._extract_cycle(right, cycles.right_cycles[cycle_number],
-                                                point.values[:, direction_index])
-                        if len(cycles.left_cycles) + 1 > cycle_number:
-                            self._extract_cycle(left, cycles.left_cycles[cycle_number],
-                                                point.values[:, direction_index])
-
-                    key_left = gaitalytics.utils.ConfigProvider.define_key(translated_label, data_type, direction,
-                                                                           gaitalytics.utils.GaitEventContext.LEFT)
-                    key_right = gaitalytics.utils.ConfigProvider.define_key(translated_label, data_type, direction,
-                                                                            gaitalytics.utils.GaitEventContext.RIGHT)
-                    data_list[key_left] = left
-                    data_list[key_right] = right
+        if keys is not None:
+            keys = set(keys)
+
+        translated_labels, data_types, values = self._load_point_values(file_handler, keys)
+        if not translated_labels:
+            return data_list
+
+        cycle_counts_left = len(cycles.left_cycles.values())
+        cycle_counts_right = len(cycles.right_cycles.values())
+        cycle_counts = cycle_counts_right if cycle_counts_left > cycle_counts_right else cycle_counts_left
+
+        context_cycles = {gaitalytics.utils.GaitEventContext.LEFT: cycles.left_cycles,
+                          gaitalytics.utils.GaitEventContext.RIGHT: cycles.right_cycles}
+        context_data = {}
+        for context in context_cycles:
+            starts, ends, event_frames = self._get_cycle_frames(context_cycles[context], cycle_counts)
+            frames = np.stack([starts, ends], axis=1)
+            cycle_values, offsets = self._cut_cycles(values, starts, ends)
+            context_data[context] = [cycle_values, offsets, frames, event_frames]
+
+        for point_index in range(len(translated_labels)):
+            translated_label = translated_labels[point_index]
+            data_type = data_types[point_index]
+            for direction in gaitalytics.utils.AxesNames:
+                for context in context_data:
+                    [cycle_values, offsets, frames, event_frames] = context_data[context]
+                    key = gaitalytics.utils.ConfigProvider.define_key(translated_label, data_type, direction, context)
+                    if keys is not None and key not in keys:
+                        continue
+                    data_list[key] = self._create_point_cycle(cycle_values[point_index, direction.value],
+                                                              offsets,
+                                                              frames,
+                                                              event_frames,
+                                                              translated_label,
+                                                              direction,
+                                                              data_type,
+                                                              context,
+                                                              subject)
 
         return data_list
 
+    def _load_point_values(self, file_handler: gaitalytics.files.FileHandler,
+                           keys: Set[str] = None) -> [List[Enum], List[gaitalytics.utils.PointDataType], np.ndarray]:
+        """
+        Reads all mapped points, or mapped points with any of the keys, once into a (points x frames x 3) tensor
+        """
+        translated_labels = []
+        data_types = []
+        point_values = []
+        for point_index in range(0, file_handler.get_points_size()):
+            label, point_type = file_handler.get_point_info(point_index)
+            translated_label = self._configs.get_translated_label(label, point_type)
+            if translated_label is not None and (keys is None or self._is_required(translated_label, point_type, keys)):
+                translated_labels.append(translated_label)
+                data_types.append(point_type)
+                point_values.append(file_handler.get_point(point_index).values)
+        values = np.stack(point_values).astype(self._dtype, copy=False) if point_values else None
+        return translated_labels, data_types, values
+
+    @staticmethod
+    def _is_required(translated_label: Enum, data_type: gaitalytics.utils.PointDataType, keys: Set[str]) -> bool:
+        return any(gaitalytics.utils.ConfigProvider.define_key(translated_label, data_type, direction, context) in keys
+                   for direction in gaitalytics.utils.AxesNames for context in gaitalytics.utils.GaitEventContext)
+
+    @staticmethod
+    def _get_cycle_frames(cycles: Dict[int, gaitalytics.utils.GaitCycle],
+                          cycle_counts: int) -> [np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Collects start, end and relative event frames of the first cycle_counts cycles
+        """
+        context_cycles = [cycles[cycle_number] for cycle_number in range(1, cycle_counts + 1)]
+        event_dtype = gaitalytics.utils.TestCyclePoint.EVENT_DTYPE
+        starts = np.array([cycle.start_frame for cycle in context_cycles], dtype=event_dtype)
+        ends = np.array([cycle.end_frame for cycle in context_cycles], dtype=event_dtype)
+        event_frames = np.array([list(cycle.unused_events.values()) for cycle in context_cycles], dtype=event_dtype)
+        event_frames = event_frames.reshape(len(context_cycles), -1) - starts[:, np.newaxis]
+        return starts, ends, event_frames
+
+    @staticmethod
+    def _cut_cycles(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> [np.ndarray, np.ndarray]:
+        """
+        Cuts all cycles of all points in one gather. Cycles are stored back to back without padding.
+
+        :param values: point tensor (points x frames x 3)
+        :param starts: start frames of cycles
+        :param ends: end frames of cycles
+        :return: cycle tensor (points x 3 x recorded cycle frames), offsets of cycles in the last axis
+        """
+        lengths = ends - starts
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        frame_index = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return np.moveaxis(values, 2, 1)[:, :, frame_index], offsets
+
     @staticmethod
-    def _create_point_cycle(cycle_counts: int,
-                            longest_cycle,
+    def _create_point_cycle(values: np.ndarray,
+                            offsets: np.ndarray,
+                            frames: np.ndarray,
+                            event_frames: np.ndarray,
                             label: Enum,
                             direction: gaitalytics.utils.AxesNames,
                             data_type: gaitalytics.utils.PointDataType,
                             context: gaitalytics.utils.GaitEventContext,
                             subject: gaitalytics.utils.SubjectMeasures) -> gaitalytics.utils.TestCyclePoint:
-        cycle = gaitalytics.utils.TestCyclePoint(cycle_counts, longest_cycle,
-                                                 gaitalytics.utils.BasicCyclePoint.TYPE_RAW)
+        cycle = gaitalytics.utils.TestCyclePoint.from_ragged(values, offsets, frames, event_frames,
+                                                             gaitalytics.utils.BasicCyclePoint.TYPE_RAW)
         cycle.direction = direction
         cycle.context = context
         cycle.translated_label = label
@@ -151,15 +207,6 @@ class CycleDataExtractor:
         cycle.subject = subject
         return cycle
 
-    @staticmethod
-    def _extract_cycle(cycle_point: gaitalytics.utils.TestCyclePoint,
-                       cycle: gaitalytics.utils.GaitCycle, values: np.array):
-        cycle_point.data_table.loc[cycle.number][0:cycle.length] = values[cycle.start_frame: cycle.end_frame]
-        events = np.array(list(cycle.unused_events.values()))
-        events = events - cycle.start_frame
-        cycle_point.event_frames.loc[cycle.number] = events
-        cycle_point.frames.loc[cycle.number] = [cycle.start_frame, cycle.end_frame]
-
 
 # Normalisation
 class TimeNormalisationAlgorithm(ABC):
@@ -177,55 +224,257 @@ class TimeNormalisationAlgorithm(ABC):
     def normalise(self,
                   r_data_list: Dict[str, gaitalytics.utils.BasicCyclePoint]) -> \
             Dict[str, gaitalytics.utils.BasicCyclePoint]:
-        n_data_list = {}
+        return self.normalise_multiple(r_data_list, [self._number_frames])[self._number_frames]
+
+    def normalise_multiple(self,
+                           r_data_list: Dict[str, gaitalytics.utils.BasicCyclePoint],
+                           numbers_frames: List[int]) -> Dict[int, Dict[str, gaitalytics.utils.BasicCyclePoint]]:
+        """
+        Normalises all cycles of each point in one batch to every given number of frames
+
+        :param r_data_list: full length cycle data
+        :param numbers_frames: target lengths e.g. [100, 101]
+        :return: normalised cycle data per target length
+        """
+        n_data_lists = {number_frames: {} for number_frames in numbers_frames}
         for data_key in r_data_list:
             r_cycle_point = r_data_list[data_key]
             if r_cycle_point.data_type in self._data_type_fiter:
-                n_cycle_point = gaitalytics.utils.TestCyclePoint(len(r_cycle_point.data_table),
-                                                                 self._number_frames,
-                                                                 gaitalytics.utils.BasicCyclePoint.TYPE_NORM)
-                n_cycle_point.cycle_point_type = gaitalytics.utils.BasicCyclePoint.TYPE_NORM
-                n_cycle_point.translated_label = r_cycle_point.translated_label
-                n_cycle_point.direction = r_cycle_point.direction
-                n_cycle_point.data_type = r_cycle_point.data_type
-                n_cycle_point.context = r_cycle_point.context
-                n_cycle_point.subject = r_cycle_point.subject
-                n_cycle_point.frames = r_cycle_point.frames
-
-                for cycle_key in r_cycle_point.data_table.index.to_list():
-                    cycle_data = r_cycle_point.data_table.loc[cycle_key].to_list()
-
-                    interpolated_data = self._run_algorithm(cycle_data, self._number_frames)
-                    n_cycle_point.data_table.loc[cycle_key] = interpolated_data
-                    events = self._define_event_frame(np.array(r_cycle_point.event_frames.loc[cycle_key].to_list()),
-                                                      len(cycle_data),
-                                                      self._number_frames)
-                    n_cycle_point.event_frames.loc[cycle_key] = events
-                n_data_list[data_key] = n_cycle_point
-        return n_data_list
+                values = r_cycle_point.ragged_values
+                offsets = r_cycle_point.ragged_offsets
+                lengths = np.diff(offsets)
+                frames = r_cycle_point.frames.to_numpy()
+                event_frames = r_cycle_point.event_frames.to_numpy()
+
+                for number_frames in numbers_frames:
+                    interpolated_data = np.ascontiguousarray(self._run_algorithm(values, offsets, number_frames),
+                                                             dtype=values.dtype)
+                    events = self._define_event_frame(event_frames, lengths[:, np.newaxis], number_frames)
+                    n_cycle_point = gaitalytics.utils.TestCyclePoint.from_arrays(
+                        interpolated_data,
+                        frames,
+                        events.astype(gaitalytics.utils.TestCyclePoint.EVENT_DTYPE),
+                        gaitalytics.utils.BasicCyclePoint.TYPE_NORM)
+                    n_cycle_point.translated_label = r_cycle_point.translated_label
+                    n_cycle_point.direction = r_cycle_point.direction
+                    n_cycle_point.data_type = r_cycle_point.data_type
+                    n_cycle_point.context = r_cycle_point.context
+                    n_cycle_point.subject = r_cycle_point.subject
+                    n_data_lists[number_frames][data_key] = n_cycle_point
+        return n_data_lists
 
     @abstractmethod
-    def _run_algorithm(self, data: np.array,
-                       number_frames: int = 100) -> np.array:
+    def _run_algorithm(self, values: np.ndarray, offsets: np.ndarray,
+                       number_frames: int = 100) -> np.ndarray:
+        """
+        Resamples all cycles at once
+
+        :param values: recorded values of all cycles back to back
+        :param offsets: start of each cycle in values, followed by the total length
+        :param number_frames: target length
+        :return: cycles x number_frames
+        """
         pass
 
     @abstractmethod
-    def _define_event_frame(self, event_frames: np.array, frame_number_cycle: int, number_frames: int = 100) -> int:
+    def _define_event_frame(self, event_frames: np.ndarray, frame_number_cycle: np.ndarray,
+                            number_frames: int = 100) -> np.ndarray:
         pass
 
 
 class LinearTimeNormalisation(TimeNormalisationAlgorithm):
 
-    def _define_event_frame(self, event_frames: DataFrame, frame_number_cycle: int, number_frames: int = 100) -> int:
+    def _define_event_frame(self, event_frames: np.ndarray, frame_number_cycle: np.ndarray,
+                            number_frames: int = 100) -> np.ndarray:
         events = event_frames / frame_number_cycle * number_frames
         return events.round()
 
-    def _run_algorithm(self, data: np.array, number_frames: int = 100) -> np.array:
-        data = np.array(data)
-        data = data[np.logical_not(np.isnan(data))]
-        times = np.arange(0, len(data), 1)
-        times_new = np.linspace(0, len(data), num=number_frames)
-        return np.interp(times_new, times, data)
+    def _run_algorithm(self, values: np.ndarray, offsets: np.ndarray, number_frames: int = 100) -> np.ndarray:
+        """
+        Missing samples are left out and the remaining samples of a cycle are stretched over the cycle, like
+        np.interp on the samples without NaN. Cycles without samples are NaN.
+        """
+        missing = np.isnan(values)
+        if missing.any():
+            values = values[~missing]
+            offsets = np.concatenate([[0], np.cumsum(~missing)])[offsets]
+        lengths = np.diff(offsets)
+        if len(values) == 0:
+            return np.full((len(lengths), number_frames), np.nan)
+        times_new = np.linspace(0, lengths, num=number_frames, axis=1)
+        last_index = np.maximum(lengths - 1, 0)[:, np.newaxis]
+        index_before = np.minimum(np.floor(times_new).astype(np.int64), last_index)
+        index_after = np.minimum(index_before + 1, last_index)
+        weight = np.clip(times_new - index_before, 0, 1)
+        values_before = values[np.minimum(offsets[:-1, np.newaxis] + index_before, len(values) - 1)]
+        values_after = values[np.minimum(offsets[:-1, np.newaxis] + index_after, len(values) - 1)]
+        normalised = values_before + (values_after - values_before) * weight
+        normalised[lengths == 0] = np.nan
+        return normalised
+
+
+class CyclePointBuffer:
+    """
+    Stores all cycle points of one trial and cycle type in one npy file with the values and one npz file with the
+    index. Values of all points are concatenated without padding, cycle offsets, frames and events are stored per
+    point in the same order as the keys. Values are memory mapped on read. Each buffer file has a json manifest with
+    the keys and metadata of its points. Manifests are written per file, so trials can be buffered into the same
+    folder at the same time.
+    """
+    MANIFEST_FILE_EXTENSION = "manifest.json"
+    FILE_EXTENSION = "npz"
+    VALUES_FILE_EXTENSION = "npy"
+    KEYS = "keys"
+    POINT_OFFSETS = "point_offsets"
+    CYCLE_INDEX = "cycle_index"
+    CYCLE_OFFSETS = "cycle_offsets"
+    FRAMES = "frames"
+    EVENT_FRAMES = "event_frames"
+    CYCLE_POINT_TYPE = "cycle_point_type"
+    SUBJECT = "subject"
+
+    @classmethod
+    def define_file_name(cls, prefix: str, cycle_point_type: str) -> str:
+        return f"{prefix}{gaitalytics.utils.FILENAME_DELIMITER}{cycle_point_type}.{cls.FILE_EXTENSION}"
+
+    @classmethod
+    def define_values_file_path(cls, file_path: str) -> str:
+        return f"{os.path.splitext(file_path)[0]}.{cls.VALUES_FILE_EXTENSION}"
+
+    @classmethod
+    def define_manifest_file_path(cls, file_path: str) -> str:
+        return f"{os.path.splitext(file_path)[0]}.{cls.MANIFEST_FILE_EXTENSION}"
+
+    @classmethod
+    def write(cls, cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint], dir_path: str, prefix: str) -> List[str]:
+        """
+        Writes cycle points in one file per cycle point type
+
+        :param cycle_data: cycle points by key
+        :param dir_path: path to folder
+        :param prefix: name of trial
+        :return: paths of written files
+        """
+        type_keys: Dict[str, List[str]] = {}
+        for key in cycle_data:
+            type_keys.setdefault(cycle_data[key].cycle_point_type, []).append(key)
+
+        file_paths = []
+        for cycle_point_type, keys in type_keys.items():
+            points = [cycle_data[key] for key in keys]
+            values = [point.ragged_values for point in points]
+            cycle_counts = [len(point.ragged_offsets) - 1 for point in points]
+            point_offsets = np.concatenate([[0], np.cumsum([len(value) for value in values])])
+            file_path = os.path.join(dir_path, cls.define_file_name(prefix, cycle_point_type))
+            np.save(cls.define_values_file_path(file_path), np.concatenate(values))
+            np.savez(file_path,
+                     **{cls.KEYS: np.array(keys),
+                        cls.POINT_OFFSETS: point_offsets,
+                        cls.CYCLE_INDEX: np.concatenate([[0], np.cumsum(cycle_counts)]),
+                        cls.CYCLE_OFFSETS: np.concatenate([point.ragged_offsets for point in points]),
+                        cls.FRAMES: np.concatenate([point.frames.to_numpy() for point in points]),
+                        cls.EVENT_FRAMES: np.concatenate([point.event_frames.to_numpy() for point in points]),
+                        cls.CYCLE_POINT_TYPE: np.array(cycle_point_type),
+                        cls.SUBJECT: np.array(yaml.dump(points[0].subject))})
+            file_paths.append(file_path)
+            cls._write_manifest(file_path, cls._define_manifest_entry(file_path, prefix, cycle_point_type, keys))
+        return file_paths
+
+    @classmethod
+    def _define_manifest_entry(cls, file_path: str, prefix: str, cycle_point_type: str, keys: List[str]) -> Dict:
+        manifest_points = []
+        for key in keys:
+            label, data_type, direction, context = gaitalytics.utils.get_meta_data_key(key)
+            manifest_points.append({"key": key,
+                                    "label": label,
+                                    "data_type": data_type.name,
+                                    "direction": direction.name,
+                                    "context": context.value})
+        return {"file": os.path.basename(file_path),
+                "values_file": os.path.basename(cls.define_values_file_path(file_path)),
+                "prefix": prefix,
+                "cycle_point_type": cycle_point_type,
+                "points": manifest_points}
+
+    @classmethod
+    def _write_manifest(cls, file_path: str, entry: Dict):
+        """
+        Writes the manifest of one buffer file through a temporary file of this process
+        """
+        manifest_path = cls.define_manifest_file_path(file_path)
+        temp_path = f"{manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, manifest_path)
+
+    @classmethod
+    def read_manifest(cls, dir_path: str) -> List[Dict] | None:
+        """
+        :param dir_path: path to folder
+        :return: manifest entries of all buffer files in the folder or None if folder has no manifest
+        """
+        manifest_file_names = sorted(file_name for file_name in os.listdir(dir_path)
+                                     if file_name.endswith(f".{cls.MANIFEST_FILE_EXTENSION}"))
+        if not manifest_file_names:
+            return None
+        manifest = []
+        for file_name in manifest_file_names:
+            with open(os.path.join(dir_path, file_name), "r") as f:
+                manifest.append(json.load(f))
+        return manifest
+
+    @classmethod
+    def read(cls, configs: gaitalytics.utils.ConfigProvider,
+             file_path: str,
+             manifest_entry: Dict = None,
+             memory_map: bool = True) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+        """
+        Reads the index of a buffer file at once and memory maps the values. Points are views on the mapped values,
+        only cycles which are accessed are read from disk.
+
+        :param configs: configs from marker and model mapping. If None, translated labels are not resolved
+        :param file_path: path of buffer file
+        :param manifest_entry: entry of the file in the manifest. If given, metadata is taken from it instead of
+            parsing the keys
+        :param memory_map: if False, the values are read into memory and do not depend on the file afterwards
+        :return: cycle points by key
+        """
+        values = np.asarray(np.load(cls.define_values_file_path(file_path), mmap_mode="r" if memory_map else None))
+        with np.load(file_path) as buffer:
+            keys = buffer[cls.KEYS]
+            point_offsets = buffer[cls.POINT_OFFSETS]
+            cycle_index = buffer[cls.CYCLE_INDEX]
+            cycle_offsets = buffer[cls.CYCLE_OFFSETS]
+            frames = buffer[cls.FRAMES]
+            event_frames = buffer[cls.EVENT_FRAMES]
+            cycle_point_type = str(buffer[cls.CYCLE_POINT_TYPE])
+            subject = yaml.safe_load(str(buffer[cls.SUBJECT]))
+
+        if manifest_entry is None:
+            meta_data = [[str(key)] + gaitalytics.utils.get_meta_data_key(str(key)) for key in keys]
+        else:
+            meta_data = [[entry["key"],
+                          entry["label"],
+                          gaitalytics.utils.PointDataType[entry["data_type"]],
+                          gaitalytics.utils.AxesNames[entry["direction"]],
+                          gaitalytics.utils.GaitEventContext(entry["context"])] for entry in manifest_entry["points"]]
+
+        cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint] = {}
+        for point_index, [key, label, data_type, direction, context] in enumerate(meta_data):
+            start, end = cycle_index[point_index], cycle_index[point_index + 1]
+            point = gaitalytics.utils.TestCyclePoint.from_ragged(
+                values[point_offsets[point_index]:point_offsets[point_index + 1]],
+                cycle_offsets[start + point_index:end + point_index + 1],
+                frames[start:end],
+                event_frames[start:end],
+                cycle_point_type)
+            point.translated_label = configs.get_translated_label(label, data_type) if configs is not None else None
+            point.data_type = data_type
+            point.direction = direction
+            point.context = context
+            point.subject = subject
+            cycle_data[key] = point
+        return cycle_data
 
 
 class CyclePointLoader:
@@ -233,7 +482,35 @@ class CyclePointLoader:
     def __init__(self, configs: gaitalytics.utils.ConfigProvider, dir_path: str):
         self._raw_cycle_data = {}
         self._norm_cycle_data = {}
+        self._scan_folder(configs, dir_path)
+
+    def _scan_folder(self, configs: gaitalytics.utils.ConfigProvider, dir_path: str):
+        """
+        Reads all buffer files of the folder, with metadata from their manifest if there is one. Legacy folders hold
+        one csv per cycle point
+        """
         file_names = os.listdir(dir_path)
+        buffer_file_names = self._filter_buffer_filenames(file_names)
+        if buffer_file_names:
+            manifest = {entry["file"]: entry for entry in CyclePointBuffer.read_manifest(dir_path) or []}
+            for file_name in buffer_file_names:
+                self._read_buffer_file(configs, dir_path, file_name, manifest.get(file_name))
+        else:
+            self._read_csv_files(configs, dir_path, file_names)
+
+    def _read_buffer_file(self, configs: gaitalytics.utils.ConfigProvider, dir_path: str, file_name: str,
+                          manifest_entry: Dict = None):
+        cycle_data = CyclePointBuffer.read(configs, os.path.join(dir_path, file_name), manifest_entry)
+        for key, point in cycle_data.items():
+            if point.cycle_point_type == gaitalytics.utils.BasicCyclePoint.TYPE_NORM:
+                self._norm_cycle_data[key] = point
+            else:
+                self._raw_cycle_data[key] = point
+
+    def _read_csv_files(self, configs: gaitalytics.utils.ConfigProvider, dir_path: str, file_names: List[str]):
+        """
+        buffers with one csv per cycle point
+        """
         postfix = gaitalytics.utils.BasicCyclePoint.TYPE_RAW
         raw_file_names = self._filter_filenames(file_names, postfix)
         subject = gaitalytics.utils.SubjectMeasures.from_file(f"{dir_path}/subject.yml")
@@ -256,6 +533,13 @@ class CyclePointLoader:
             cycle_data[key] = point
         return cycle_data
 
+    @staticmethod
+    def _filter_buffer_filenames(file_names) -> List[str]:
+        postfixes = [gaitalytics.utils.BasicCyclePoint.TYPE_RAW, gaitalytics.utils.BasicCyclePoint.TYPE_NORM]
+        r = re.compile(f".*{gaitalytics.utils.FILENAME_DELIMITER}({'|'.join(postfixes)})"
+                       f"\\.{CyclePointBuffer.FILE_EXTENSION}$")
+        return sorted(filter(r.match, file_names))
+
     @classmethod
     def _filter_filenames(cls, file_names, postfix) -> List[str]:
         r = re.compile(f".*{gaitalytics.utils.FILENAME_DELIMITER}{postfix}.*\.csv")
@@ -1,12 +1,18 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from types import MappingProxyType
 from typing import List
 
 import numpy as np
-from btk import btkAcquisition, btkForcePlatformsExtractor, btkGroundReactionWrenchFilter
 from matplotlib import pyplot as plt
 from scipy import signal
 
+try:
+    import btk
+except ImportError:
+    btk = None
+
 import gaitalytics.files
 import gaitalytics.utils
 
@@ -96,14 +102,18 @@ class ZenisGaitEventDetector(AbstractGaitEventDetector):
                               left_heel,
                               sacrum, f"{base_title}_left_heel")
 
+        progression_flip = gaitalytics.files.is_progression_axes_flip(
+            file_handler.get_point(self._config.MARKER_MAPPING.left_heel.value).values,
+            file_handler.get_point(self._config.MARKER_MAPPING.left_meta_5.value).values)
+
         self._create_events(file_handler, left_diff_toe, gaitalytics.utils.GaitEventLabel.FOOT_OFF,
-                            gaitalytics.utils.GaitEventContext.LEFT, min_distance, show_plot)
+                            gaitalytics.utils.GaitEventContext.LEFT, progression_flip, min_distance, show_plot)
         self._create_events(file_handler, right_diff_toe, gaitalytics.utils.GaitEventLabel.FOOT_OFF,
-                            gaitalytics.utils.GaitEventContext.RIGHT, min_distance, show_plot)
+                            gaitalytics.utils.GaitEventContext.RIGHT, progression_flip, min_distance, show_plot)
         self._create_events(file_handler, left_diff_heel, gaitalytics.utils.GaitEventLabel.FOOT_STRIKE,
-                            gaitalytics.utils.GaitEventContext.LEFT, min_distance, show_plot)
+                            gaitalytics.utils.GaitEventContext.LEFT, progression_flip, min_distance, show_plot)
         self._create_events(file_handler, right_diff_heel, gaitalytics.utils.GaitEventLabel.FOOT_STRIKE,
-                            gaitalytics.utils.GaitEventContext.RIGHT, min_distance, show_plot)
+                            gaitalytics.utils.GaitEventContext.RIGHT, progression_flip, min_distance, show_plot)
 
     @staticmethod
     def _plot_curves(diff, foot, sacrum, title):
@@ -158,12 +168,11 @@ class ZenisGaitEventDetector(AbstractGaitEventDetector):
                        diff,
                        event_label: gaitalytics.utils.GaitEventLabel,
                        event_context: gaitalytics.utils.GaitEventContext,
+                       progression_flip: bool,
                        min_distance: int = 100,
                        show_plot: bool = False):
         data = diff
-        if gaitalytics.files.is_progression_axes_flip(
-                file_handler.get_point(self._config.MARKER_MAPPING.left_heel.value).values,
-                file_handler.get_point(self._config.MARKER_MAPPING.left_meta_5.value).values):
+        if progression_flip:
             data = data * -1
 
         data = gaitalytics.utils.min_max_norm(data)
@@ -205,14 +214,14 @@ class ForcePlateEventDetection(AbstractGaitEventDetector):
                 force_down_sample = force_plate_down_sample(file_handler.aqc, self._mapped_force_plate[context.value])
                 detection = detect_onset(force_down_sample, threshold=self._weight_threshold)
                 sequence = self._detect_gait_event_type(force_down_sample, detection)
-                self._store_force_plate_events(file_handler.aqc, context, sequence)
+                self._store_force_plate_events(file_handler, context, sequence)
 
-    def _store_force_plate_events(self, btk_acq, context, sequence):
+    def _store_force_plate_events(self, file_handler: gaitalytics.files.FileHandler, context, sequence):
         for elem in sequence:
             event_label = elem[0]
             frame = elem[1]
-            ev = self._create_event(btk_acq, frame, event_label, context)
-            btk_acq.AppendEvent(ev)
+            ev = self._create_event(file_handler, frame, event_label, context)
+            file_handler.add_event(ev)
 
     @staticmethod
     def _detect_gait_event_type(force_plate_signal: list, detected_force_plate_events: np.ndarray) -> list:
@@ -366,7 +375,7 @@ def find_next_event(file_handler: gaitalytics.files.FileHandler, label: str, con
     raise IndexError()
 
 
-def force_plate_down_sample(acq: btkAcquisition, force_plate_index: int) -> list:
+def force_plate_down_sample(acq: btk.btkAcquisition, force_plate_index: int) -> list:
     """
 
     :param acq: c3d file
@@ -377,8 +386,8 @@ def force_plate_down_sample(acq: btkAcquisition, force_plate_index: int) -> list
     last_frame_index = acq.GetLastFrame()
     analog_sample_per_frame = acq.GetNumberAnalogSamplePerFrame()
 
-    force_plate_extractor = btkForcePlatformsExtractor()
-    ground_reaction_filter = btkGroundReactionWrenchFilter()
+    force_plate_extractor = btk.btkForcePlatformsExtractor()
+    ground_reaction_filter = btk.btkGroundReactionWrenchFilter()
 
     force_plate_extractor.SetInput(acq)
     force_plate_collection = force_plate_extractor.GetOutput()
@@ -1,11 +1,19 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
 from statistics import mean
 from typing import List, Dict, Union
 
-import btk
+import numpy as np
 
+import gaitalytics.c3d
 import gaitalytics.utils
 
+try:
+    import btk
+except ImportError:
+    btk = None
+
 ANALOG_VOLTAGE_PREFIX_LABEL = "Voltage."
 
 
@@ -16,24 +24,21 @@ def is_progression_axes_flip(left_heel, left_toe):
 class FileHandler(ABC):
     def __init__(self, file_path: str):
         self._file_path = file_path
+        self._events: List[gaitalytics.utils.GaitEvent] = []
+        self._event_table: np.ndarray | None = None
         self.read_file()
 
     def sort_events(self):
         """
-        sort events in acquisition
+        sort events by frame in place. Only the first event of each frame is kept
         """
-        events = self.get_events()
-
+        self._events.sort(key=lambda event: event.frame)
         value_frame: Dict[int, gaitalytics.utils.GaitEvent] = {}
-
-        for index in range(0, len(events)):
-            if events[index].frame not in value_frame:
-                value_frame[events[index].frame] = events[index]
-
-        sorted_keys: Dict[int, gaitalytics.utils.GaitEvent] = dict(sorted(value_frame.items()))
-
-        self.clear_events()
-        self.set_events(list(sorted_keys.values()))
+        for event in self._events:
+            if event.frame not in value_frame:
+                value_frame[event.frame] = event
+        self._events = list(value_frame.values())
+        self._event_table = None
 
     @abstractmethod
     def read_file(self):
@@ -48,29 +53,47 @@ class FileHandler(ABC):
     def _write_file(self, out_file_path: str):
         pass
 
-    @abstractmethod
     def get_events_size(self) -> int:
-        pass
+        return len(self._events)
 
-    @abstractmethod
     def get_events(self) -> List[gaitalytics.utils.GaitEvent]:
-        pass
+        return list(self._events)
 
-    @abstractmethod
     def set_events(self, events: List[gaitalytics.utils.GaitEvent]):
-        pass
+        self._events = list(events)
+        self._event_table = None
 
-    @abstractmethod
     def get_event(self, index: int) -> gaitalytics.utils.GaitEvent:
-        pass
+        return self._events[index]
+
+    def get_event_table(self) -> np.ndarray:
+        """
+        Frame, label code and context code of all gait events in one structured array. Codes are defined by
+        gaitalytics.utils.get_event_code. Events with other labels or contexts e.g. 'Event' or 'General' are left out.
+        The table is built once and reused until events change.
+
+        :return: structured array with gaitalytics.utils.EVENT_TABLE_DTYPE
+        """
+        if self._event_table is None:
+            events = self._events
+            table = np.empty(len(events), dtype=gaitalytics.utils.EVENT_TABLE_DTYPE)
+            table["frame"] = [event.frame for event in events]
+            table["label"] = [gaitalytics.utils.get_event_code(gaitalytics.utils.GaitEventLabel, event.label)
+                              for event in events]
+            table["context"] = [gaitalytics.utils.get_event_code(gaitalytics.utils.GaitEventContext, event.context)
+                                for event in events]
+            table = table[(table["label"] >= 0) & (table["context"] >= 0)]
+            table.flags.writeable = False
+            self._event_table = table
+        return self._event_table
 
-    @abstractmethod
     def add_event(self, event: gaitalytics.utils.GaitEvent):
-        pass
+        self._events.append(event)
+        self._event_table = None
 
-    @abstractmethod
     def clear_events(self):
-        pass
+        self._events = []
+        self._event_table = None
 
     @abstractmethod
     def get_point_frequency(self) -> int:
@@ -92,15 +115,87 @@ class FileHandler(ABC):
     def get_point(self, marker_index: Union[int, str]) -> gaitalytics.utils.Point:
         pass
 
+    def get_point_info(self, marker_index: Union[int, str]) -> [str, gaitalytics.utils.PointDataType]:
+        """
+        :param marker_index: index or label of point
+        :return: label and type of the point without reading its values if possible
+        """
+        point = self.get_point(marker_index)
+        return [point.label, point.type]
+
     @abstractmethod
     def add_point(self, new_point: gaitalytics.utils.Point):
         pass
 
+    def add_points(self, new_points: List[gaitalytics.utils.Point]):
+        for new_point in new_points:
+            self.add_point(new_point)
+
+    def has_point(self, label: str) -> bool:
+        return any(self.get_point(index).label == label for index in range(self.get_points_size()))
+
+    def get_points_values(self, labels: List[str]) -> np.ndarray:
+        """
+        :param labels: labels of points
+        :return: values stacked to frames x points x 3
+        """
+        return np.stack([self.get_point(label).values for label in labels], axis=1)
+
+    @abstractmethod
+    def set_points_values(self, labels: List[str], values: np.ndarray):
+        """
+        Replaces values of existing points
+
+        :param labels: labels of points
+        :param values: values stacked to frames x points x 3
+        """
+        pass
+
+    @abstractmethod
+    def get_analog_frequency(self) -> float:
+        pass
+
+    @abstractmethod
+    def get_analog_labels(self) -> List[str]:
+        pass
+
+    @abstractmethod
+    def get_analogs_values(self, labels: List[str]) -> np.ndarray:
+        """
+        :param labels: labels of analog channels
+        :return: values stacked to samples x channels
+        """
+        pass
+
+    @abstractmethod
+    def set_analogs_values(self, labels: List[str], values: np.ndarray):
+        """
+        Replaces values of existing analog channels
+
+        :param labels: labels of analog channels
+        :param values: values stacked to samples x channels
+        """
+        pass
+
 
 class BtkFileHandler(FileHandler):
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, configs: gaitalytics.utils.ConfigProvider = None):
+        """
+        Reads a c3d with btk. Point values are copied once into one contiguous array, get_point returns views of it.
+
+        :param file_path: path of c3d file
+        :param configs: if given, only points mapped in the configs are cached. Others are read from btk on demand
+        """
+        if btk is None:
+            raise ImportError("btk is required for BtkFileHandler, use NumpyFileHandler to read without btk")
         self._aqc = None
+        self._configs = configs
+        self._point_labels: List[str] = []
+        self._point_index: Dict[str, int] = {}
+        self._point_types: List[gaitalytics.utils.PointDataType] = []
+        self._point_values: np.ndarray | None = None
+        self._point_residuals: np.ndarray | None = None
         super().__init__(file_path)
 
     @property
@@ -110,6 +205,8 @@ class BtkFileHandler(FileHandler):
     @aqc.setter
     def aqc(self, aqc):
         self._aqc = aqc
+        self._read_points()
+        self._read_events()
 
     def get_subject_measures(self) -> gaitalytics.utils.SubjectMeasures:
         body_mass = self._aqc.GetMetaData().GetChild("PROCESSING").GetChild("Bodymass").GetInfo().ToDouble()[0]
@@ -119,16 +216,17 @@ class BtkFileHandler(FileHandler):
         name = self._aqc.GetMetaData().GetChild("SUBJECTS").GetChild("NAMES").GetInfo().ToString()[0].strip()
         start_frame = self._aqc.GetMetaData().GetChild("TRIAL").GetChild("ACTUAL_START_FIELD").GetInfo().ToInt()[0]
         subject = gaitalytics.utils.SubjectMeasures(body_mass, body_height, left_leg_length, right_leg_length, name,
-                                                    start_frame)
+                                                    start_frame, self.get_point_frequency())
         return subject
 
     def _write_file(self, out_file_path: str):
         """
-        write a c3d with Btk
+        write a c3d with Btk. Events are synced back to the acquisition before writing
 
         Args:
             out_file_path (str): filename with its path
         """
+        self._write_events()
         writer = btk.btkAcquisitionFileWriter()
         writer.SetInput(self._aqc)
         writer.SetFilename(out_file_path)
@@ -142,36 +240,55 @@ class BtkFileHandler(FileHandler):
         reader.SetFilename(self._file_path)
         reader.Update()
         self._aqc = reader.GetOutput()
+        self._read_points()
+        self._read_events()
 
         # sort events
         self.sort_events()
 
-    def get_events_size(self) -> int:
-        return self._aqc.GetEventNumber()
-
-    def get_events(self) -> List[gaitalytics.utils.GaitEvent]:
-        events: List[gaitalytics.utils.GaitEvent] = []
-        for event in btk.Iterate(self._aqc.GetEvents()):
-            events.append(self.map_btk_event(event))
-        return events
+    def _read_points(self):
+        """
+        copy values and residuals of all (or all mapped) points once into contiguous arrays
+        """
+        self._point_labels = []
+        cached_points = []
+        for btk_point in btk.Iterate(self._aqc.GetPoints()):
+            label = btk_point.GetLabel()
+            self._point_labels.append(label)
+            point_type = gaitalytics.utils.PointDataType(btk_point.GetType())
+            if self._configs is None or self._configs.get_translated_label(label, point_type) is not None:
+                cached_points.append([label, point_type, btk_point])
+
+        number_frames = self._aqc.GetPointFrameNumber()
+        self._point_index = {}
+        self._point_types = []
+        self._point_values = np.empty((len(cached_points), number_frames, 3))
+        self._point_residuals = np.empty((len(cached_points), number_frames, 1))
+        for index, [label, point_type, btk_point] in enumerate(cached_points):
+            self._point_index[label] = index
+            self._point_types.append(point_type)
+            self._point_values[index] = btk_point.GetValues()
+            self._point_residuals[index] = btk_point.GetResiduals()
+
+    def _read_events(self):
+        """
+        load all events of the acquisition once into the event store
+        """
+        actual_start = self.get_actual_start_frame()
+        frequency = self.get_point_frequency()
+        self._events = [self.map_btk_event(event, actual_start, frequency)
+                        for event in btk.Iterate(self._aqc.GetEvents())]
+        self._event_table = None
 
-    def set_events(self, events: List[gaitalytics.utils.GaitEvent]):
+    def _write_events(self):
+        """
+        replace events of the acquisition with the event store
+        """
         new_events = btk.btkEventCollection()
-        for gait_event in events:
+        for gait_event in self._events:
             new_events.InsertItem(self.map_event(gait_event))
-
         self._aqc.SetEvents(new_events)
 
-    def get_event(self, index: int) -> gaitalytics.utils.GaitEvent:
-        btk_event = self._aqc.GetEvent(index)
-        return self.map_btk_event(btk_event)
-
-    def clear_events(self):
-        self._aqc.ClearEvents()
-
-    def add_event(self, event: gaitalytics.utils.GaitEvent):
-        self._aqc.AppendEvent(self.map_event(event))
-
     def get_point_frequency(self) -> int:
         return self._aqc.GetPointFrequency()
 
@@ -179,19 +296,104 @@ class BtkFileHandler(FileHandler):
         return self._aqc.GetMetaData().GetChild("TRIAL").GetChild("ACTUAL_START_FIELD").GetInfo().ToInt()[0] - 1
 
     def get_point(self, marker_index: Union[int, str]) -> gaitalytics.utils.Point:
-        return self.map_btk_point(self._aqc.GetPoint(marker_index))
+        label = self._point_labels[marker_index] if isinstance(marker_index, int) else marker_index
+        index = self._point_index.get(label)
+        if index is None:
+            return self.map_btk_point(self._aqc.GetPoint(marker_index))
+
+        point = gaitalytics.utils.Point()
+        point.values = self._read_only(self._point_values[index])
+        point.label = label
+        point.residuals = self._read_only(self._point_residuals[index])
+        point.type = self._point_types[index]
+        return point
+
+    @staticmethod
+    def _read_only(view: np.ndarray) -> np.ndarray:
+        """
+        the point cache is only written through set_points_values, views handed out are read only
+        """
+        view.flags.writeable = False
+        return view
+
+    def get_point_info(self, marker_index: Union[int, str]) -> [str, gaitalytics.utils.PointDataType]:
+        label = self._point_labels[marker_index] if isinstance(marker_index, int) else marker_index
+        index = self._point_index.get(label)
+        if index is None:
+            return super().get_point_info(marker_index)
+        return [label, self._point_types[index]]
 
     def get_points_size(self) -> int:
-        return self._aqc.GetPointNumber()
+        return len(self._point_labels)
+
+    def has_point(self, label: str) -> bool:
+        return label in self._point_labels
 
     def add_point(self, new_point: gaitalytics.utils.Point):
-        point = btk.btkPoint(new_point.type.value)
-        point.SetValues(new_point.values)
-        point.SetLabel(new_point.label)
-        self._aqc.AppendPoint(point)
+        self.add_points([new_point])
 
-    def map_btk_event(self, btk_event: btk.btkEvent) -> gaitalytics.utils.GaitEvent:
-        gait_event = gaitalytics.utils.GaitEvent(self.get_actual_start_frame(), self.get_point_frequency())
+    def add_points(self, new_points: List[gaitalytics.utils.Point]):
+        """
+        Appends points to the acquisition and extends the point cache once for all of them
+        """
+        btk_points = []
+        for new_point in new_points:
+            point = btk.btkPoint(new_point.type.value)
+            point.SetValues(new_point.values)
+            point.SetLabel(new_point.label)
+            self._aqc.AppendPoint(point)
+            self._point_labels.append(new_point.label)
+            btk_points.append(point)
+        self._cache_points([new_point.label for new_point in new_points],
+                           [new_point.type for new_point in new_points],
+                           [point.GetValues() for point in btk_points],
+                           [point.GetResiduals() for point in btk_points])
+
+    def _cache_points(self, labels: List[str], point_types: List[gaitalytics.utils.PointDataType],
+                      values: List[np.ndarray], residuals: List[np.ndarray]):
+        if not labels:
+            return
+        for label, point_type in zip(labels, point_types):
+            self._point_index[label] = len(self._point_types)
+            self._point_types.append(point_type)
+        self._point_values = np.concatenate([self._point_values, np.stack(values)])
+        self._point_residuals = np.concatenate([self._point_residuals, np.stack(residuals)])
+
+    def get_points_values(self, labels: List[str]) -> np.ndarray:
+        indices = [self._point_index.get(label) for label in labels]
+        if None in indices:
+            return super().get_points_values(labels)
+        return self._point_values[indices].transpose(1, 0, 2)
+
+    def set_points_values(self, labels: List[str], values: np.ndarray):
+        """
+        Replaces values in the acquisition and in place in the point cache
+        """
+        for index, label in enumerate(labels):
+            self._aqc.GetPoint(label).SetValues(np.ascontiguousarray(values[:, index]))
+            if label in self._point_index:
+                self._point_values[self._point_index[label]] = values[:, index]
+
+    def get_analog_frequency(self) -> float:
+        return self._aqc.GetAnalogFrequency()
+
+    def get_analog_labels(self) -> List[str]:
+        return [analog.GetLabel() for analog in btk.Iterate(self._aqc.GetAnalogs())]
+
+    def get_analogs_values(self, labels: List[str]) -> np.ndarray:
+        return np.concatenate([self._aqc.GetAnalog(label).GetValues() for label in labels], axis=1)
+
+    def set_analogs_values(self, labels: List[str], values: np.ndarray):
+        for index, label in enumerate(labels):
+            self._aqc.GetAnalog(label).SetValues(np.ascontiguousarray(values[:, index:index + 1]))
+
+    def map_btk_event(self, btk_event: btk.btkEvent, actual_start: int = None,
+                      frequency: int = None) -> gaitalytics.utils.GaitEvent:
+        if actual_start is None:
+            actual_start = self.get_actual_start_frame()
+        if frequency is None:
+            frequency = self.get_point_frequency()
+        gait_event = gaitalytics.utils.GaitEvent(actual_start, frequency)
         gait_event.time = btk_event.GetTime()
         gait_event.context = btk_event.GetContext()
         gait_event.subject = btk_event.GetSubject()
@@ -221,3 +423,212 @@ class BtkFileHandler(FileHandler):
         point.residuals = btk_point.GetResiduals()
         point.type = gaitalytics.utils.PointDataType(btk_point.GetType())
         return point
+
+
+class NumpyFileHandler(FileHandler):
+    POINT_TYPE_PARAMETERS = {gaitalytics.utils.PointDataType.Angles: "ANGLES",
+                             gaitalytics.utils.PointDataType.Forces: "FORCES",
+                             gaitalytics.utils.PointDataType.Moments: "MOMENTS",
+                             gaitalytics.utils.PointDataType.Power: "POWERS",
+                             gaitalytics.utils.PointDataType.Scalar: "SCALARS",
+                             gaitalytics.utils.PointDataType.Reaction: "REACTIONS"}
+
+    def __init__(self, file_path: str):
+        """
+        Reads a c3d without btk. Header, parameters and events are parsed on read, the data section is memory
+        mapped and point or analog values are only decoded when requested.
+
+        :param file_path: path of c3d file
+        """
+        self._reader: gaitalytics.c3d.C3dReader | None = None
+        self._point_labels: List[str] = []
+        self._point_index: Dict[str, int] = {}
+        self._point_types: Dict[str, gaitalytics.utils.PointDataType] = {}
+        self._added_points: Dict[str, gaitalytics.utils.Point] = {}
+        self._replaced_analogs: Dict[str, np.ndarray] = {}
+        super().__init__(file_path)
+
+    @property
+    def reader(self) -> gaitalytics.c3d.C3dReader:
+        return self._reader
+
+    def read_file(self):
+        """
+        read header, parameters and events of a c3d
+        """
+        self._reader = gaitalytics.c3d.C3dReader(self._file_path)
+        self._point_labels = list(self._reader.point_labels)
+        self._point_index = {}
+        for index, label in enumerate(self._point_labels):
+            self._point_index.setdefault(label, index)
+        self._point_types = self._read_point_types()
+        self._added_points = {}
+        self._replaced_analogs = {}
+        self._read_events()
+
+        # sort events
+        self.sort_events()
+
+    def _write_file(self, out_file_path: str):
+        raise NotImplementedError("NumpyFileHandler is read only, use BtkFileHandler to write c3d files")
+
+    def _read_point_types(self) -> Dict[str, gaitalytics.utils.PointDataType]:
+        point_types = {}
+        for point_type, parameter in self.POINT_TYPE_PARAMETERS.items():
+            for label in self._get_strings("POINT", parameter):
+                point_types.setdefault(label, point_type)
+        return point_types
+
+    def _read_events(self):
+        """
+        load all events of the EVENT parameter group into the event store
+        """
+        number_events = int(self._reader.get_parameter_value("EVENT", "USED", 0))
+        self._events = []
+        self._event_table = None
+        if number_events == 0:
+            return
+
+        actual_start = self.get_actual_start_frame()
+        frequency = self.get_point_frequency()
+        times = self._reader.get_parameter_values("EVENT", "TIMES").reshape(-1, 2)
+        contexts = self._get_strings("EVENT", "CONTEXTS", number_events)
+        labels = self._get_strings("EVENT", "LABELS", number_events)
+        descriptions = self._get_strings("EVENT", "DESCRIPTIONS", number_events)
+        subjects = self._get_strings("EVENT", "SUBJECTS", number_events)
+        icon_ids = self._get_integers("EVENT", "ICON_IDS", number_events)
+        generic_flags = self._get_integers("EVENT", "GENERIC_FLAGS", number_events)
+        for index in range(number_events):
+            gait_event = gaitalytics.utils.GaitEvent(actual_start, frequency)
+            gait_event.time = float(times[index, 0] * 60 + times[index, 1])
+            gait_event.context = contexts[index]
+            gait_event.subject = subjects[index]
+            gait_event.icon_id = icon_ids[index]
+            gait_event.description = descriptions[index]
+            gait_event.generic_flag = generic_flags[index]
+            gait_event.label = labels[index]
+            self._events.append(gait_event)
+
+    def _get_strings(self, group: str, name: str, count: int = None) -> List[str]:
+        values = self._reader.get_parameter_values(group, name)
+        if values is None:
+            values = []
+        elif isinstance(values, str):
+            values = [values]
+        if count is None:
+            return values
+        return (values + [""] * count)[:count]
+
+    def _get_integers(self, group: str, name: str, count: int) -> List[int]:
+        values = self._reader.get_parameter_values(group, name)
+        values = [] if values is None else [int(value) for value in np.ravel(values)]
+        return (values + [0] * count)[:count]
+
+    def _get_float(self, group: str, name: str) -> float:
+        return float(self._reader.get_parameter_value(group, name, 0))
+
+    def get_point_frequency(self) -> float:
+        return self._reader.point_rate
+
+    def get_analog_frequency(self) -> float:
+        return self._reader.analog_rate
+
+    def get_actual_start_frame(self) -> int:
+        return self._reader.first_frame - 1
+
+    def get_subject_measures(self) -> gaitalytics.utils.SubjectMeasures:
+        body_mass = self._get_float("PROCESSING", "Bodymass")
+        body_height = self._get_float("PROCESSING", "Height")
+        left_leg_length = self._get_float("PROCESSING", "LLegLength")
+        right_leg_length = self._get_float("PROCESSING", "RLegLength")
+        names = self._get_strings("SUBJECTS", "NAMES", 1)
+        start_frame = self._reader.first_frame
+        return gaitalytics.utils.SubjectMeasures(body_mass, body_height, left_leg_length, right_leg_length, names[0],
+                                                 start_frame, self.get_point_frequency())
+
+    def get_points_size(self) -> int:
+        return len(self._point_labels)
+
+    def has_point(self, label: str) -> bool:
+        return label in self._point_index or label in self._added_points
+
+    def get_point(self, marker_index: Union[int, str]) -> gaitalytics.utils.Point:
+        label = self._point_labels[marker_index] if isinstance(marker_index, int) else marker_index
+        if label in self._added_points:
+            return self._added_points[label]
+
+        point = gaitalytics.utils.Point()
+        point.values, point.residuals = self._reader.get_point_values(self._point_index[label])
+        point.label = label
+        point.type = self._point_types.get(label, gaitalytics.utils.PointDataType.Marker)
+        return point
+
+    def get_point_info(self, marker_index: Union[int, str]) -> [str, gaitalytics.utils.PointDataType]:
+        label = self._point_labels[marker_index] if isinstance(marker_index, int) else marker_index
+        if label in self._added_points:
+            return [label, self._added_points[label].type]
+        return [label, self._point_types.get(label, gaitalytics.utils.PointDataType.Marker)]
+
+    def get_point_values(self, marker_index: Union[int, str], start: int = None, end: int = None) -> np.ndarray:
+        """
+        Decodes the values of one point for a range of frames only
+
+        :param marker_index: index or label of point
+        :param start: first frame index relative to the file start
+        :param end: frame index after the last frame
+        :return: values (frames x 3)
+        """
+        label = self._point_labels[marker_index] if isinstance(marker_index, int) else marker_index
+        if label in self._added_points:
+            return self._added_points[label].values[start:end]
+        values, residuals = self._reader.get_point_values(self._point_index[label], start, end)
+        return values
+
+    def get_analog_labels(self) -> List[str]:
+        return list(self._reader.analog_labels)
+
+    def get_analog_values(self, analog_index: Union[int, str], start: int = None, end: int = None) -> np.ndarray:
+        """
+        Decodes one analog channel for a range of point frames only
+
+        :param analog_index: index or label of analog channel
+        :param start: first point frame index relative to the file start
+        :param end: point frame index after the last frame
+        :return: analog samples
+        """
+        label = self._reader.analog_labels[analog_index] if isinstance(analog_index, int) else analog_index
+        if label in self._replaced_analogs:
+            samples = self._reader.analog_samples_per_frame
+            return self._replaced_analogs[label][_scale_index(start, samples):_scale_index(end, samples)]
+        return self._reader.get_analog_values(self._reader.analog_labels.index(label), start, end)
+
+    def get_analogs_values(self, labels: List[str]) -> np.ndarray:
+        return np.stack([self.get_analog_values(label) for label in labels], axis=1)
+
+    def set_analogs_values(self, labels: List[str], values: np.ndarray):
+        """
+        Keeps the values in memory. Replaced values are not written back to the c3d
+        """
+        for index, label in enumerate(labels):
+            self._replaced_analogs[label] = values[:, index]
+
+    def set_points_values(self, labels: List[str], values: np.ndarray):
+        """
+        Keeps the values in memory. Replaced values are not written back to the c3d
+        """
+        for index, label in enumerate(labels):
+            point = self.get_point(label)
+            point.values = values[:, index]
+            self._added_points[label] = point
+
+    def add_point(self, new_point: gaitalytics.utils.Point):
+        """
+        Keeps the point in memory. Added points are not written back to the c3d
+        """
+        if new_point.label not in self._added_points and new_point.label not in self._point_index:
+            self._point_labels.append(new_point.label)
+        self._added_points[new_point.label] = new_point
+
+
+def _scale_index(index: int | None, factor: int) -> int | None:
+    return None if index is None else index * factor
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import functools
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+
+import numpy as np
+from scipy import signal
+
+import gaitalytics.files
+import gaitalytics.utils
+
+logger = logging.getLogger(__name__)
+
+FILTER_TYPE_LOW = "lowpass"
+FILTER_TYPE_HIGH = "highpass"
+FILTER_TYPE_BAND = "bandpass"
+FILTER_TYPE_LIST = (FILTER_TYPE_LOW, FILTER_TYPE_HIGH, FILTER_TYPE_BAND)
+
+
+@functools.lru_cache(maxsize=None)
+def design_butterworth(order: int, cutoff: float | Tuple[float, float], fs: float,
+                       filter_type: str = FILTER_TYPE_LOW) -> np.ndarray:
+    """
+    Designs a butterworth filter in second order sections. Designs are kept for every combination of parameters.
+
+    :param order: order of the filter
+    :param cutoff: cutoff frequency in Hz, (low, high) for band pass
+    :param fs: sampling frequency in Hz
+    :param filter_type: 'lowpass', 'highpass' or 'bandpass'
+    :return: second order sections, read only
+    """
+    sos = signal.butter(order, cutoff, filter_type, fs=fs, output="sos")
+    sos.flags.writeable = False
+    return sos
+
+
+def filter_values(values: np.ndarray, order: int, cutoff: float | Tuple[float, float], fs: float,
+                  filter_type: str = FILTER_TYPE_LOW) -> np.ndarray:
+    """
+    Zero phase butterworth filter along the first axis. All other axes are filtered in the same call.
+
+    :param values: samples in first axis
+    :param order: order of the filter, the effective order is doubled by the forward and backward pass
+    :param cutoff: cutoff frequency in Hz, (low, high) for band pass
+    :param fs: sampling frequency in Hz
+    :param filter_type: 'lowpass', 'highpass' or 'bandpass'
+    :return: filtered values
+    """
+    # sosfiltfilt needs a writeable copy of the shared design
+    sos = design_butterworth(order, cutoff, float(fs), filter_type).copy()
+    return signal.sosfiltfilt(sos, values, axis=0)
+
+
+class BaseFilter(ABC):
+    """
+    Preprocessing stage filtering selected signals of a file in place
+    """
+
+    def __init__(self, cutoff: float | Tuple[float, float], order: int = 4, filter_type: str = FILTER_TYPE_LOW,
+                 labels: List[str] = None):
+        """
+        :param cutoff: cutoff frequency in Hz, (low, high) for band pass
+        :param order: order of the filter
+        :param filter_type: 'lowpass', 'highpass' or 'bandpass'
+        :param labels: labels of signals to filter, all if None
+        """
+        if filter_type not in FILTER_TYPE_LIST:
+            raise KeyError(f"{filter_type} is not a valid filter type")
+        self._cutoff = tuple(cutoff) if isinstance(cutoff, (list, tuple)) else cutoff
+        self._order = order
+        self._filter_type = filter_type
+        self._labels = labels
+
+    def __repr__(self) -> str:
+        return (f"{self.__class__.__name__}(cutoff={self._cutoff}, order={self._order}, "
+                f"filter_type={self._filter_type}, labels={self._labels})")
+
+    def filter(self, file_handler: gaitalytics.files.FileHandler):
+        labels = self._select_labels(file_handler)
+        if not labels:
+            return
+        logger.info(f"{self!r}: {len(labels)} signals")
+        values = self._get_values(file_handler, labels)
+        filtered = filter_values(values, self._order, self._cutoff, self._get_frequency(file_handler),
+                                 self._filter_type)
+        self._set_values(file_handler, labels, filtered)
+
+    @abstractmethod
+    def _select_labels(self, file_handler: gaitalytics.files.FileHandler) -> List[str]:
+        pass
+
+    @abstractmethod
+    def _get_frequency(self, file_handler: gaitalytics.files.FileHandler) -> float:
+        pass
+
+    @abstractmethod
+    def _get_values(self, file_handler: gaitalytics.files.FileHandler, labels: List[str]) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def _set_values(self, file_handler: gaitalytics.files.FileHandler, labels: List[str], values: np.ndarray):
+        pass
+
+
+class PointFilter(BaseFilter):
+    """
+    Filters points of the selected types stacked to frames x points x 3
+    """
+
+    def __init__(self, cutoff: float | Tuple[float, float], order: int = 4, filter_type: str = FILTER_TYPE_LOW,
+                 labels: List[str] = None,
+                 point_types: List[gaitalytics.utils.PointDataType] = (gaitalytics.utils.PointDataType.Marker,)):
+        """
+        :param point_types: types of points to filter if no labels are given
+        """
+        super().__init__(cutoff, order, filter_type, labels)
+        self._point_types = tuple(point_types)
+
+    def _select_labels(self, file_handler: gaitalytics.files.FileHandler) -> List[str]:
+        if self._labels is not None:
+            return [label for label in self._labels if file_handler.has_point(label)]
+        labels = []
+        for index in range(file_handler.get_points_size()):
+            label, point_type = file_handler.get_point_info(index)
+            if point_type in self._point_types:
+                labels.append(label)
+        return labels
+
+    def _get_frequency(self, file_handler: gaitalytics.files.FileHandler) -> float:
+        return file_handler.get_point_frequency()
+
+    def _get_values(self, file_handler: gaitalytics.files.FileHandler, labels: List[str]) -> np.ndarray:
+        return file_handler.get_points_values(labels)
+
+    def _set_values(self, file_handler: gaitalytics.files.FileHandler, labels: List[str], values: np.ndarray):
+        file_handler.set_points_values(labels, values)
+
+
+class AnalogFilter(BaseFilter):
+    """
+    Filters analog channels stacked to samples x channels
+    """
+
+    def _select_labels(self, file_handler: gaitalytics.files.FileHandler) -> List[str]:
+        analog_labels = file_handler.get_analog_labels()
+        if self._labels is None:
+            return analog_labels
+        return [label for label in self._labels if label in analog_labels]
+
+    def _get_frequency(self, file_handler: gaitalytics.files.FileHandler) -> float:
+        return file_handler.get_analog_frequency()
+
+    def _get_values(self, file_handler: gaitalytics.files.FileHandler, labels: List[str]) -> np.ndarray:
+        return file_handler.get_analogs_values(labels)
+
+    def _set_values(self, file_handler: gaitalytics.files.FileHandler, labels: List[str], values: np.ndarray):
+        file_handler.set_analogs_values(labels, values)
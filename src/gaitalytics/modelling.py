@@ -1,4 +1,7 @@
+from __future__ import annotations
+
 from abc import ABC, abstractmethod
+from typing import Dict, List
 
 import numpy as np
 import scipy as sc
@@ -6,64 +9,148 @@ from matplotlib import pyplot as plt
 
 import gaitalytics.utils
 import gaitalytics.files
+import gaitalytics.filtering
+
+
+class ModelledPointStore:
+    """
+    In memory values of points by label. Points of the file are read once, modelled points are kept until they are
+    written to the file.
+    """
+
+    def __init__(self, file_handler: gaitalytics.files.FileHandler):
+        self._file_handler = file_handler
+        self._values: Dict[str, np.ndarray] = {}
+        self._modelled_labels: List[str] = []
+
+    @property
+    def file_handler(self) -> gaitalytics.files.FileHandler:
+        return self._file_handler
+
+    @property
+    def modelled_labels(self) -> List[str]:
+        return self._modelled_labels
+
+    def has_point(self, label: str) -> bool:
+        return label in self._values or self._file_handler.has_point(label)
+
+    def get_values(self, label: str) -> np.ndarray:
+        if label not in self._values:
+            self._values[label] = self._file_handler.get_point(label).values
+        return self._values[label]
+
+    def add_values(self, label: str, values: np.ndarray):
+        self._values[label] = values
+        self._modelled_labels.append(label)
 
 
 class BaseOutputModeller(ABC):
 
-    def __init__(self, label: str, point_type: gaitalytics.utils.PointDataType):
+    def __init__(self, label: str, point_type: gaitalytics.utils.PointDataType, dependencies: List[str] = None):
+        """
+        :param label: label of the modelled point
+        :param point_type: type of the modelled point
+        :param dependencies: labels of modelled points needed to calculate the point
+        """
         self._label = label
         self._type = point_type
+        self._dependencies = dependencies if dependencies is not None else []
+
+    @property
+    def label(self) -> str:
+        return self._label
+
+    @property
+    def dependencies(self) -> List[str]:
+        return self._dependencies
 
     def create_point(self, file_handler: gaitalytics.files.FileHandler, **kwargs):
-        result = self._calculate_point(file_handler, **kwargs)
+        result = self.calculate(ModelledPointStore(file_handler), **kwargs)
+        file_handler.add_point(self.to_point(result))
+
+    def calculate(self, store: ModelledPointStore, **kwargs) -> np.ndarray:
+        return self._calculate_point(store, **kwargs)
+
+    def to_point(self, values: np.ndarray) -> gaitalytics.utils.Point:
         point = gaitalytics.utils.Point()
         point.type = self._type
-        point.values = result
+        point.values = values
         point.label = self._label
-        file_handler.add_point(point)
+        return point
 
     @abstractmethod
-    def _calculate_point(self, file_handler: gaitalytics.files.FileHandler, **kwargs) -> np.ndarray:
+    def _calculate_point(self, store: ModelledPointStore, **kwargs) -> np.ndarray:
         pass
 
 
+class ModellingGraph:
+    """
+    Evaluates modellers in order of their dependencies. Every point is calculated once, points which already exist
+    in the file are reused. Modelled points are written to the file at once.
+    """
+
+    def __init__(self, modellers: List[BaseOutputModeller]):
+        self._modellers: Dict[str, BaseOutputModeller] = {modeller.label: modeller for modeller in modellers}
+
+    def run(self, file_handler: gaitalytics.files.FileHandler, labels: List[str], **kwargs) -> ModelledPointStore:
+        """
+        :param file_handler: file to model
+        :param labels: labels of points to model
+        :return: store with the values of all used points
+        """
+        store = ModelledPointStore(file_handler)
+        for label in labels:
+            self._evaluate(store, label, **kwargs)
+        file_handler.add_points([self._modellers[label].to_point(store.get_values(label))
+                                 for label in store.modelled_labels])
+        return store
+
+    def _evaluate(self, store: ModelledPointStore, label: str, **kwargs):
+        if store.has_point(label):
+            return
+        modeller = self._modellers[label]
+        for dependency in modeller.dependencies:
+            self._evaluate(store, dependency, **kwargs)
+        store.add_values(label, modeller.calculate(store, **kwargs))
+
+
 class COMModeller(BaseOutputModeller):
 
     def __init__(self, configs: gaitalytics.utils.ConfigProvider):
         super().__init__(configs.MARKER_MAPPING.com.value, gaitalytics.utils.PointDataType.Marker)
         self._configs = configs
 
-    def _calculate_point(self, file_handler: gaitalytics.files.FileHandler, **kwargs):
-        l_hip_b = file_handler.get_point(self._configs.MARKER_MAPPING.left_back_hip.value).values
-        r_hip_b = file_handler.get_point(self._configs.MARKER_MAPPING.right_back_hip.value).values
-        l_hip_f = file_handler.get_point(self._configs.MARKER_MAPPING.left_front_hip.value).values
-        r_hip_f = file_handler.get_point(self._configs.MARKER_MAPPING.right_front_hip.value).values
+    def _calculate_point(self, store: ModelledPointStore, **kwargs):
+        l_hip_b = store.get_values(self._configs.MARKER_MAPPING.left_back_hip.value)
+        r_hip_b = store.get_values(self._configs.MARKER_MAPPING.right_back_hip.value)
+        l_hip_f = store.get_values(self._configs.MARKER_MAPPING.left_front_hip.value)
+        r_hip_f = store.get_values(self._configs.MARKER_MAPPING.right_front_hip.value)
         return (l_hip_b + r_hip_b + l_hip_f + r_hip_f) / 4
 
 
 class XCOMModeller(BaseOutputModeller):
     def __init__(self, configs: gaitalytics.utils.ConfigProvider):
-        super().__init__(configs.MARKER_MAPPING.xcom.value, gaitalytics.utils.PointDataType.Marker)
+        super().__init__(configs.MARKER_MAPPING.xcom.value, gaitalytics.utils.PointDataType.Marker,
+                         [configs.MARKER_MAPPING.com.value])
         self._configs = configs
 
-    def _calculate_point(self, file_handler: gaitalytics.files.FileHandler, **kwargs):
-        com = file_handler.get_point(self._configs.MARKER_MAPPING.com.value).values
+    def _calculate_point(self, store: ModelledPointStore, **kwargs):
+        com = store.get_values(self._configs.MARKER_MAPPING.com.value)
         belt_speed = kwargs.get("belt_speed", 1)
         dominant_leg_length = kwargs.get("dominant_leg_length", 1)
-        return self._calculate_xcom(belt_speed, com, dominant_leg_length)
+        frequency = store.file_handler.get_point_frequency()
+        return self._calculate_xcom(belt_speed, com, dominant_leg_length, frequency)
 
-    def _calculate_xcom(self, belt_speed: float, com: np.ndarray, dominant_leg_length: float):
+    def _calculate_xcom(self, belt_speed: float, com: np.ndarray, dominant_leg_length: float,
+                        frequency: float = 100):
         com_v = self._calculate_point_velocity(com)
-        sos = sc.signal.butter(2, 5,'low', fs= 100, output='sos')
-        com_v[:, 0] = sc.signal.sosfilt(sos, com_v[:, 0])
-        com_v[:, 1] = sc.signal.sosfilt(sos, com_v[:, 1])
-        com_v[:, 2] = sc.signal.sosfilt(sos, com_v[:, 2])
+        com_v = gaitalytics.filtering.filter_values(com_v, 2, 5, frequency)
         # to meter
         dominant_leg_length = (dominant_leg_length / 1000)
         com = com / 1000
 
-        # from mm/(s/100) to m/s
-        com_v = com_v * 100 / 1000
+        # from mm/frame to m/s
+        com_v = com_v * frequency / 1000
 
         # due to minus is progression
         belt_speed = belt_speed * -1
@@ -92,19 +179,20 @@ class CMoSModeller(BaseOutputModeller):
 
     def __init__(self, configs: gaitalytics.utils.ConfigProvider, **kwargs):
         self._configs = configs
-        super().__init__(configs.MARKER_MAPPING.cmos.value, gaitalytics.utils.PointDataType.Marker)
+        super().__init__(configs.MARKER_MAPPING.cmos.value, gaitalytics.utils.PointDataType.Marker,
+                         [configs.MARKER_MAPPING.xcom.value])
 
-    def _calculate_point(self, file_handler: gaitalytics.files.FileHandler, **kwargs) -> np.ndarray:
-        x_com = file_handler.get_point(self._configs.MARKER_MAPPING.xcom.value).values
+    def _calculate_point(self, store: ModelledPointStore, **kwargs) -> np.ndarray:
+        x_com = store.get_values(self._configs.MARKER_MAPPING.xcom.value)
 
-        lat_malleoli_left = file_handler.get_point(self._configs.MARKER_MAPPING.left_lat_malleoli.value).values
-        lat_malleoli_right = file_handler.get_point(self._configs.MARKER_MAPPING.right_lat_malleoli.value).values
-        med_malleoli_left = file_handler.get_point(self._configs.MARKER_MAPPING.left_med_malleoli.value).values
-        med_malleoli_right = file_handler.get_point(self._configs.MARKER_MAPPING.right_med_malleoli.value).values
-        heel_left = file_handler.get_point(self._configs.MARKER_MAPPING.left_heel.value).values
-        heel_right = file_handler.get_point(self._configs.MARKER_MAPPING.right_heel.value).values
-        foot_left = file_handler.get_point(self._configs.MARKER_MAPPING.left_meta_2.value).values
-        foot_right = file_handler.get_point(self._configs.MARKER_MAPPING.right_meta_2.value).values
+        lat_malleoli_left = store.get_values(self._configs.MARKER_MAPPING.left_lat_malleoli.value)
+        lat_malleoli_right = store.get_values(self._configs.MARKER_MAPPING.right_lat_malleoli.value)
+        med_malleoli_left = store.get_values(self._configs.MARKER_MAPPING.left_med_malleoli.value)
+        med_malleoli_right = store.get_values(self._configs.MARKER_MAPPING.right_med_malleoli.value)
+        heel_left = store.get_values(self._configs.MARKER_MAPPING.left_heel.value)
+        heel_right = store.get_values(self._configs.MARKER_MAPPING.right_heel.value)
+        foot_left = store.get_values(self._configs.MARKER_MAPPING.left_meta_2.value)
+        foot_right = store.get_values(self._configs.MARKER_MAPPING.right_meta_2.value)
 
         return self._calculate_cMoS(x_com,
                                     lat_malleoli_left,
@@ -115,7 +203,7 @@ class CMoSModeller(BaseOutputModeller):
                                     foot_right,
                                     heel_left,
                                     heel_right,
-                                    file_handler,
+                                    store,
                                     **kwargs)
 
     def _calculate_cMoS(self,
@@ -128,68 +216,39 @@ class CMoSModeller(BaseOutputModeller):
                         foot_right: np.ndarray,
                         heel_left: np.ndarray,
                         heel_right: np.ndarray,
-                        file_handler: gaitalytics.files.FileHandler,
+                        store: ModelledPointStore,
                         **kwargs) -> np.ndarray:
-        def mos_non_event(x_com_v, frame_index, side):
-            return [0, 0, 0]
-
-        def mos_double_support(x_com_v, frame_index, side):
-            x_com_frame = x_com_v[frame_index]
-            left_boundary = lat_malleoli_left[frame_index, 0]
-            right_boundary = lat_malleoli_right[frame_index, 0]
-            if side == gaitalytics.utils.GaitEventContext.LEFT:
-                front_boundary = foot_left[frame_index, 1]
-                back_boundary = heel_right[frame_index, 1]
-            else:
-                front_boundary = foot_right[frame_index, 1]
-                back_boundary = heel_left[frame_index, 1]
-
-            ap = self._calculate_mos(x_com_frame[1], front_boundary, back_boundary)
-            ml = self._calculate_mos(x_com_frame[0], right_boundary, left_boundary)
-
-            return [ml, ap, 0]
-
-        def mos_single_stance(x_com_v, frame_index, side):
-            x_com_frame = x_com_v[frame_index]
-            if side == gaitalytics.utils.GaitEventContext.LEFT:
-                front_boundary = foot_right[frame_index, 1]
-                back_boundary = heel_right[frame_index, 1]
-                left_boundary = med_malleoli_right[frame_index, 0]
-                right_boundary = lat_malleoli_right[frame_index, 0]
-            else:
-                front_boundary = foot_left[frame_index, 1]
-                back_boundary = heel_left[frame_index, 1]
-                left_boundary = lat_malleoli_left[frame_index, 0]
-                right_boundary = med_malleoli_left[frame_index, 0]
-
-            ap = self._calculate_mos(x_com_frame[1], front_boundary, back_boundary)
-            ml = self._calculate_mos(x_com_frame[0], left_boundary, right_boundary)
-
-            return [ml, ap, 0]
-
         show_plot = kwargs.get("show_plot", False)
-        mos = np.zeros((len(x_com), 3))
-        event_i = 0
-        next_event = file_handler.get_event(event_i)
-        current_context = None
-        mos_function = mos_non_event
-        for frame_i in range(len(x_com)):
-            if frame_i == 1420:
-                print(frame_i)
-
-            if frame_i == next_event.frame:
-                current_context = gaitalytics.utils.GaitEventContext(next_event.context)
-                if next_event.label == gaitalytics.utils.GaitEventLabel.FOOT_STRIKE.value:
-                    mos_function = mos_double_support
-                else:
-                    mos_function = mos_single_stance
-                event_i += 1
-                if event_i < file_handler.get_events_size():
-                    next_event = file_handler.get_event(event_i)
-            mos[frame_i] = mos_function(x_com, frame_i, current_context)
-        mos = mos
+        number_frames = len(x_com)
+
+        # phase of each frame is defined by the last event at or before the frame
+        events = store.file_handler.get_event_table()
+        events = events[(events["frame"] >= 0) & (events["frame"] < number_frames)]
+        event_index = np.searchsorted(events["frame"], np.arange(number_frames), side="right") - 1
+        has_event = event_index >= 0
+        event_index = np.maximum(event_index, 0)
+        double_support = events["label"][event_index] == gaitalytics.utils.get_event_code(
+            gaitalytics.utils.GaitEventLabel, gaitalytics.utils.GaitEventLabel.FOOT_STRIKE.value)
+        left = events["context"][event_index] == gaitalytics.utils.get_event_code(
+            gaitalytics.utils.GaitEventContext, gaitalytics.utils.GaitEventContext.LEFT.value)
+        single_left = ~double_support & left
+        single_right = ~double_support & ~left
+
+        front_boundary = np.where(double_support == left, foot_left[:, 1], foot_right[:, 1])
+        back_boundary = np.where(left, heel_right[:, 1], heel_left[:, 1])
+        minus_boundary = np.select([single_left, single_right],
+                                   [med_malleoli_right[:, 0], lat_malleoli_left[:, 0]],
+                                   lat_malleoli_right[:, 0])
+        plus_boundary = np.select([single_left, single_right],
+                                  [lat_malleoli_right[:, 0], med_malleoli_left[:, 0]],
+                                  lat_malleoli_left[:, 0])
+
+        mos = np.zeros((number_frames, 3))
+        mos[:, 0] = self._calculate_mos(x_com[:, 0], minus_boundary, plus_boundary)
+        mos[:, 1] = self._calculate_mos(x_com[:, 1], front_boundary, back_boundary)
+        mos[~has_event] = 0
         if show_plot:
-            self._show(mos, x_com, file_handler)
+            self._show(mos, x_com, store)
 
         return mos
 
@@ -197,10 +256,10 @@ class CMoSModeller(BaseOutputModeller):
     def _calculate_mos(x_com, minus_boundary, plus_boundary):
         minus_diff = (minus_boundary - x_com) * -1
         plus_diff = plus_boundary - x_com
-        return min([minus_diff, plus_diff])
+        return np.minimum(minus_diff, plus_diff)
 
-    def _show(self, mos, x_com, file_handler):
-        com = file_handler.get_point(self._configs.MARKER_MAPPING.com.value).values
+    def _show(self, mos, x_com, store: ModelledPointStore):
+        com = store.get_values(self._configs.MARKER_MAPPING.com.value)
         fig, axs = plt.subplots(2, 1, figsize=(8, 6))
         (ax1, ax2) = axs  # Unpack the subplots axes
         x_com = x_com
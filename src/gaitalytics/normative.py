@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+import gaitalytics.analysis
+import gaitalytics.utils
+
+logger = logging.getLogger(__name__)
+
+Z_SCORE_THRESHOLD = 2.0
+
+
+class NormativeStore:
+    """
+    Persistent per-frame moments of normalised cycles of controls by key. Controls are added one trial at a time,
+    patients are compared against the stored mean and sd without reading the controls again.
+    """
+
+    def __init__(self, file_path: str):
+        """
+        :param file_path: path of the npz store, it is created on save if it does not exist
+        """
+        self._file_path = file_path
+        if os.path.isfile(file_path):
+            self._accumulator = gaitalytics.analysis.WaveformAccumulator.load(file_path)
+        else:
+            self._accumulator = gaitalytics.analysis.WaveformAccumulator()
+
+    @property
+    def accumulator(self) -> gaitalytics.analysis.WaveformAccumulator:
+        return self._accumulator
+
+    def get_keys(self) -> List[str]:
+        return self._accumulator.get_keys()
+
+    def add(self, cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint]):
+        """
+        :param cycle_data: normalised cycles of one control trial
+        """
+        self._accumulator.add(cycle_data)
+
+    def merge(self, other: NormativeStore):
+        self._accumulator.merge(other.accumulator)
+
+    def save(self):
+        self._accumulator.save(self._file_path)
+
+    def get_reference(self) -> DataFrame:
+        """
+        :return: normative mean, sd, min and max by metric and frame
+        """
+        return self._accumulator.get_results()
+
+    def compare(self, cycle_data: Dict[str, gaitalytics.utils.BasicCyclePoint],
+                threshold: float = Z_SCORE_THRESHOLD) -> [Dict[str, DataFrame], DataFrame]:
+        """
+        Z-scores of each cycle and frame against the normative mean and sd. Points with the same shape are compared
+        in one array operation, points without reference are skipped.
+
+        :param cycle_data: normalised cycles of a patient
+        :param threshold: absolute z-score counted as deviation
+        :return: z-scores by key in the layout of the data tables, summary by cycle number with
+            z_mean_abs, z_max_abs, z_rms and deviation_p (share of frames beyond threshold) per metric
+        """
+        groups: Dict[Tuple[int, int], List[str]] = {}
+        for key, point in cycle_data.items():
+            if key not in self._accumulator.get_keys():
+                logger.warning(f"no normative reference for {key}")
+                continue
+            number_frames = len(self._accumulator.get_moments(key)[0])
+            if point.data_table.shape[1] != number_frames:
+                raise ValueError(f"{key} is normalised to {point.data_table.shape[1]} frames instead of "
+                                 f"{number_frames}")
+            groups.setdefault(point.data_table.shape, []).append(key)
+
+        z_scores = {}
+        builder = gaitalytics.analysis.ResultsBuilder()
+        for keys in groups.values():
+            values = np.stack([cycle_data[key].data_table.to_numpy(dtype=float) for key in keys])
+            moments = [self._accumulator.get_moments(key) for key in keys]
+            mean = np.stack([moment[1] for moment in moments])[:, np.newaxis, :]
+            sd = np.stack([moment[2] for moment in moments])[:, np.newaxis, :]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z = np.where(sd > 0, (values - mean) / sd, np.nan)
+            summary = _summarise(z, threshold)
+            for index, key in enumerate(keys):
+                table = cycle_data[key].data_table
+                z_scores[key] = DataFrame(z[index], index=table.index, columns=table.columns)
+                builder.add(key, DataFrame({name: result[index] for name, result in summary.items()},
+                                           index=table.index))
+        return [z_scores, builder.build()]
+
+
+def _summarise(z: np.ndarray, threshold: float) -> Dict[str, np.ndarray]:
+    """
+    :param z: z-scores (points x cycles x frames)
+    :return: summaries (points x cycles)
+    """
+    valid = ~np.isnan(z)
+    number_frames = valid.sum(axis=-1)
+    absolute = np.abs(np.where(valid, z, 0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        summary = {"z_mean_abs": absolute.sum(axis=-1) / number_frames,
+                   "z_max_abs": np.where(number_frames > 0, absolute.max(axis=-1), np.nan),
+                   "z_rms": np.sqrt((absolute ** 2).sum(axis=-1) / number_frames),
+                   "deviation_p": (absolute > threshold).sum(axis=-1) / number_frames}
+    return summary
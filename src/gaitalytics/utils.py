@@ -2,15 +2,16 @@ from __future__ import annotations
 
 from abc import ABC
 from enum import Enum
-from typing import List, Dict
+from typing import List, Dict, Tuple
 
 import numpy as np
 import yaml
-from btk import btkEvent
-from pandas import DataFrame, read_csv
+from pandas import DataFrame, Index, read_csv
 
 FILENAME_DELIMITER = "-"
 
+_MAPPINGS: Dict[Tuple[str, tuple], type] = {}
+
 
 def min_max_norm(data):
     scale_min = -1
@@ -21,14 +22,45 @@ def min_max_norm(data):
     return [((entry - min_data) * (scale_max - scale_min) / diff) + scale_min for entry in data]
 
 
+def define_mapping(name: str, members: Tuple[Tuple[str, str], ...]) -> type:
+    """
+    Enum of a label mapping. Mappings are created once per process, members are pickled by their mapping so
+    translated labels can be sent to worker processes.
+
+    :param name: name of the enum
+    :param members: pairs of name and label
+    :return: enum of the mapping
+    """
+    key = (name, members)
+    if key not in _MAPPINGS:
+        mapping = Enum(name, list(members))
+        mapping.__reduce_ex__ = lambda member, protocol: (_get_mapping_member, (name, members, member.name))
+        _MAPPINGS[key] = mapping
+    return _MAPPINGS[key]
+
+
+def _get_mapping_member(name: str, members: Tuple[Tuple[str, str], ...], member_name: str) -> Enum:
+    return define_mapping(name, members)[member_name]
+
+
 class ConfigProvider:
     _MARKER_MAPPING = "marker_set_mapping"
     _MODEL_MAPPING = "model_mapping"
 
     def __init__(self, file_path: str):
         self._read_configs(file_path)
-        self.MARKER_MAPPING = Enum('MarkerMapping', self._config[self._MARKER_MAPPING])
-        self.MODEL_MAPPING = Enum('ModelMapping', self._config[self._MODEL_MAPPING])
+        self._define_mappings()
+
+    def __getstate__(self) -> dict:
+        return {"_config": self._config}
+
+    def __setstate__(self, state: dict):
+        self._config = state["_config"]
+        self._define_mappings()
+
+    def _define_mappings(self):
+        self.MARKER_MAPPING = define_mapping('MarkerMapping', tuple(self._config[self._MARKER_MAPPING].items()))
+        self.MODEL_MAPPING = define_mapping('ModelMapping', tuple(self._config[self._MODEL_MAPPING].items()))
 
     def get_translated_label(self, label: str, point_type: PointDataType) -> Enum | None:
         try:
@@ -49,6 +81,18 @@ class ConfigProvider:
         with open(file_path, 'r') as f:
             self._config = yaml.safe_load(f)
 
+    def to_yaml(self) -> str:
+        return yaml.safe_dump(self._config, sort_keys=True)
+
+    def define_keys(self, point_type: PointDataType) -> List[str]:
+        """
+        :param point_type: type of the points
+        :return: keys of all mapped labels of the type in all directions and contexts
+        """
+        mapping = self.MARKER_MAPPING if point_type.value == PointDataType.Marker.value else self.MODEL_MAPPING
+        return [self.define_key(translated_label, point_type, direction, context)
+                for translated_label in mapping for direction in AxesNames for context in GaitEventContext]
+
     @staticmethod
     def define_key(translated_label: Enum, point_type: PointDataType,
                    direction: AxesNames,
@@ -62,13 +106,22 @@ class SubjectMeasures(yaml.YAMLObject):
     yaml_loader = yaml.SafeLoader
 
     def __init__(self, body_mass: float, body_height: float, left_leg_length: float, right_leg_length: float,
-                 subject: str, start_frame: int):
+                 subject: str, start_frame: int, point_frequency: float = None):
         self.body_mass = body_mass
         self.body_height = body_height
         self.left_leg_length = left_leg_length
         self.right_leg_length = right_leg_length
         self.subject = subject
         self.start_frame = start_frame
+        self.point_frequency = point_frequency
+
+    def get_point_frequency(self, default: float = None) -> float:
+        """
+        :param default: returned for measures stored without frequency
+        :return: point frequency of the recording
+        """
+        point_frequency = getattr(self, "point_frequency", None)
+        return default if point_frequency is None else point_frequency
 
     def to_file(self, path_out: str):
         with open(f"{path_out}/subject.yml", "w") as f:
@@ -119,13 +172,18 @@ def get_meta_data_filename(filename: str) -> [str, PointDataType,
                                               AxesNames,
                                               GaitEventContext, str, str]:
     prefix, key, postfix = get_key_from_filename(filename)
+    label, data_type, direction, context = get_meta_data_key(key)
+    postfix = postfix.split(".")[0]
+    return [label, data_type, direction, context, postfix, prefix]
+
+
+def get_meta_data_key(key: str) -> [str, PointDataType, AxesNames, GaitEventContext]:
     meta_data = key.split(".")
     label = meta_data[0]
     data_type = PointDataType[meta_data[1]]
     direction = AxesNames[meta_data[2]]
     context = GaitEventContext(meta_data[3])
-    postfix = postfix.split(".")[0]
-    return [label, data_type, direction, context, postfix, prefix]
+    return [label, data_type, direction, context]
 
 
 class GaitEventLabel(Enum):
@@ -145,10 +203,47 @@ class GaitEventLabel(Enum):
         return 2
 
 
+EVENT_TABLE_DTYPE = np.dtype([("frame", np.int64), ("label", np.int8), ("context", np.int8)])
+
+
+def get_event_code(enum_type, value: str) -> int:
+    """
+    Compact code of an event label or context as stored in event tables
+
+    :param enum_type: GaitEventLabel or GaitEventContext
+    :param value: value of the enum e.g. "Foot Strike"
+    :return: position in the enum, -1 if value is unknown
+    """
+    for code, member in enumerate(enum_type):
+        if member.value == value:
+            return code
+    return -1
+
+
+def get_event_value(enum_type, code: int) -> str:
+    """
+    Reverse of get_event_code
+
+    :param enum_type: GaitEventLabel or GaitEventContext
+    :param code: code stored in event table
+    :return: value of the enum
+    """
+    if code < 0:
+        raise ValueError(f"{code} is not a code of {enum_type.__name__}")
+    return list(enum_type)[code].value
+
+
 class GaitCycle:
 
     def __init__(self, number: int, context: GaitEventContext, start_frame: int, end_frame: int,
-                 unused_events: List[btkEvent]):
+                 unused_events: np.ndarray):
+        """
+        :param number: number of cycle in its context
+        :param context: context of cycle
+        :param start_frame: frame of start event
+        :param end_frame: frame of end event
+        :param unused_events: rows of the event table between start and end event (EVENT_TABLE_DTYPE)
+        """
         self.number: int = number
         self.context: GaitEventContext = context
         self.start_frame: int = start_frame
@@ -157,11 +252,13 @@ class GaitCycle:
         self.unused_events: Dict | None = None
         self._unused_events_to_dict(unused_events)
 
-    def _unused_events_to_dict(self, unused_events: List[btkEvent]):
+    def _unused_events_to_dict(self, unused_events: np.ndarray):
         if len(unused_events) <= 3:
             self.unused_events = {}
             for unused_event in unused_events:
-                self.unused_events[f"{unused_event.GetLabel()}_{unused_event.GetContext()}"] = unused_event.GetFrame()
+                label = get_event_value(GaitEventLabel, unused_event["label"])
+                context = get_event_value(GaitEventContext, unused_event["context"])
+                self.unused_events[f"{label}_{context}"] = int(unused_event["frame"])
 
         else:
             raise ValueError("too much events in cycle")
@@ -218,6 +315,8 @@ class BasicCyclePoint(ABC):
         self._event_frames: DataFrame | None = None
         self._frames: DataFrame | None = None
         self._subject: SubjectMeasures | None = None
+        self._ragged_values: np.ndarray | None = None
+        self._ragged_offsets: np.ndarray | None = None
 
     @property
     def cycle_point_type(self) -> str:
@@ -266,6 +365,39 @@ class BasicCyclePoint(ABC):
     @data_table.setter
     def data_table(self, data_table: DataFrame):
         self._data_table = data_table
+        self._ragged_values = None
+        self._ragged_offsets = None
+
+    @property
+    def ragged_values(self) -> np.ndarray:
+        """ Recorded values of all cycles back to back without padding """
+        if self._ragged_values is None:
+            self._build_ragged()
+        return self._ragged_values
+
+    @property
+    def ragged_offsets(self) -> np.ndarray:
+        """ Start of each cycle in ragged_values. Cycle i is ragged_values[ragged_offsets[i]:ragged_offsets[i + 1]] """
+        if self._ragged_offsets is None:
+            self._build_ragged()
+        return self._ragged_offsets
+
+    @property
+    def cycle_lengths(self) -> np.ndarray:
+        return np.diff(self.ragged_offsets)
+
+    def _build_ragged(self):
+        data = self.data_table.to_numpy()
+        if self.cycle_point_type == self.TYPE_NORM:
+            lengths = np.full(len(data), data.shape[1])
+        else:
+            frames = self.frames.to_numpy()
+            lengths = np.minimum(frames[:, 1] - frames[:, 0], data.shape[1])
+        self._ragged_offsets = np.concatenate([[0], np.cumsum(lengths)])
+        if np.all(lengths == data.shape[1]):
+            self._ragged_values = data.reshape(-1)
+        else:
+            self._ragged_values = data[np.arange(data.shape[1])[np.newaxis, :] < lengths[:, np.newaxis]]
 
     @property
     def event_frames(self) -> DataFrame:
@@ -337,19 +469,120 @@ class BasicCyclePoint(ABC):
 
 
 class TestCyclePoint(BasicCyclePoint):
-
-    def __init__(self, number_of_cycles: int, longest_frames: int, cycle_point_type: str):
+    EVENT_DTYPE = np.int64
+
+    def __init__(self, number_of_cycles: int, longest_frames: int, cycle_point_type: str,
+                 dtype: np.dtype = np.float64):
+        """
+        Preallocates typed cycle storage. Values are initialised with NaN, frames and events with 0.
+
+        :param number_of_cycles: number of cycles
+        :param longest_frames: number of frames of the longest cycle
+        :param cycle_point_type: "raw" BasicCyclePoint.TYPE_RAW or "normalised" BasicCyclePoint.TYPE_NORM
+        :param dtype: float type of the values np.float32 or np.float64
+        """
         super().__init__()
-        cycle_numbers = np.arange(1, number_of_cycles + 1)
-        columns = np.arange(0, longest_frames)
-        self.data_table = DataFrame(columns=columns, index=cycle_numbers)
-        self.data_table.index.name = self.CYCLE_NUMBER
-        self.event_frames = DataFrame(columns=[self.FOOT_OFF_CONTRA, self.FOOT_STRIKE_CONTRA, self.FOOT_OFF],
-                                      index=cycle_numbers)
-        self.event_frames.index.name = self.CYCLE_NUMBER
-        self.frames = DataFrame(columns=[self.START_FRAME, self.END_FRAME], index=cycle_numbers)
-        self.frames.index.name = self.CYCLE_NUMBER
         self.cycle_point_type = cycle_point_type
+        self._data: np.ndarray | None = None
+        self._frame_values: np.ndarray | None = None
+        self._event_frame_values: np.ndarray | None = None
+        data = np.full((number_of_cycles, longest_frames), np.nan, dtype=dtype)
+        frames = np.zeros((number_of_cycles, 2), dtype=self.EVENT_DTYPE)
+        event_frames = np.zeros((number_of_cycles, 3), dtype=self.EVENT_DTYPE)
+        self._set_arrays(data, frames, event_frames)
+
+    @classmethod
+    def from_arrays(cls, data: np.ndarray, frames: np.ndarray, event_frames: np.ndarray,
+                    cycle_point_type: str) -> TestCyclePoint:
+        """
+        Creates a cycle point as thin view over already cut cycles. The arrays are wrapped without copying.
+
+        :param data: cycle values (cycles x longest cycle), padded with NaN
+        :param frames: start and end frame of each cycle (cycles x 2)
+        :param event_frames: event frames relative to cycle start (cycles x 3)
+        :param cycle_point_type: "raw" BasicCyclePoint.TYPE_RAW or "normalised" BasicCyclePoint.TYPE_NORM
+        :return: cycle point backed by the given arrays
+        """
+        point = cls(0, 0, cycle_point_type, data.dtype)
+        point._set_arrays(data, frames, event_frames)
+        return point
+
+    @classmethod
+    def from_ragged(cls, values: np.ndarray, offsets: np.ndarray, frames: np.ndarray, event_frames: np.ndarray,
+                    cycle_point_type: str) -> TestCyclePoint:
+        """
+        Creates a cycle point over cycles stored back to back. The padded data_table is only built on first access.
+
+        :param values: recorded values of all cycles without padding
+        :param offsets: start of each cycle in values, followed by the total length (cycles + 1)
+        :param frames: start and end frame of each cycle (cycles x 2)
+        :param event_frames: event frames relative to cycle start (cycles x 3)
+        :param cycle_point_type: "raw" BasicCyclePoint.TYPE_RAW or "normalised" BasicCyclePoint.TYPE_NORM
+        :return: cycle point backed by the given arrays
+        """
+        point = cls(0, 0, cycle_point_type, values.dtype)
+        point._set_frame_arrays(frames, event_frames)
+        point._data = None
+        point._data_table = None
+        point._ragged_values = values
+        point._ragged_offsets = offsets
+        return point
+
+    @property
+    def data_table(self) -> DataFrame:
+        self._pad_ragged_values()
+        return self._data_table
+
+    @data_table.setter
+    def data_table(self, data_table: DataFrame):
+        BasicCyclePoint.data_table.fset(self, data_table)
+        self._data = data_table.to_numpy()
+
+    @property
+    def data(self) -> np.ndarray:
+        """ Backing array of data_table (cycles x frames) """
+        self._pad_ragged_values()
+        return self._data
+
+    @property
+    def frame_values(self) -> np.ndarray:
+        """ Backing array of frames (cycles x 2) """
+        return self._frame_values
+
+    @property
+    def event_frame_values(self) -> np.ndarray:
+        """ Backing array of event_frames (cycles x 3) """
+        return self._event_frame_values
+
+    def _set_arrays(self, data: np.ndarray, frames: np.ndarray, event_frames: np.ndarray):
+        self._set_frame_arrays(frames, event_frames)
+        self.data_table = DataFrame(data, index=self.frames.index, columns=np.arange(0, data.shape[1]), copy=False)
+        self._data = data
+
+    def _set_frame_arrays(self, frames: np.ndarray, event_frames: np.ndarray):
+        self._frame_values = frames
+        self._event_frame_values = event_frames
+        cycle_numbers = Index(np.arange(1, len(frames) + 1), name=self.CYCLE_NUMBER)
+        self.event_frames = DataFrame(event_frames, index=cycle_numbers,
+                                      columns=[self.FOOT_OFF_CONTRA, self.FOOT_STRIKE_CONTRA, self.FOOT_OFF],
+                                      copy=False)
+        self.frames = DataFrame(frames, index=cycle_numbers, columns=[self.START_FRAME, self.END_FRAME], copy=False)
+
+    def _pad_ragged_values(self):
+        """
+        Builds the NaN padded data_table from the ragged values on first access. Cycles of equal length (normalised
+        data) are reshaped without copying, so data_table stays a view on the ragged values.
+        """
+        if self._data is None:
+            lengths = np.diff(self._ragged_offsets)
+            longest = lengths.max(initial=0)
+            if np.all(lengths == longest):
+                data = self._ragged_values.reshape(len(lengths), longest)
+            else:
+                data = np.full((len(lengths), longest), np.nan, dtype=self._ragged_values.dtype)
+                data[np.arange(longest)[np.newaxis, :] < lengths[:, np.newaxis]] = self._ragged_values
+            self._data = data
+            self._data_table = DataFrame(data, index=self.frames.index, columns=np.arange(0, longest), copy=False)
 
 
 class BufferedCyclePoint(BasicCyclePoint):
@@ -487,6 +720,8 @@ class GaitEvent:
         icon_id (float): An identifier for an icon associated with the gait event.
         generic_flag (int): An identifier for a generic flag associated with the event.
     """
+    __slots__ = ("_time", "_frame", "_context", "_label", "_description", "_subject", "_icon_id", "_generic_flag",
+                 "_freq", "_file_start")
 
     def __init__(self, actual_start: int, frame_frequency: int):
         """Initialize a new GaitEvent instance with None values for all attributes."""
@@ -0,0 +1,95 @@
+from enum import Enum
+from typing import Collection, Dict, List, Set, Tuple
+
+import numpy as np
+
+import gaitalytics.utils
+
+SETTINGS_FILE = "settings/hbm_pig.yaml"
+LABELS = ("left_heel", "right_heel", "left_meta_2", "right_meta_2")
+
+
+def is_memory_mapped(values: np.ndarray) -> bool:
+    base = values
+    while base is not None:
+        if isinstance(base, np.memmap):
+            return True
+        base = base.base
+    return False
+
+
+def define_subject() -> gaitalytics.utils.SubjectMeasures:
+    return gaitalytics.utils.SubjectMeasures(70, 1800, 900, 900, "test", 1, 100)
+
+
+def define_cycle_data(configs: gaitalytics.utils.ConfigProvider,
+                      cycle_point_type: str = gaitalytics.utils.BasicCyclePoint.TYPE_RAW,
+                      number_cycles: int = 4,
+                      number_frames: int = 100,
+                      seed: int = 0,
+                      labels=LABELS) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+    """
+    Random cycles of marker points in all directions and contexts. Raw cycles have different lengths around
+    number_frames, normalised cycles have number_frames frames.
+    """
+    points = [(configs.MARKER_MAPPING[label], gaitalytics.utils.PointDataType.Marker) for label in labels]
+    return _define_cycle_points(points, cycle_point_type, number_cycles, number_frames, seed)
+
+
+def define_key_cycle_data(configs: gaitalytics.utils.ConfigProvider,
+                          keys: Collection[str],
+                          number_cycles: int = 4,
+                          number_frames: int = 100,
+                          seed: int = 0) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+    """
+    Random raw cycles of exactly the given keys e.g. the required keys of analyses
+    """
+    keys = set(keys)
+    points = [(translated_label, data_type)
+              for mapping in [configs.MARKER_MAPPING, configs.MODEL_MAPPING]
+              for translated_label in mapping
+              for data_type in gaitalytics.utils.PointDataType]
+    cycle_data = _define_cycle_points(points, gaitalytics.utils.BasicCyclePoint.TYPE_RAW, number_cycles,
+                                      number_frames, seed, keys)
+    missing_keys = keys - set(cycle_data)
+    if missing_keys:
+        raise KeyError(f"{sorted(missing_keys)} are not mapped")
+    return cycle_data
+
+
+def _define_cycle_points(points: List[Tuple[Enum, gaitalytics.utils.PointDataType]],
+                         cycle_point_type: str,
+                         number_cycles: int,
+                         number_frames: int,
+                         seed: int,
+                         keys: Set[str] = None) -> Dict[str, gaitalytics.utils.BasicCyclePoint]:
+    random = np.random.default_rng(seed)
+    subject = define_subject()
+    cycle_data = {}
+    for context in gaitalytics.utils.GaitEventContext:
+        if cycle_point_type == gaitalytics.utils.BasicCyclePoint.TYPE_RAW:
+            lengths = random.integers(number_frames - 20, number_frames + 20, number_cycles)
+        else:
+            lengths = np.full(number_cycles, number_frames)
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) + 10
+        frames = np.stack([starts, starts + lengths - 1], axis=1)
+        event_frames = np.stack([lengths * 0.1, lengths * 0.5, lengths * 0.6], axis=1).astype(np.int64)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        for translated_label, data_type in points:
+            for direction in gaitalytics.utils.AxesNames:
+                key = gaitalytics.utils.ConfigProvider.define_key(translated_label,
+                                                                  data_type,
+                                                                  direction,
+                                                                  context)
+                if keys is not None and key not in keys:
+                    continue
+                values = random.normal(direction.value * 100, 10, offsets[-1])
+                point = gaitalytics.utils.TestCyclePoint.from_ragged(values, offsets, frames, event_frames,
+                                                                     cycle_point_type)
+                point.translated_label = translated_label
+                point.data_type = data_type
+                point.direction = direction
+                point.context = context
+                point.subject = subject
+                cycle_data[key] = point
+    return cycle_data
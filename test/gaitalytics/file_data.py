@@ -0,0 +1,91 @@
+from typing import List, Tuple, Union
+
+import numpy as np
+
+import gaitalytics.files
+import gaitalytics.utils
+from cycle_data import define_subject
+
+POINT_FREQUENCY = 100
+
+
+def define_event(frame: int, label: str, context: str) -> gaitalytics.utils.GaitEvent:
+    event = gaitalytics.utils.GaitEvent(0, POINT_FREQUENCY)
+    event.frame = frame
+    event.label = label
+    event.context = context
+    return event
+
+
+def define_point(label: str, values: np.ndarray,
+                 point_type: gaitalytics.utils.PointDataType = gaitalytics.utils.PointDataType.Marker
+                 ) -> gaitalytics.utils.Point:
+    point = gaitalytics.utils.Point()
+    point.label = label
+    point.type = point_type
+    point.values = values
+    point.residuals = np.zeros((len(values), 1))
+    return point
+
+
+class MemoryFileHandler(gaitalytics.files.FileHandler):
+    """
+    Keeps hand-made points and events in memory, for tests without btk and c3d files
+    """
+
+    def __init__(self, points: List[gaitalytics.utils.Point], events: List[gaitalytics.utils.GaitEvent],
+                 analogs: List[Tuple[str, np.ndarray]] = ()):
+        self._points = list(points)
+        self._initial_events = list(events)
+        self._analog_labels = [label for label, values in analogs]
+        self._analog_values = {label: values for label, values in analogs}
+        self.added_points_calls = 0
+        super().__init__("memory")
+
+    def read_file(self):
+        self._events = list(self._initial_events)
+        self.sort_events()
+
+    def _write_file(self, out_file_path: str):
+        raise NotImplementedError("MemoryFileHandler does not write files")
+
+    def get_point_frequency(self) -> int:
+        return POINT_FREQUENCY
+
+    def get_actual_start_frame(self) -> int:
+        return 0
+
+    def get_subject_measures(self) -> gaitalytics.utils.SubjectMeasures:
+        return define_subject()
+
+    def get_points_size(self) -> int:
+        return len(self._points)
+
+    def get_point(self, marker_index: Union[int, str]) -> gaitalytics.utils.Point:
+        if isinstance(marker_index, int):
+            return self._points[marker_index]
+        return next(point for point in self._points if point.label == marker_index)
+
+    def add_point(self, new_point: gaitalytics.utils.Point):
+        self._points.append(new_point)
+
+    def add_points(self, new_points: List[gaitalytics.utils.Point]):
+        self.added_points_calls += 1
+        super().add_points(new_points)
+
+    def set_points_values(self, labels: List[str], values: np.ndarray):
+        for index, label in enumerate(labels):
+            self.get_point(label).values = values[:, index]
+
+    def get_analog_frequency(self) -> float:
+        return POINT_FREQUENCY
+
+    def get_analog_labels(self) -> List[str]:
+        return list(self._analog_labels)
+
+    def get_analogs_values(self, labels: List[str]) -> np.ndarray:
+        return np.stack([self._analog_values[label] for label in labels], axis=1)
+
+    def set_analogs_values(self, labels: List[str], values: np.ndarray):
+        for index, label in enumerate(labels):
+            self._analog_values[label] = values[:, index]
@@ -0,0 +1,160 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import signal
+from pandas.testing import assert_frame_equal
+
+import gaitalytics.analysis
+import gaitalytics.utils
+from cycle_data import SETTINGS_FILE, define_cycle_data
+
+
+class DescriptiveNormalisedAnalysisTests(unittest.TestCase):
+
+    def test_empty(self):
+        results = gaitalytics.analysis.DescriptiveNormalisedAnalysis({}).analyse()
+        self.assertTrue(results.empty)
+
+    def test_statistics(self):
+        configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        cycle_data = define_cycle_data(configs, gaitalytics.utils.BasicCyclePoint.TYPE_NORM)
+        results = gaitalytics.analysis.DescriptiveNormalisedAnalysis(cycle_data).analyse()
+        for key, point in cycle_data.items():
+            values = point.data_table.to_numpy()
+            metric = results[results["metric"] == key]
+            np.testing.assert_allclose(metric["mean"].to_numpy(), values.mean(axis=0))
+            np.testing.assert_allclose(metric["sd"].to_numpy(), values.std(axis=0, ddof=1))
+            np.testing.assert_allclose(metric["median"].to_numpy(), np.median(values, axis=0))
+
+
+class WaveformAccumulatorTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        cls._trials = [define_cycle_data(cls._configs, gaitalytics.utils.BasicCyclePoint.TYPE_NORM,
+                                         number_cycles=number_cycles, seed=seed)
+                       for seed, number_cycles in enumerate([4, 7, 2])]
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _accumulate(self, trials) -> gaitalytics.analysis.WaveformAccumulator:
+        accumulator = gaitalytics.analysis.WaveformAccumulator()
+        for trial in trials:
+            accumulator.add(trial)
+        return accumulator
+
+    def test_empty(self):
+        results = gaitalytics.analysis.WaveformAccumulator().get_results()
+        self.assertTrue(results.empty)
+
+    def test_merge_like_concatenated(self):
+        accumulator = self._accumulate(self._trials[:1])
+        accumulator.merge(self._accumulate(self._trials[1:]))
+        self.assertEqual(accumulator.get_keys(), list(self._trials[0]))
+        for key in accumulator.get_keys():
+            values = np.concatenate([trial[key].data_table.to_numpy() for trial in self._trials])
+            count, mean, sd = accumulator.get_moments(key)
+            np.testing.assert_array_equal(count, np.full(values.shape[1], len(values)))
+            np.testing.assert_allclose(mean, np.mean(values, axis=0))
+            np.testing.assert_allclose(sd, np.std(values, axis=0, ddof=1))
+
+        results = accumulator.get_results()
+        for key in accumulator.get_keys():
+            values = np.concatenate([trial[key].data_table.to_numpy() for trial in self._trials])
+            metric = results[results["metric"] == key]
+            np.testing.assert_array_equal(metric["max"].to_numpy(), values.max(axis=0))
+            np.testing.assert_array_equal(metric["min"].to_numpy(), values.min(axis=0))
+
+    def test_skip_missing_values(self):
+        key = next(iter(self._trials[0]))
+        point = self._trials[0][key]
+        values = point.data_table.to_numpy(dtype=float, copy=True)
+        values[0, :10] = np.nan
+        point = gaitalytics.utils.TestCyclePoint.from_arrays(values, point.frame_values, point.event_frame_values,
+                                                             gaitalytics.utils.BasicCyclePoint.TYPE_NORM)
+        point.data_type = gaitalytics.utils.PointDataType.Marker
+        accumulator = self._accumulate([{key: point}, {key: self._trials[1][key]}])
+        values = np.concatenate([values, self._trials[1][key].data_table.to_numpy()])
+        count, mean, sd = accumulator.get_moments(key)
+        np.testing.assert_array_equal(count, (~np.isnan(values)).sum(axis=0))
+        np.testing.assert_allclose(mean, np.nanmean(values, axis=0))
+        np.testing.assert_allclose(sd, np.nanstd(values, axis=0, ddof=1))
+
+    def test_different_number_frames(self):
+        accumulator = self._accumulate(self._trials[:1])
+        with self.assertRaises(ValueError):
+            accumulator.add(define_cycle_data(self._configs, gaitalytics.utils.BasicCyclePoint.TYPE_NORM,
+                                              number_frames=50))
+
+    def test_save_load(self):
+        file_path = os.path.join(self._dir.name, "moments.npz")
+        accumulator = self._accumulate(self._trials)
+        accumulator.save(file_path)
+        self.assertEqual(os.listdir(self._dir.name), ["moments.npz"])
+        loaded = gaitalytics.analysis.WaveformAccumulator.load(file_path)
+        self.assertEqual(loaded.get_keys(), accumulator.get_keys())
+        assert_frame_equal(loaded.get_results(), accumulator.get_results())
+
+    def test_save_load_empty(self):
+        file_path = os.path.join(self._dir.name, "moments.npz")
+        gaitalytics.analysis.WaveformAccumulator().save(file_path)
+        loaded = gaitalytics.analysis.WaveformAccumulator.load(file_path)
+        self.assertEqual(loaded.get_keys(), [])
+        self.assertTrue(loaded.get_results().empty)
+
+
+def _define_toe_point(cycles, toe_offs) -> gaitalytics.utils.TestCyclePoint:
+    lengths = np.array([len(cycle) for cycle in cycles])
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    frames = np.stack([offsets[:-1], offsets[1:] - 1], axis=1)
+    event_frames = np.stack([np.zeros(len(cycles)), np.ones(len(cycles)), toe_offs], axis=1).astype(np.int64)
+    return gaitalytics.utils.TestCyclePoint.from_ragged(np.concatenate(cycles).astype(float), offsets, frames,
+                                                        event_frames, gaitalytics.utils.BasicCyclePoint.TYPE_RAW)
+
+
+class MinimalClearingDifferenceTests(unittest.TestCase):
+
+    def _calculate(self, cycles, toe_offs):
+        toe = _define_toe_point(cycles, toe_offs)
+        results = gaitalytics.analysis.MinimalClearingDifference._calculate_minimal_clearance(toe, "left")
+        return results.to_numpy()
+
+    def test_flat_peak_and_first_minimum(self):
+        flat_peak = [0, 0, 1, 3, 5, 5, 5, 2, 1, 0.5, 0.5, 4, 6, 9]
+        no_peak = np.arange(20)
+        results = self._calculate([flat_peak, no_peak], [2, 2])
+        # peak in the middle of the plateau, first of both minima, swing ends at the length of the cycle
+        np.testing.assert_allclose(results[0], [0.5, (9 - 5) / 11, 4])
+        np.testing.assert_allclose(results[1], [np.nan, np.nan, 17])
+
+    def test_swing_ends_at_cycle_length(self):
+        short = [0, 0, 1, 3, 5, 2, 1, 0.5, 2, 3, 8, 9]
+        results = self._calculate([short, np.zeros(30)], [2, 2])
+        np.testing.assert_array_equal(results[0], self._calculate([short], [2])[0])
+
+    def test_like_find_peaks(self):
+        random = np.random.default_rng(0)
+        cycles = [random.integers(0, 4, length) for length in random.integers(10, 40, 50)]
+        toe_offs = random.integers(0, 5, len(cycles))
+        results = self._calculate(cycles, toe_offs)
+        for cycle, toe_off, result in zip(cycles, toe_offs, results):
+            swing = cycle[toe_off:-1].astype(float)
+            mid_swing = int(np.round(len(swing) / 2))
+            peaks = signal.find_peaks(swing[:mid_swing], distance=len(swing))[0]
+            if len(peaks) == 0:
+                np.testing.assert_array_equal(result[:2], [np.nan, np.nan])
+                continue
+            minimum = peaks[0] + np.argmin(swing[peaks[0]:-1])
+            np.testing.assert_allclose(result[:2], [swing[minimum], (minimum - peaks[0]) / len(swing)])
+
+
+if __name__ == '__main__':
+    unittest.main()
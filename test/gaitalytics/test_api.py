@@ -0,0 +1,207 @@
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+import gaitalytics.analysis
+import gaitalytics.api
+import gaitalytics.cycle
+import gaitalytics.files
+import gaitalytics.utils
+from cycle_data import SETTINGS_FILE, define_key_cycle_data
+from file_data import POINT_FREQUENCY, MemoryFileHandler, define_point
+
+try:
+    import btk
+except ImportError:
+    btk = None
+
+DATA_PATH = "./test/data"
+TEST_INPUT_FILE_NAME = "Baseline.3.c3d"
+
+CYCLE_FRAMES = 120
+NUMBER_FRAMES = 1000
+# first heel strike and foot off of each side, foot off at 60 % of the cycle
+HEEL_STRIKES = {gaitalytics.utils.GaitEventContext.LEFT: 90, gaitalytics.utils.GaitEventContext.RIGHT: 30}
+FOOT_OFFS = {gaitalytics.utils.GaitEventContext.LEFT: 42, gaitalytics.utils.GaitEventContext.RIGHT: 102}
+
+
+def _define_wave(peak_frame: int) -> np.ndarray:
+    return np.cos(2 * np.pi * (np.arange(NUMBER_FRAMES) - peak_frame) / CYCLE_FRAMES)
+
+
+def _define_walking_handler() -> MemoryFileHandler:
+    """
+    Periodic walking in y direction. Heels are furthest behind and toes furthest ahead of the static hips at the
+    heel strikes and foot offs of HEEL_STRIKES and FOOT_OFFS
+    """
+    points = []
+    for context, side in [(gaitalytics.utils.GaitEventContext.LEFT, "L"),
+                          (gaitalytics.utils.GaitEventContext.RIGHT, "R")]:
+        heel_wave = _define_wave(HEEL_STRIKES[context])
+        toe_wave = _define_wave(FOOT_OFFS[context])
+        heel = np.stack([np.zeros(NUMBER_FRAMES), -100 * heel_wave, 50 + 10 * heel_wave], axis=1)
+        toe = np.stack([np.zeros(NUMBER_FRAMES), 100 * toe_wave, 30 + 20 * toe_wave ** 2], axis=1)
+        points += [define_point(f"{side}HEE", heel),
+                   define_point(f"{side}MT2", toe),
+                   define_point(f"{side}MM", heel + 1),
+                   define_point(f"{side}ASIS", np.zeros((NUMBER_FRAMES, 3)))]
+    points.append(define_point("LMT5", points[1].values - [0, 100, 0]))
+    return MemoryFileHandler(points, [])
+
+
+@unittest.skipIf(btk is None, "btk not installed")
+@unittest.skipUnless(os.path.isfile(f"{DATA_PATH}/{TEST_INPUT_FILE_NAME}"), "test data not available")
+class RunPipelineTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_spacing_checker_like_file_based(self):
+        file_path = f"{DATA_PATH}/{TEST_INPUT_FILE_NAME}"
+        anomaly_checker = [gaitalytics.api.GAIT_EVENT_CHECKER_SPACING]
+        gaitalytics.api.detect_gait_events(file_path, self._dir.name, self._configs, anomaly_checker=anomaly_checker)
+        event_file_path = os.path.join(self._dir.name, TEST_INPUT_FILE_NAME.replace(".3.c3d", ".4.c3d"))
+        expected = gaitalytics.api.extract_cycles(event_file_path, self._configs, anomaly_checker=anomaly_checker)
+
+        cycle_data, _, _ = gaitalytics.api.run_pipeline(file_path, self._configs, anomaly_checker=anomaly_checker,
+                                                        modelling_methode=None,
+                                                        analysis_methode=[gaitalytics.api.ANALYSIS_SPATIO_TEMP])
+
+        self.assertEqual(sorted(cycle_data), sorted(expected))
+        for key, point in expected.items():
+            np.testing.assert_array_equal(cycle_data[key].frames.to_numpy(), point.frames.to_numpy())
+            np.testing.assert_array_equal(cycle_data[key].event_frames.to_numpy(), point.event_frames.to_numpy())
+            np.testing.assert_allclose(cycle_data[key].data_table.to_numpy(), point.data_table.to_numpy(),
+                                       rtol=1e-6)
+
+
+class RunPipelineInMemoryTests(unittest.TestCase):
+    ANALYSIS_METHODE = [gaitalytics.api.ANALYSIS_SPATIO_TEMP, gaitalytics.api.ANALYSIS_TOE_CLEARANCE]
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        self._file_path = os.path.join(self._dir.name, "walk.3.c3d")
+        open(self._file_path, "wb").close()
+        self._handlers = []
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _define_handler(self, file_path: str) -> MemoryFileHandler:
+        handler = _define_walking_handler()
+        self._handlers.append(handler)
+        return handler
+
+    def _run_pipeline(self, **kwargs):
+        with mock.patch.object(gaitalytics.files, "BtkFileHandler", side_effect=self._define_handler):
+            return gaitalytics.api.run_pipeline(self._file_path, self._configs, modelling_methode=None,
+                                                analysis_methode=self.ANALYSIS_METHODE, **kwargs)
+
+    def test_cycles_of_detected_events(self):
+        cycle_data, normalised_data, results = self._run_pipeline()
+        frames = [event.frame for event in self._handlers[0].get_events()]
+        self.assertEqual(frames, sorted(frames))
+
+        self.assertEqual(sorted(cycle_data), sorted(normalised_data))
+        for key, point in cycle_data.items():
+            starts = HEEL_STRIKES[point.context] + CYCLE_FRAMES * np.arange(7)
+            np.testing.assert_array_equal(point.frames.to_numpy(),
+                                          np.stack([starts, starts + CYCLE_FRAMES], axis=1))
+            np.testing.assert_array_equal(point.event_frames.to_numpy(), np.tile([12, 60, 72], (7, 1)))
+            values = self._handlers[0].get_point(point.translated_label.value).values[:, point.direction.value]
+            table = point.data_table.to_numpy()
+            for row, start in enumerate(starts):
+                np.testing.assert_array_equal(table[row], values[start:start + CYCLE_FRAMES])
+            self.assertEqual(normalised_data[key].data_table.shape, (7, 100))
+
+        for side in ["left", "right"]:
+            np.testing.assert_allclose(results[f"cycle_duration_s_{side}"].to_numpy(),
+                                       CYCLE_FRAMES / POINT_FREQUENCY)
+
+    def test_extract_required_and_buffer(self):
+        _, _, expected = self._run_pipeline()
+        cycle_data, normalised_data, results = self._run_pipeline(extract_required=True,
+                                                                  buffer_output_path=self._dir.name)
+        assert_frame_equal(results, expected)
+        self.assertEqual(sorted(cycle_data), sorted(gaitalytics.api.get_required_keys(self._configs,
+                                                                                      self.ANALYSIS_METHODE)))
+
+        loader = gaitalytics.cycle.CyclePointLoader(self._configs, self._dir.name)
+        for loaded, points in [(loader.get_raw_cycle_points(), cycle_data),
+                               (loader.get_norm_cycle_points(), normalised_data)]:
+            self.assertEqual(sorted(loaded), sorted(points))
+            for key, point in points.items():
+                np.testing.assert_allclose(loaded[key].data_table.to_numpy(), point.data_table.to_numpy())
+
+
+class AnalyseDataExecutorTests(unittest.TestCase):
+    # one analysis of model outputs keeps the test fast, the others only differ in the data type
+    ANALYSIS_METHODE = [gaitalytics.api.ANALYSIS_POWERS,
+                        gaitalytics.api.ANALYSIS_SPATIO_TEMP,
+                        gaitalytics.api.ANALYSIS_TOE_CLEARANCE,
+                        gaitalytics.api.ANALYSIS_CMOS]
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        cls._cycle_data = define_key_cycle_data(cls._configs,
+                                                gaitalytics.api.get_required_keys(cls._configs, cls.ANALYSIS_METHODE))
+
+    def test_executors_like_serial(self):
+        expected = gaitalytics.api.analyse_data(self._cycle_data, self._configs, self.ANALYSIS_METHODE)
+        for executor in gaitalytics.api.ANALYSIS_EXECUTOR_LIST:
+            with self.subTest(executor=executor):
+                results = gaitalytics.api.analyse_data(self._cycle_data, self._configs, self.ANALYSIS_METHODE,
+                                                       executor=executor, workers=2)
+                assert_frame_equal(results, expected)
+
+    def test_pickle_configs(self):
+        configs = pickle.loads(pickle.dumps(self._configs))
+        self.assertIs(configs.MARKER_MAPPING, self._configs.MARKER_MAPPING)
+        self.assertIs(configs.MODEL_MAPPING, self._configs.MODEL_MAPPING)
+        point = next(iter(self._cycle_data.values()))
+        self.assertIs(pickle.loads(pickle.dumps(point.translated_label)), point.translated_label)
+
+    def test_unpickle_in_new_process(self):
+        point = next(iter(self._cycle_data.values()))
+        script = ("import pickle, sys; configs, label = pickle.load(sys.stdin.buffer); "
+                  "print(label is configs.MARKER_MAPPING[label.name], label.value)")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, check=True, env=env,
+                                input=pickle.dumps((self._configs, point.translated_label)))
+        self.assertEqual(result.stdout.decode().split(), ["True", point.translated_label.value])
+
+
+class RequiredKeysTests(unittest.TestCase):
+
+    def test_collect_on_required_keys(self):
+        configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        cycle_data = define_key_cycle_data(configs, gaitalytics.api.get_required_keys(configs), number_cycles=2)
+        for analysis_class in gaitalytics.api._get_analysis_classes(gaitalytics.api.ANALYSIS_LIST):
+            with self.subTest(analysis=analysis_class.__name__):
+                required_keys = analysis_class.get_required_keys(configs)
+                required_data = {key: cycle_data[key] for key in required_keys}
+                builder = gaitalytics.analysis.ResultsBuilder()
+                analysis_class(required_data, configs).collect(builder)
+                expected = gaitalytics.analysis.ResultsBuilder()
+                analysis_class(cycle_data, configs).collect(expected)
+                results = builder.build()
+                self.assertFalse(results.empty)
+                assert_frame_equal(results, expected.build())
+
+
+if __name__ == '__main__':
+    unittest.main()
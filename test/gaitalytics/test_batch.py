@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+import gaitalytics.batch
+from cycle_data import SETTINGS_FILE
+
+
+class TrialNameTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _create_files(self, *relative_paths: str):
+        file_paths = []
+        for relative_path in relative_paths:
+            file_path = os.path.join(self._dir.name, *relative_path.split("/"))
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            open(file_path, "wb").close()
+            file_paths.append(file_path)
+        return file_paths
+
+    def test_same_file_name_in_sessions(self):
+        file_paths = self._create_files("session1/walk01.3.c3d", "session2/walk01.3.c3d", "session2/run/walk01.c3d")
+        trial_names = gaitalytics.batch.define_trial_names(file_paths, self._dir.name)
+        self.assertEqual(trial_names, {"session1/walk01": file_paths[0],
+                                       "session2/walk01": file_paths[1],
+                                       "session2/run/walk01": file_paths[2]})
+
+    def test_names_independent_of_other_files(self):
+        file_paths = self._create_files("session1/walk01.3.c3d", "session2/walk01.3.c3d")
+        trial_names = gaitalytics.batch.define_trial_names(file_paths[:1], self._dir.name)
+        self.assertEqual(list(trial_names), ["session1/walk01"])
+
+    def test_file_names_without_root(self):
+        file_paths = self._create_files("session1/walk01.3.c3d", "session1/walk02.3.c3d")
+        trial_names = gaitalytics.batch.define_trial_names(file_paths)
+        self.assertEqual(list(trial_names), ["walk01", "walk02"])
+
+    def test_file_outside_root(self):
+        file_paths = self._create_files("session1/walk01.3.c3d")
+        with self.assertRaises(ValueError):
+            gaitalytics.batch.define_trial_names(file_paths, os.path.join(self._dir.name, "session2"))
+
+    def test_duplicate_trial_name(self):
+        file_paths = self._create_files("session1/walk01.3.c3d", "session2/walk01.3.c3d")
+        with self.assertRaises(ValueError):
+            gaitalytics.batch.define_trial_names(file_paths)
+        with self.assertRaises(ValueError):
+            gaitalytics.batch.run_batch(file_paths, SETTINGS_FILE, self._dir.name)
+
+    def test_nested_result_path(self):
+        trial_result_path = gaitalytics.batch._define_trial_result_path("trials", "session1/walk01")
+        self.assertEqual(trial_result_path, os.path.join("trials", "session1", "walk01.pkl"))
+
+
+class TrialResultsTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._trial_result_path = os.path.join(self._dir.name, "walk01.pkl")
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_digest(self):
+        digest = gaitalytics.batch.define_digest(SETTINGS_FILE, cycle_methode="HS", analysis_methode=["angles"])
+        self.assertEqual(digest, gaitalytics.batch.define_digest(SETTINGS_FILE, analysis_methode=["angles"],
+                                                                 cycle_methode="HS"))
+        self.assertNotEqual(digest, gaitalytics.batch.define_digest(SETTINGS_FILE, cycle_methode="TO",
+                                                                    analysis_methode=["angles"]))
+
+    def test_reuse_results_of_same_digest(self):
+        results = DataFrame({"value": [1.0, 2.0]})
+        pd.to_pickle({gaitalytics.batch.DIGEST: "a", gaitalytics.batch.RESULTS: results}, self._trial_result_path)
+        assert_frame_equal(gaitalytics.batch._read_trial_results(self._trial_result_path, "a"), results)
+        self.assertIsNone(gaitalytics.batch._read_trial_results(self._trial_result_path, "b"))
+        self.assertIsNone(gaitalytics.batch._read_trial_results(os.path.join(self._dir.name, "walk02.pkl"), "a"))
+
+    def test_results_without_digest(self):
+        DataFrame({"value": [1.0, 2.0]}).to_pickle(self._trial_result_path)
+        self.assertIsNone(gaitalytics.batch._read_trial_results(self._trial_result_path, "a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
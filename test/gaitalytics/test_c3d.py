@@ -0,0 +1,274 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import gaitalytics.c3d
+import gaitalytics.files
+import gaitalytics.utils
+
+try:
+    import btk
+except ImportError:
+    btk = None
+
+DATA_PATH = "./test/data"
+TEST_INPUT_FILE_NAME = "Baseline.3.c3d"
+
+POINT_LABELS = ["LHEE", "RHEE", "LKneeAngles"]
+ANALOG_LABELS = ["EMG1", "EMG2"]
+POINT_RATE = 100.0
+ANALOG_SAMPLES = 2
+NUMBER_FRAMES = 6
+INT_SCALE = 0.1
+FLOAT_SCALE = -0.1
+
+
+def _encode(values, word: str, processor: int) -> bytes:
+    """
+    encodes numbers as 16 bit integers 'i2', 32 bit floats 'f4' or characters in the byte order of the processor
+    """
+    byte_order = ">" if processor == gaitalytics.c3d.PROCESSOR_MIPS else "<"
+    values = np.asarray(values)
+    if word == "f4" and processor == gaitalytics.c3d.PROCESSOR_DEC:
+        words = (values.astype(np.float32) * 4).view(np.uint32)
+        return ((words << np.uint32(16)) | (words >> np.uint32(16))).astype("<u4").tobytes()
+    return values.astype(f"{byte_order}{word}").tobytes()
+
+
+def _encode_strings(strings, length: int) -> bytes:
+    return b"".join(string.ljust(length).encode("latin-1") for string in strings)
+
+
+class C3dWriter:
+    """
+    Writes minimal c3d files with known content for the tests
+    """
+
+    def __init__(self, processor: int = gaitalytics.c3d.PROCESSOR_INTEL, point_scale: float = INT_SCALE):
+        self.processor = processor
+        self.point_scale = point_scale
+        self.groups = {}
+
+    def add_parameter(self, group: str, name: str, values, data_type: int = None):
+        if isinstance(values, str):
+            values = [values]
+        if isinstance(values, list) and values and isinstance(values[0], str):
+            length = max(len(value) for value in values)
+            dimensions = (length,) if len(values) == 1 else (length, len(values))
+            data = _encode_strings(values, length)
+            data_type = gaitalytics.c3d.PARAMETER_TYPE_CHAR
+        else:
+            values = np.asarray(values)
+            if data_type is None:
+                data_type = (gaitalytics.c3d.PARAMETER_TYPE_FLOAT if values.dtype.kind == "f"
+                             else gaitalytics.c3d.PARAMETER_TYPE_INT)
+            dimensions = values.shape[::-1]
+            word = "f4" if data_type == gaitalytics.c3d.PARAMETER_TYPE_FLOAT else "i2"
+            data = _encode(values.reshape(-1), word, self.processor)
+        self.groups.setdefault(group, {})[name] = (data_type, dimensions, data)
+
+    def _parameter_section(self) -> bytes:
+        section = b""
+        for group_id, (group, parameters) in enumerate(self.groups.items(), start=1):
+            name = group.encode()
+            section += bytes([len(name), 256 - group_id]) + name + _encode([3], "i2", self.processor) + b"\0"
+            for parameter, (data_type, dimensions, data) in parameters.items():
+                name = parameter.encode()
+                offset = 2 + 2 + len(dimensions) + len(data) + 1
+                section += (bytes([len(name), group_id]) + name + _encode([offset], "i2", self.processor)
+                            + bytes([data_type & 0xff, len(dimensions)]) + bytes(dimensions) + data + b"\0")
+        return section
+
+    def write(self, file_path: str, points: np.ndarray, residuals: np.ndarray, analogs: np.ndarray,
+              first_frame: int = 1):
+        """
+        :param points: frames x points x 3
+        :param residuals: frames x points, negative for invalid samples
+        :param analogs: stored analog words (frames * samples) x channels
+        """
+        number_frames, number_points = points.shape[:2]
+        number_channels = analogs.shape[1]
+        self.add_parameter("POINT", "USED", [number_points])
+        self.add_parameter("POINT", "SCALE", [self.point_scale])
+        self.add_parameter("POINT", "RATE", [POINT_RATE])
+        self.add_parameter("POINT", "LABELS", POINT_LABELS[:number_points])
+        self.add_parameter("POINT", "ANGLES", POINT_LABELS[2:number_points])
+        self.add_parameter("ANALOG", "USED", [number_channels])
+        self.add_parameter("ANALOG", "RATE", [POINT_RATE * ANALOG_SAMPLES])
+        self.add_parameter("ANALOG", "LABELS", ANALOG_LABELS[:number_channels])
+        self.add_parameter("POINT", "DATA_START", [0])
+        parameter_blocks = (len(self._parameter_section()) + 4 + 511) // 512
+        self.add_parameter("POINT", "DATA_START", [2 + parameter_blocks])
+        section = self._parameter_section()
+        section = (bytes([1, 0x50, parameter_blocks, self.processor]) + section).ljust(parameter_blocks * 512,
+                                                                                      b"\0")
+
+        integer = self.point_scale > 0
+        word = "i2" if integer else "f4"
+        scale = abs(self.point_scale)
+        header = (bytes([2, 0x50])
+                  + _encode([number_points, number_channels * ANALOG_SAMPLES, min(first_frame, 65535),
+                             min(first_frame + number_frames - 1, 65535), 0], "i2", self.processor)
+                  + _encode([self.point_scale], "f4", self.processor)
+                  + _encode([2 + parameter_blocks, ANALOG_SAMPLES], "i2", self.processor)
+                  + _encode([POINT_RATE], "f4", self.processor)).ljust(512, b"\0")
+
+        residual_words = np.where(residuals < 0, -1, np.round(np.maximum(residuals, 0) / scale))
+        point_words = np.concatenate([points / scale if integer else points, residual_words[..., np.newaxis]],
+                                     axis=2)
+        if integer:
+            point_words = np.round(point_words)
+        data = b""
+        for frame in range(number_frames):
+            data += _encode(point_words[frame].reshape(-1), word, self.processor)
+            data += _encode(analogs[frame * ANALOG_SAMPLES:(frame + 1) * ANALOG_SAMPLES].reshape(-1), word,
+                            self.processor)
+        with open(file_path, "wb") as f:
+            f.write(header + section + data)
+
+
+def _define_points() -> [np.ndarray, np.ndarray]:
+    points = np.arange(NUMBER_FRAMES * 3 * 3, dtype=float).reshape(NUMBER_FRAMES, 3, 3) * INT_SCALE - 1
+    residuals = np.full((NUMBER_FRAMES, 3), 0.5)
+    residuals[2, 1] = -1
+    return points, residuals
+
+
+class C3dReaderTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._file_path = os.path.join(self._dir.name, "test.c3d")
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_point_values(self):
+        points, residuals = _define_points()
+        analogs = np.zeros((NUMBER_FRAMES * ANALOG_SAMPLES, 2))
+        for processor in [gaitalytics.c3d.PROCESSOR_INTEL, gaitalytics.c3d.PROCESSOR_DEC,
+                          gaitalytics.c3d.PROCESSOR_MIPS]:
+            for scale in [INT_SCALE, FLOAT_SCALE]:
+                with self.subTest(processor=processor, scale=scale):
+                    C3dWriter(processor, scale).write(self._file_path, points, residuals, analogs)
+                    reader = gaitalytics.c3d.C3dReader(self._file_path)
+                    self.assertEqual(reader.point_labels, POINT_LABELS)
+                    self.assertEqual(reader.analog_labels, ANALOG_LABELS)
+                    self.assertEqual(reader.frame_count, NUMBER_FRAMES)
+                    self.assertAlmostEqual(reader.point_rate, POINT_RATE)
+                    self.assertAlmostEqual(reader.analog_rate, POINT_RATE * ANALOG_SAMPLES)
+                    for index in range(len(POINT_LABELS)):
+                        values, point_residuals = reader.get_point_values(index)
+                        valid = residuals[:, index] >= 0
+                        np.testing.assert_allclose(values[valid], points[valid, index], rtol=1e-5, atol=1e-5)
+                        np.testing.assert_array_equal(values[~valid], 0)
+                        np.testing.assert_allclose(point_residuals[:, 0], np.where(valid, 0.5, -1), atol=1e-5)
+
+    def test_point_values_range(self):
+        points, residuals = _define_points()
+        C3dWriter().write(self._file_path, points, residuals, np.zeros((NUMBER_FRAMES * ANALOG_SAMPLES, 2)))
+        values, point_residuals = gaitalytics.c3d.C3dReader(self._file_path).get_point_values(0, 3, 5)
+        np.testing.assert_allclose(values, points[3:5, 0], atol=1e-5)
+
+    def test_analog_values(self):
+        points, residuals = _define_points()
+        words = np.arange(NUMBER_FRAMES * ANALOG_SAMPLES * 2).reshape(-1, 2) - 5
+        for processor in [gaitalytics.c3d.PROCESSOR_INTEL, gaitalytics.c3d.PROCESSOR_DEC,
+                          gaitalytics.c3d.PROCESSOR_MIPS]:
+            for scale in [INT_SCALE, FLOAT_SCALE]:
+                with self.subTest(processor=processor, scale=scale):
+                    writer = C3dWriter(processor, scale)
+                    writer.add_parameter("ANALOG", "OFFSET", [2, -3])
+                    writer.add_parameter("ANALOG", "SCALE", [0.5, 2.0])
+                    writer.add_parameter("ANALOG", "GEN_SCALE", [2.0])
+                    writer.write(self._file_path, points, residuals, words)
+                    reader = gaitalytics.c3d.C3dReader(self._file_path)
+                    np.testing.assert_allclose(reader.get_analog_values(0), (words[:, 0] - 2) * 0.5 * 2)
+                    np.testing.assert_allclose(reader.get_analog_values(1), (words[:, 1] + 3) * 2.0 * 2)
+                    np.testing.assert_allclose(reader.get_analog_values(1, 1, 3), (words[2:6, 1] + 3) * 2.0 * 2)
+
+    def test_unsigned_analog_values(self):
+        points, residuals = _define_points()
+        words = np.array([[0, 65535], [32768, 40000]] * NUMBER_FRAMES)
+        writer = C3dWriter()
+        writer.add_parameter("ANALOG", "FORMAT", gaitalytics.c3d.ANALOG_FORMAT_UNSIGNED)
+        writer.add_parameter("ANALOG", "OFFSET", np.array([32768, 32768], dtype=np.uint16).view(np.int16))
+        writer.write(self._file_path, points, residuals, words.astype(np.uint16).view(np.int16))
+        reader = gaitalytics.c3d.C3dReader(self._file_path)
+        self.assertTrue(reader.analog_unsigned)
+        np.testing.assert_allclose(reader.get_analog_values(0), words[:, 0] - 32768)
+        np.testing.assert_allclose(reader.get_analog_values(1), words[:, 1] - 32768)
+
+    def test_trial_frame_range(self):
+        points, residuals = _define_points()
+        first_frame = 70000
+        writer = C3dWriter()
+        writer.add_parameter("TRIAL", "ACTUAL_START_FIELD", [first_frame & 0xffff, first_frame >> 16])
+        last_frame = first_frame + NUMBER_FRAMES - 1
+        writer.add_parameter("TRIAL", "ACTUAL_END_FIELD", [last_frame & 0xffff, last_frame >> 16])
+        writer.write(self._file_path, points, residuals, np.zeros((NUMBER_FRAMES * ANALOG_SAMPLES, 2)),
+                     first_frame=first_frame)
+        reader = gaitalytics.c3d.C3dReader(self._file_path)
+        self.assertEqual(reader.first_frame, first_frame)
+        self.assertEqual(reader.frame_count, NUMBER_FRAMES)
+
+    def test_events(self):
+        points, residuals = _define_points()
+        writer = C3dWriter()
+        writer.add_parameter("EVENT", "USED", [3])
+        writer.add_parameter("EVENT", "TIMES", np.array([[0, 0.04], [0, 0.01], [0, 0.03]], dtype=float))
+        writer.add_parameter("EVENT", "CONTEXTS", ["Left", "Right", "Left"])
+        writer.add_parameter("EVENT", "LABELS", ["Foot Off", "Foot Strike", "Foot Strike"])
+        writer.add_parameter("EVENT", "ICON_IDS", [2, 1, 1])
+        writer.write(self._file_path, points, residuals, np.zeros((NUMBER_FRAMES * ANALOG_SAMPLES, 2)))
+        handler = gaitalytics.files.NumpyFileHandler(self._file_path)
+        events = handler.get_events()
+        self.assertEqual([event.label for event in events], ["Foot Strike", "Foot Strike", "Foot Off"])
+        self.assertEqual([event.context for event in events], ["Right", "Left", "Left"])
+        self.assertEqual([event.icon_id for event in events], [1, 1, 2])
+        np.testing.assert_allclose([event.time for event in events], [0.01, 0.03, 0.04], atol=1e-6)
+
+    def test_point_types(self):
+        points, residuals = _define_points()
+        C3dWriter().write(self._file_path, points, residuals, np.zeros((NUMBER_FRAMES * ANALOG_SAMPLES, 2)))
+        handler = gaitalytics.files.NumpyFileHandler(self._file_path)
+        self.assertEqual(handler.get_point_info(0)[1], gaitalytics.utils.PointDataType.Marker)
+        self.assertEqual(handler.get_point_info("LKneeAngles")[1], gaitalytics.utils.PointDataType.Angles)
+        self.assertAlmostEqual(handler.get_point_frequency(), POINT_RATE)
+
+
+@unittest.skipUnless(os.path.isfile(f"{DATA_PATH}/{TEST_INPUT_FILE_NAME}"), "test data not available")
+class C3dReaderFileTests(unittest.TestCase):
+
+    def test_get_point_frame_number(self):
+        reader = gaitalytics.c3d.C3dReader(f"{DATA_PATH}/{TEST_INPUT_FILE_NAME}")
+        self.assertEqual(reader.frame_count, 24998)
+
+    @unittest.skipIf(btk is None, "btk not installed")
+    def test_compare_btk(self):
+        file_path = f"{DATA_PATH}/{TEST_INPUT_FILE_NAME}"
+        reader = btk.btkAcquisitionFileReader()
+        reader.SetFilename(file_path)
+        reader.Update()
+        acquisition = reader.GetOutput()
+        handler = gaitalytics.files.NumpyFileHandler(file_path)
+
+        self.assertAlmostEqual(handler.get_point_frequency(), acquisition.GetPointFrequency(), places=3)
+        self.assertAlmostEqual(handler.get_analog_frequency(), acquisition.GetAnalogFrequency(), places=3)
+        self.assertEqual(handler.get_points_size(), acquisition.GetPointNumber())
+        for btk_point in btk.Iterate(acquisition.GetPoints()):
+            point = handler.get_point(btk_point.GetLabel())
+            np.testing.assert_allclose(point.values, btk_point.GetValues(), rtol=1e-5, atol=1e-3)
+            self.assertEqual(point.type.value, btk_point.GetType())
+        for btk_analog in btk.Iterate(acquisition.GetAnalogs()):
+            np.testing.assert_allclose(handler.get_analog_values(btk_analog.GetLabel()),
+                                       btk_analog.GetValues()[:, 0], rtol=1e-5, atol=1e-6)
+        btk_frames = sorted({int(round(event.GetTime() * acquisition.GetPointFrequency()))
+                             for event in btk.Iterate(acquisition.GetEvents())})
+        self.assertEqual([event.frame for event in handler.get_events()], btk_frames)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+import gaitalytics.api
+import gaitalytics.cache
+import gaitalytics.utils
+from cycle_data import SETTINGS_FILE, define_cycle_data, is_memory_mapped
+
+
+def _write_bytes(size: int):
+    def write(entry_path: str):
+        with open(os.path.join(entry_path, "data"), "wb") as f:
+            f.write(b"\0" * size)
+
+    return write
+
+
+class StageCacheTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._cache_path = os.path.join(self._dir.name, "cache")
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_miss_and_hit(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path)
+        key = cache.define_key("stage", "input")
+        self.assertIsNone(cache.get(key))
+        entry_path = cache.put(key, _write_bytes(10))
+        self.assertEqual(cache.get(key), entry_path)
+        self.assertTrue(os.path.isfile(os.path.join(entry_path, "data")))
+
+    def test_failed_write_leaves_no_entry(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path)
+        key = cache.define_key("stage", "input")
+
+        def write(entry_path: str):
+            _write_bytes(10)(entry_path)
+            raise RuntimeError("write failed")
+
+        with self.assertRaises(RuntimeError):
+            cache.put(key, write)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(os.listdir(self._cache_path), [])
+
+    def test_keep_existing_entry(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path)
+        entry_path = cache.put("entry", _write_bytes(10))
+        self.assertEqual(cache.put("entry", _write_bytes(20)), entry_path)
+        self.assertEqual(os.path.getsize(os.path.join(entry_path, "data")), 10)
+        self.assertEqual(os.listdir(self._cache_path), ["entry"])
+
+    def test_entry_written_by_other_process(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path)
+
+        def write(entry_path: str):
+            _write_bytes(20)(entry_path)
+            # other process finishes the same entry while this one is writing
+            _write_bytes(10)(tempfile.mkdtemp(dir=self._cache_path))
+            os.rename(os.path.join(self._cache_path, next(name for name in os.listdir(self._cache_path)
+                                                          if not name.startswith(".tmp-"))),
+                      os.path.join(self._cache_path, "entry"))
+
+        original_isdir = os.path.isdir
+        checked = []
+
+        def isdir(path):
+            # the entry does not exist yet when put checks for it the first time
+            if path == os.path.join(self._cache_path, "entry") and not checked:
+                checked.append(path)
+                return False
+            return original_isdir(path)
+
+        with mock.patch("os.path.isdir", isdir):
+            entry_path = cache.put("entry", write)
+        self.assertEqual(os.path.getsize(os.path.join(entry_path, "data")), 10)
+        self.assertEqual(os.listdir(self._cache_path), ["entry"])
+
+    def test_put_same_key_at_once(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            entry_paths = list(executor.map(lambda size: cache.put("entry", _write_bytes(size)), range(1, 9)))
+        self.assertEqual(set(entry_paths), {os.path.join(self._cache_path, "entry")})
+        self.assertEqual(os.listdir(self._cache_path), ["entry"])
+
+    def test_key_version(self):
+        key = gaitalytics.cache.StageCache.define_key("stage", "input")
+        with mock.patch("gaitalytics.cache.CACHE_VERSION", gaitalytics.cache.CACHE_VERSION + 1):
+            self.assertNotEqual(gaitalytics.cache.StageCache.define_key("stage", "input"), key)
+
+    def test_key_invalidation(self):
+        file_path = os.path.join(self._dir.name, "input.c3d")
+        with open(file_path, "wb") as f:
+            f.write(b"first")
+        key = gaitalytics.cache.StageCache.define_key("stage", gaitalytics.cache.hash_file(file_path),
+                                                      gaitalytics.cache.hash_parameters(a=1, b=2))
+        self.assertEqual(key, gaitalytics.cache.StageCache.define_key(
+            "stage", gaitalytics.cache.hash_file(file_path), gaitalytics.cache.hash_parameters(b=2, a=1)))
+        self.assertNotEqual(key, gaitalytics.cache.StageCache.define_key(
+            "other", gaitalytics.cache.hash_file(file_path), gaitalytics.cache.hash_parameters(a=1, b=2)))
+        self.assertNotEqual(key, gaitalytics.cache.StageCache.define_key(
+            "stage", gaitalytics.cache.hash_file(file_path), gaitalytics.cache.hash_parameters(a=1, b=3)))
+        with open(file_path, "wb") as f:
+            f.write(b"second")
+        self.assertNotEqual(key, gaitalytics.cache.StageCache.define_key(
+            "stage", gaitalytics.cache.hash_file(file_path), gaitalytics.cache.hash_parameters(a=1, b=2)))
+
+    def test_hash_cycle_data(self):
+        configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        cycle_data = define_cycle_data(configs)
+        self.assertEqual(gaitalytics.cache.hash_cycle_data(cycle_data),
+                         gaitalytics.cache.hash_cycle_data(define_cycle_data(configs)))
+        self.assertNotEqual(gaitalytics.cache.hash_cycle_data(cycle_data),
+                            gaitalytics.cache.hash_cycle_data(define_cycle_data(configs, seed=1)))
+
+    def test_evict_least_recently_used(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path, max_size=250)
+        entry_paths = [cache.put(f"entry{index}", _write_bytes(100)) for index in range(2)]
+        os.utime(entry_paths[0], (1, 1))
+        os.utime(entry_paths[1], (2, 2))
+        cache.get("entry0")
+        cache.put("entry2", _write_bytes(100))
+        self.assertIsNotNone(cache.get("entry0"))
+        self.assertIsNone(cache.get("entry1"))
+        self.assertIsNotNone(cache.get("entry2"))
+
+    def test_keep_entry_larger_than_max_size(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path, max_size=50)
+        cache.put("small", _write_bytes(10))
+        entry_path = cache.put("large", _write_bytes(100))
+        self.assertTrue(os.path.isfile(os.path.join(entry_path, "data")))
+        self.assertIsNone(cache.get("small"))
+
+
+class CachedCyclesTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._cache_path = os.path.join(self._dir.name, "cache")
+        self._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def test_normalise_cycles_cached(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path)
+        cycle_data = define_cycle_data(self._configs)
+        normalised_data = gaitalytics.api.normalise_cycles("trial.4.c3d", cycle_data, cache=cache)
+        self.assertEqual(len(os.listdir(self._cache_path)), 1)
+
+        restored_data = gaitalytics.api.normalise_cycles("trial.4.c3d", cycle_data, cache=cache)
+        self.assertEqual(len(os.listdir(self._cache_path)), 1)
+        shutil.rmtree(self._cache_path)
+        self.assertEqual(list(restored_data), list(normalised_data))
+        for key, point in normalised_data.items():
+            self.assertIsNot(restored_data[key], point)
+            self.assertFalse(is_memory_mapped(restored_data[key].ragged_values))
+            self.assertEqual(restored_data[key].translated_label, point.translated_label)
+            assert_frame_equal(restored_data[key].data_table, point.data_table, check_names=False)
+
+    def test_normalise_cycles_other_input(self):
+        cache = gaitalytics.cache.StageCache(self._cache_path)
+        gaitalytics.api.normalise_cycles("trial.4.c3d", define_cycle_data(self._configs), cache=cache)
+        normalised_data = gaitalytics.api.normalise_cycles("trial.4.c3d", define_cycle_data(self._configs, seed=1),
+                                                           cache=cache)
+        self.assertEqual(len(os.listdir(self._cache_path)), 2)
+        expected = gaitalytics.api.normalise_cycles("trial.4.c3d", define_cycle_data(self._configs, seed=1))
+        for key, point in expected.items():
+            np.testing.assert_array_equal(normalised_data[key].data_table.to_numpy(), point.data_table.to_numpy())
+
+
+if __name__ == '__main__':
+    unittest.main()
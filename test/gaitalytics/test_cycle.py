@@ -0,0 +1,236 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+import gaitalytics.cycle
+import gaitalytics.utils
+from cycle_data import SETTINGS_FILE, define_cycle_data, is_memory_mapped
+from file_data import MemoryFileHandler, define_event, define_point
+
+PREFIX = "trial"
+
+
+class CyclePointBufferTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        cls._raw_data = define_cycle_data(cls._configs)
+        cls._norm_data = define_cycle_data(cls._configs, gaitalytics.utils.BasicCyclePoint.TYPE_NORM)
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _assert_cycle_data_equal(self, expected, actual):
+        self.assertEqual(list(expected), list(actual))
+        for key, point in expected.items():
+            loaded = actual[key]
+            assert_frame_equal(loaded.data_table, point.data_table, check_names=False)
+            np.testing.assert_array_equal(loaded.frames.to_numpy(), point.frames.to_numpy())
+            np.testing.assert_array_equal(loaded.event_frames.to_numpy(), point.event_frames.to_numpy())
+            self.assertEqual(list(loaded.event_frames.columns), list(point.event_frames.columns))
+            self.assertEqual(loaded.translated_label, point.translated_label)
+            self.assertEqual(loaded.data_type, point.data_type)
+            self.assertEqual(loaded.direction, point.direction)
+            self.assertEqual(loaded.context, point.context)
+            self.assertEqual(loaded.cycle_point_type, point.cycle_point_type)
+            self.assertEqual(loaded.subject.body_height, point.subject.body_height)
+            self.assertEqual(loaded.subject.get_point_frequency(), point.subject.get_point_frequency())
+
+    def _write(self, prefix: str = PREFIX):
+        gaitalytics.cycle.CyclePointBuffer.write(self._raw_data, self._dir.name, prefix)
+        gaitalytics.cycle.CyclePointBuffer.write(self._norm_data, self._dir.name, prefix)
+
+    def test_round_trip(self):
+        self._write()
+        loader = gaitalytics.cycle.CyclePointLoader(self._configs, self._dir.name)
+        self._assert_cycle_data_equal(self._raw_data, loader.get_raw_cycle_points())
+        self._assert_cycle_data_equal(self._norm_data, loader.get_norm_cycle_points())
+
+    def test_values_memory_mapped(self):
+        self._write()
+        loader = gaitalytics.cycle.CyclePointLoader(self._configs, self._dir.name)
+        for point in loader.get_raw_cycle_points().values():
+            self.assertTrue(is_memory_mapped(point.ragged_values))
+
+    def test_one_file_per_cycle_point_type(self):
+        self._write()
+        file_names = sorted(os.listdir(self._dir.name))
+        manifest_extension = gaitalytics.cycle.CyclePointBuffer.MANIFEST_FILE_EXTENSION
+        self.assertEqual(file_names, [f"{PREFIX}-normalised.{manifest_extension}", f"{PREFIX}-normalised.npy",
+                                      f"{PREFIX}-normalised.npz", f"{PREFIX}-raw.{manifest_extension}",
+                                      f"{PREFIX}-raw.npy", f"{PREFIX}-raw.npz"])
+
+    def test_manifest(self):
+        self._write()
+        self._write()
+        self._write("other")
+        manifest = gaitalytics.cycle.CyclePointBuffer.read_manifest(self._dir.name)
+        self.assertEqual([entry["file"] for entry in manifest],
+                         ["other-normalised.npz", "other-raw.npz", f"{PREFIX}-normalised.npz", f"{PREFIX}-raw.npz"])
+        entry = [entry for entry in manifest if entry["file"] == f"{PREFIX}-normalised.npz"][0]
+        self.assertEqual([point["key"] for point in entry["points"]], list(self._norm_data))
+        self.assertEqual(entry["prefix"], PREFIX)
+
+    def test_write_trials_at_once(self):
+        prefixes = [f"trial{index}" for index in range(8)]
+        with ThreadPoolExecutor(max_workers=len(prefixes)) as executor:
+            list(executor.map(self._write, prefixes))
+        manifest = gaitalytics.cycle.CyclePointBuffer.read_manifest(self._dir.name)
+        self.assertEqual(sorted(entry["prefix"] for entry in manifest), sorted(prefixes * 2))
+        self.assertFalse([file_name for file_name in os.listdir(self._dir.name) if file_name.endswith(".tmp")])
+
+    def test_buffer_file_without_manifest(self):
+        self._write()
+        os.remove(gaitalytics.cycle.CyclePointBuffer.define_manifest_file_path(
+            os.path.join(self._dir.name, gaitalytics.cycle.CyclePointBuffer.define_file_name(
+                PREFIX, gaitalytics.utils.BasicCyclePoint.TYPE_RAW))))
+        loader = gaitalytics.cycle.CyclePointLoader(self._configs, self._dir.name)
+        self._assert_cycle_data_equal(self._raw_data, loader.get_raw_cycle_points())
+        self._assert_cycle_data_equal(self._norm_data, loader.get_norm_cycle_points())
+
+    def test_legacy_folder_without_manifest(self):
+        self._write()
+        for file_name in os.listdir(self._dir.name):
+            if file_name.endswith(gaitalytics.cycle.CyclePointBuffer.MANIFEST_FILE_EXTENSION):
+                os.remove(os.path.join(self._dir.name, file_name))
+        loader = gaitalytics.cycle.CyclePointLoader(self._configs, self._dir.name)
+        self._assert_cycle_data_equal(self._raw_data, loader.get_raw_cycle_points())
+        self._assert_cycle_data_equal(self._norm_data, loader.get_norm_cycle_points())
+
+    def test_legacy_csv_folder(self):
+        for point in self._raw_data.values():
+            point.to_csv(self._dir.name, PREFIX)
+        next(iter(self._raw_data.values())).subject.to_file(self._dir.name)
+        loader = gaitalytics.cycle.CyclePointLoader(self._configs, self._dir.name)
+        loaded = loader.get_raw_cycle_points()
+        self.assertEqual(sorted(loaded), sorted(self._raw_data))
+        for key, point in self._raw_data.items():
+            np.testing.assert_allclose(loaded[key].data_table.to_numpy(), point.data_table.to_numpy())
+            np.testing.assert_array_equal(loaded[key].event_frames.to_numpy(), point.event_frames.to_numpy())
+
+
+class CycleDataExtractorTests(unittest.TestCase):
+    FOOT_STRIKE = gaitalytics.utils.GaitEventLabel.FOOT_STRIKE.value
+    FOOT_OFF = gaitalytics.utils.GaitEventLabel.FOOT_OFF.value
+    LEFT = gaitalytics.utils.GaitEventContext.LEFT.value
+    RIGHT = gaitalytics.utils.GaitEventContext.RIGHT.value
+
+    def setUp(self) -> None:
+        self._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        random = np.random.default_rng(0)
+        self._values = {"LHEE": random.normal(0, 1, (130, 3)), "RHEE": random.normal(0, 1, (130, 3))}
+        points = [define_point(label, values) for label, values in self._values.items()]
+        points.append(define_point("UNMAPPED", random.normal(0, 1, (130, 3))))
+        events = [define_event(10, self.FOOT_STRIKE, self.RIGHT),
+                  define_event(20, self.FOOT_OFF, self.LEFT),
+                  define_event(30, self.FOOT_STRIKE, self.LEFT),
+                  define_event(35, "Event", "General"),
+                  define_event(40, self.FOOT_OFF, self.RIGHT),
+                  define_event(50, self.FOOT_STRIKE, self.RIGHT),
+                  define_event(60, self.FOOT_OFF, self.LEFT),
+                  define_event(70, self.FOOT_STRIKE, self.LEFT),
+                  define_event(80, self.FOOT_OFF, self.RIGHT),
+                  define_event(95, self.FOOT_STRIKE, self.RIGHT),
+                  define_event(100, self.FOOT_OFF, self.LEFT),
+                  define_event(118, self.FOOT_STRIKE, self.LEFT)]
+        self._handler = MemoryFileHandler(points, events)
+        self._cycles = gaitalytics.cycle.HeelStrikeToHeelStrikeCycleBuilder(None)._build(self._handler)
+        self._expected_frames = {gaitalytics.utils.GaitEventContext.LEFT: [[30, 70, 40, 50, 60],
+                                                                           [70, 118, 80, 95, 100]],
+                                 gaitalytics.utils.GaitEventContext.RIGHT: [[10, 50, 20, 30, 40],
+                                                                            [50, 95, 60, 70, 80]]}
+
+    def test_build_cycles(self):
+        for context, cycles in [(gaitalytics.utils.GaitEventContext.LEFT, self._cycles.left_cycles),
+                                (gaitalytics.utils.GaitEventContext.RIGHT, self._cycles.right_cycles)]:
+            self.assertEqual(sorted(cycles), [1, 2])
+            for number, expected in enumerate(self._expected_frames[context], 1):
+                cycle = cycles[number]
+                self.assertEqual(cycle.context, context)
+                self.assertEqual([cycle.start_frame, cycle.end_frame] + list(cycle.unused_events.values()), expected)
+
+    def test_extract_cut_cycles(self):
+        cycle_data = gaitalytics.cycle.CycleDataExtractor(self._configs).extract_data(self._cycles, self._handler)
+        self.assertEqual(len(cycle_data), 2 * 3 * 2)
+        for label, values in self._values.items():
+            translated_label = self._configs.get_translated_label(label, gaitalytics.utils.PointDataType.Marker)
+            for context, expected_frames in self._expected_frames.items():
+                expected_frames = np.array(expected_frames)
+                starts, ends = expected_frames[:, 0], expected_frames[:, 1]
+                for direction in gaitalytics.utils.AxesNames:
+                    key = gaitalytics.utils.ConfigProvider.define_key(translated_label,
+                                                                      gaitalytics.utils.PointDataType.Marker,
+                                                                      direction, context)
+                    point = cycle_data[key]
+                    np.testing.assert_array_equal(point.frame_values, expected_frames[:, :2])
+                    np.testing.assert_array_equal(point.event_frame_values,
+                                                  expected_frames[:, 2:] - starts[:, np.newaxis])
+                    np.testing.assert_array_equal(point.cycle_lengths, ends - starts)
+                    table = point.data_table.to_numpy()
+                    for row, (start, end) in enumerate(zip(starts, ends)):
+                        expected = values[start:end, direction.value]
+                        np.testing.assert_array_equal(
+                            point.ragged_values[point.ragged_offsets[row]:point.ragged_offsets[row + 1]], expected)
+                        np.testing.assert_array_equal(table[row, :end - start], expected)
+                        self.assertTrue(np.isnan(table[row, end - start:]).all())
+
+    def test_extract_keys(self):
+        key = gaitalytics.utils.ConfigProvider.define_key(self._configs.MARKER_MAPPING.right_heel,
+                                                          gaitalytics.utils.PointDataType.Marker,
+                                                          gaitalytics.utils.AxesNames.z,
+                                                          gaitalytics.utils.GaitEventContext.LEFT)
+        extractor = gaitalytics.cycle.CycleDataExtractor(self._configs)
+        cycle_data = extractor.extract_data(self._cycles, self._handler, [key])
+        self.assertEqual(list(cycle_data), [key])
+        assert_frame_equal(cycle_data[key].data_table,
+                           extractor.extract_data(self._cycles, self._handler)[key].data_table)
+
+
+class LinearTimeNormalisationTests(unittest.TestCase):
+
+    @staticmethod
+    def _interpolate(cycle: np.ndarray, number_frames: int) -> np.ndarray:
+        cycle = cycle[~np.isnan(cycle)]
+        return np.interp(np.linspace(0, len(cycle), num=number_frames), np.arange(len(cycle)), cycle)
+
+    def test_like_interp(self):
+        cycles = [np.random.default_rng(0).normal(size=length) for length in [80, 97, 120]]
+        values = np.concatenate(cycles)
+        offsets = np.concatenate([[0], np.cumsum([len(cycle) for cycle in cycles])])
+        normalised = gaitalytics.cycle.LinearTimeNormalisation()._run_algorithm(values, offsets, 100)
+        np.testing.assert_allclose(normalised, [self._interpolate(cycle, 100) for cycle in cycles])
+
+    def test_missing_values_left_out(self):
+        cycles = [np.random.default_rng(1).normal(size=length) for length in [50, 60, 40]]
+        cycles[0][[0, 10, 11]] = np.nan
+        cycles[1][-1] = np.nan
+        values = np.concatenate(cycles)
+        offsets = np.concatenate([[0], np.cumsum([len(cycle) for cycle in cycles])])
+        normalised = gaitalytics.cycle.LinearTimeNormalisation()._run_algorithm(values, offsets, 101)
+        self.assertFalse(np.isnan(normalised).any())
+        np.testing.assert_allclose(normalised, [self._interpolate(cycle, 101) for cycle in cycles])
+
+    def test_cycle_without_values(self):
+        cycles = [np.arange(30, dtype=float), np.full(20, np.nan), np.arange(25, dtype=float)]
+        values = np.concatenate(cycles)
+        offsets = np.concatenate([[0], np.cumsum([len(cycle) for cycle in cycles])])
+        normalised = gaitalytics.cycle.LinearTimeNormalisation()._run_algorithm(values, offsets, 100)
+        self.assertTrue(np.isnan(normalised[1]).all())
+        np.testing.assert_allclose(normalised[[0, 2]], [self._interpolate(cycles[0], 100),
+                                                        self._interpolate(cycles[2], 100)])
+        normalised = gaitalytics.cycle.LinearTimeNormalisation()._run_algorithm(np.full(5, np.nan),
+                                                                                np.array([0, 5]), 100)
+        self.assertTrue(np.isnan(normalised).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
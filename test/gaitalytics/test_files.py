@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+import gaitalytics.cycle
+import gaitalytics.utils
+from file_data import MemoryFileHandler, define_event, define_point
+
+FOOT_STRIKE = gaitalytics.utils.GaitEventLabel.FOOT_STRIKE.value
+FOOT_OFF = gaitalytics.utils.GaitEventLabel.FOOT_OFF.value
+LEFT = gaitalytics.utils.GaitEventContext.LEFT.value
+RIGHT = gaitalytics.utils.GaitEventContext.RIGHT.value
+
+
+def _define_events():
+    return [define_event(10, FOOT_STRIKE, RIGHT),
+            define_event(20, FOOT_OFF, LEFT),
+            define_event(30, FOOT_STRIKE, LEFT),
+            define_event(35, "Event", "General"),
+            define_event(40, FOOT_OFF, RIGHT),
+            define_event(50, FOOT_STRIKE, RIGHT)]
+
+
+class EventTableTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._handler = MemoryFileHandler([define_point("LHEE", np.zeros((60, 3)))], _define_events())
+
+    def test_foreign_events_left_out(self):
+        table = self._handler.get_event_table()
+        self.assertEqual(table["frame"].tolist(), [10, 20, 30, 40, 50])
+        self.assertEqual([gaitalytics.utils.get_event_value(gaitalytics.utils.GaitEventLabel, code)
+                          for code in table["label"]], [FOOT_STRIKE, FOOT_OFF, FOOT_STRIKE, FOOT_OFF, FOOT_STRIKE])
+        self.assertEqual([gaitalytics.utils.get_event_value(gaitalytics.utils.GaitEventContext, code)
+                          for code in table["context"]], [RIGHT, LEFT, LEFT, RIGHT, RIGHT])
+        self.assertEqual(self._handler.get_events_size(), 6)
+
+    def test_unknown_code(self):
+        self.assertEqual(gaitalytics.utils.get_event_code(gaitalytics.utils.GaitEventContext, "General"), -1)
+        with self.assertRaises(ValueError):
+            gaitalytics.utils.get_event_value(gaitalytics.utils.GaitEventContext, -1)
+
+    def test_cycle_events_without_foreign_event(self):
+        builder = gaitalytics.cycle.HeelStrikeToHeelStrikeCycleBuilder(None)
+        cycles = builder._build(self._handler)
+        self.assertEqual(list(cycles.left_cycles), [])
+        cycle = cycles.right_cycles[1]
+        self.assertEqual((cycle.start_frame, cycle.end_frame), (10, 50))
+        self.assertEqual(cycle.unused_events, {f"{FOOT_OFF}_{LEFT}": 20,
+                                               f"{FOOT_STRIKE}_{LEFT}": 30,
+                                               f"{FOOT_OFF}_{RIGHT}": 40})
+
+
+if __name__ == '__main__':
+    unittest.main()
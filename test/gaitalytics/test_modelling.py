@@ -0,0 +1,144 @@
+import unittest
+from typing import List
+
+import numpy as np
+
+import gaitalytics.modelling
+import gaitalytics.utils
+from cycle_data import SETTINGS_FILE
+from file_data import MemoryFileHandler, define_event, define_point
+
+FOOT_STRIKE = gaitalytics.utils.GaitEventLabel.FOOT_STRIKE.value
+FOOT_OFF = gaitalytics.utils.GaitEventLabel.FOOT_OFF.value
+LEFT = gaitalytics.utils.GaitEventContext.LEFT.value
+RIGHT = gaitalytics.utils.GaitEventContext.RIGHT.value
+NUMBER_FRAMES = 200
+
+
+class SumModeller(gaitalytics.modelling.BaseOutputModeller):
+    """
+    Adds a constant to the sum of its inputs and records its calls
+    """
+
+    def __init__(self, label: str, inputs: List[str], calls: List[str], dependencies: List[str] = None):
+        super().__init__(label, gaitalytics.utils.PointDataType.Marker, dependencies)
+        self._inputs = inputs
+        self._calls = calls
+
+    def _calculate_point(self, store: gaitalytics.modelling.ModelledPointStore, **kwargs) -> np.ndarray:
+        self._calls.append(self.label)
+        return sum(store.get_values(label) for label in self._inputs) + kwargs.get("offset", 1)
+
+
+def _define_events():
+    return [define_event(10, FOOT_STRIKE, RIGHT),
+            define_event(20, FOOT_OFF, LEFT),
+            define_event(60, FOOT_STRIKE, LEFT),
+            define_event(70, FOOT_OFF, RIGHT),
+            define_event(110, FOOT_STRIKE, RIGHT),
+            define_event(120, FOOT_OFF, LEFT),
+            define_event(160, FOOT_STRIKE, LEFT),
+            define_event(170, FOOT_OFF, RIGHT)]
+
+
+def _calculate_cmos_per_frame(x_com: np.ndarray, markers: dict, events) -> np.ndarray:
+    """
+    Margin of stability frame by frame from the phase of the last event
+    """
+
+    def calculate_mos(x_com_value, minus_boundary, plus_boundary):
+        return min([(minus_boundary - x_com_value) * -1, plus_boundary - x_com_value])
+
+    mos = np.zeros((len(x_com), 3))
+    event = None
+    for frame in range(len(x_com)):
+        frame_events = [frame_event for frame_event in events if frame_event.frame == frame]
+        if frame_events:
+            event = frame_events[0]
+        if event is None:
+            continue
+        left = event.context == LEFT
+        if event.label == FOOT_STRIKE:
+            front = markers["LMT2"] if left else markers["RMT2"]
+            back = markers["RHEE"] if left else markers["LHEE"]
+            minus, plus = markers["RLM"], markers["LLM"]
+        else:
+            front = markers["RMT2"] if left else markers["LMT2"]
+            back = markers["RHEE"] if left else markers["LHEE"]
+            minus = markers["RMM"] if left else markers["LLM"]
+            plus = markers["RLM"] if left else markers["LMM"]
+        mos[frame, 0] = calculate_mos(x_com[frame, 0], minus[frame, 0], plus[frame, 0])
+        mos[frame, 1] = calculate_mos(x_com[frame, 1], front[frame, 1], back[frame, 1])
+    return mos
+
+
+class ModellingGraphTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self._values = np.random.default_rng(0).normal(0, 1, (NUMBER_FRAMES, 3))
+        self._calls = []
+        self._graph = gaitalytics.modelling.ModellingGraph([
+            SumModeller("C", ["A", "B"], self._calls, ["B", "A"]),
+            SumModeller("B", ["A"], self._calls, ["A"]),
+            SumModeller("A", ["LHEE"], self._calls)])
+
+    def test_dependency_order(self):
+        handler = MemoryFileHandler([define_point("LHEE", self._values)], [])
+        store = self._graph.run(handler, ["C", "B"], offset=2)
+        self.assertEqual(self._calls, ["A", "B", "C"])
+        self.assertEqual(store.modelled_labels, ["A", "B", "C"])
+        self.assertEqual(handler.added_points_calls, 1)
+        expected_a = self._values + 2
+        expected_b = expected_a + 2
+        for label, expected in [("A", expected_a), ("B", expected_b), ("C", expected_a + expected_b + 2)]:
+            np.testing.assert_allclose(handler.get_point(label).values, expected)
+
+    def test_reuse_points_of_file(self):
+        existing = np.full((NUMBER_FRAMES, 3), 5.0)
+        handler = MemoryFileHandler([define_point("LHEE", self._values), define_point("A", existing)], [])
+        store = self._graph.run(handler, ["C"])
+        self.assertEqual(self._calls, ["B", "C"])
+        self.assertEqual(store.modelled_labels, ["B", "C"])
+        self.assertEqual(handler.added_points_calls, 1)
+        self.assertEqual(handler.get_points_size(), 4)
+        np.testing.assert_allclose(handler.get_point("B").values, existing + 1)
+        np.testing.assert_allclose(handler.get_point("C").values, existing * 2 + 2)
+
+    def test_nothing_to_model(self):
+        handler = MemoryFileHandler([define_point("LHEE", self._values), define_point("C", self._values)], [])
+        self._graph.run(handler, ["C"])
+        self.assertEqual(self._calls, [])
+        self.assertEqual(handler.get_points_size(), 2)
+
+
+class CMoSModellerTests(unittest.TestCase):
+    LABELS = ["LASIS", "RASIS", "LPSIS", "RPSIS", "LLM", "RLM", "LMM", "RMM", "LHEE", "RHEE", "LMT2", "RMT2"]
+
+    def setUp(self) -> None:
+        self._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        random = np.random.default_rng(0)
+        self._markers = {label: random.normal(0, 100, (NUMBER_FRAMES, 3)) for label in self.LABELS}
+        self._handler = MemoryFileHandler([define_point(label, values) for label, values in self._markers.items()],
+                                          _define_events())
+        self._graph = gaitalytics.modelling.ModellingGraph([gaitalytics.modelling.COMModeller(self._configs),
+                                                            gaitalytics.modelling.XCOMModeller(self._configs),
+                                                            gaitalytics.modelling.CMoSModeller(self._configs)])
+
+    def test_like_per_frame(self):
+        self._graph.run(self._handler, [self._configs.MARKER_MAPPING.cmos.value])
+        self.assertEqual(self._handler.added_points_calls, 1)
+        x_com = self._handler.get_point(self._configs.MARKER_MAPPING.xcom.value).values
+        expected = _calculate_cmos_per_frame(x_com, self._markers, self._handler.get_events())
+        np.testing.assert_allclose(self._handler.get_point(self._configs.MARKER_MAPPING.cmos.value).values,
+                                   expected)
+        self.assertTrue((expected[:10] == 0).all())
+
+    def test_com(self):
+        self._graph.run(self._handler, [self._configs.MARKER_MAPPING.com.value])
+        self.assertEqual(self._handler.get_points_size(), len(self.LABELS) + 1)
+        np.testing.assert_allclose(self._handler.get_point(self._configs.MARKER_MAPPING.com.value).values,
+                                   np.mean([self._markers[label] for label in self.LABELS[:4]], axis=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from pandas.testing import assert_frame_equal
+
+import gaitalytics.normative
+import gaitalytics.utils
+from cycle_data import LABELS, SETTINGS_FILE, define_cycle_data
+
+
+class NormativeStoreTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls._configs = gaitalytics.utils.ConfigProvider(SETTINGS_FILE)
+        cls._controls = [define_cycle_data(cls._configs, gaitalytics.utils.BasicCyclePoint.TYPE_NORM,
+                                           number_cycles=number_cycles, seed=seed, labels=LABELS[:2])
+                         for seed, number_cycles in enumerate([5, 3, 6])]
+        cls._patient = define_cycle_data(cls._configs, gaitalytics.utils.BasicCyclePoint.TYPE_NORM, seed=10)
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        self._file_path = os.path.join(self._dir.name, "normative.npz")
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _define_store(self, controls, file_path: str = None) -> gaitalytics.normative.NormativeStore:
+        store = gaitalytics.normative.NormativeStore(file_path if file_path else self._file_path)
+        for control in controls:
+            store.add(control)
+        return store
+
+    def test_save_reload(self):
+        store = self._define_store(self._controls)
+        store.save()
+        loaded = gaitalytics.normative.NormativeStore(self._file_path)
+        self.assertEqual(loaded.get_keys(), list(self._controls[0]))
+        assert_frame_equal(loaded.get_reference(), store.get_reference())
+
+        loaded.add(self._controls[0])
+        expected = self._define_store(self._controls + self._controls[:1], os.path.join(self._dir.name, "all.npz"))
+        assert_frame_equal(loaded.get_reference(), expected.get_reference())
+
+    def test_merge(self):
+        store = self._define_store(self._controls[:1])
+        store.merge(self._define_store(self._controls[1:], os.path.join(self._dir.name, "other.npz")))
+        expected = self._define_store(self._controls, os.path.join(self._dir.name, "all.npz"))
+        assert_frame_equal(store.get_reference(), expected.get_reference())
+
+    def test_compare(self):
+        store = self._define_store(self._controls)
+        threshold = 1.5
+        z_scores, summary = store.compare(self._patient, threshold)
+        self.assertEqual(sorted(z_scores), sorted(self._controls[0]))
+        for key, z in z_scores.items():
+            controls = np.concatenate([control[key].data_table.to_numpy() for control in self._controls])
+            expected = ((self._patient[key].data_table.to_numpy() - controls.mean(axis=0)) /
+                        controls.std(axis=0, ddof=1))
+            np.testing.assert_allclose(z.to_numpy(), expected)
+            self.assertTrue(z.index.equals(self._patient[key].data_table.index))
+
+            absolute = np.abs(expected)
+            np.testing.assert_allclose(summary[("z_mean_abs", key)].to_numpy(), absolute.mean(axis=1))
+            np.testing.assert_allclose(summary[("z_max_abs", key)].to_numpy(), absolute.max(axis=1))
+            np.testing.assert_allclose(summary[("z_rms", key)].to_numpy(), np.sqrt((expected ** 2).mean(axis=1)))
+            np.testing.assert_allclose(summary[("deviation_p", key)].to_numpy(),
+                                       (absolute > threshold).mean(axis=1))
+        self.assertEqual(sorted(summary.columns.get_level_values(0).unique()),
+                         ["deviation_p", "z_max_abs", "z_mean_abs", "z_rms"])
+
+    def test_compare_different_number_frames(self):
+        store = self._define_store(self._controls)
+        patient = define_cycle_data(self._configs, gaitalytics.utils.BasicCyclePoint.TYPE_NORM, number_frames=50)
+        with self.assertRaises(ValueError):
+            store.compare(patient)
+
+    def test_compare_empty_store(self):
+        z_scores, summary = gaitalytics.normative.NormativeStore(self._file_path).compare(self._patient)
+        self.assertEqual(z_scores, {})
+        self.assertTrue(summary.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()